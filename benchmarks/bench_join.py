@@ -0,0 +1,101 @@
+"""
+Benchmark of the join engine against the original string-cast join.
+
+Generates synthetic data shaped like the events (BigQuery) x orders (Snowflake) join
+used in main.py and reports wall time and peak traced memory of both implementations.
+
+Usage:
+    python benchmarks/bench_join.py --events 1000000 --orders 200000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fakes import make_events, make_orders  # noqa: E402
+from joins import hash_join  # noqa: E402
+
+JOIN_COLUMNS = ["order_id", "user_id", "item_sku"]
+OUTPUT_COLUMNS = [
+    "event_timestamp_utc", "order_id", "user_id", "event_action", "item_sku", "item_price",
+    "traffic_source", "user_country", "device_category",
+]
+
+
+def legacy_join(df1, df2, join_columns, output_columns):
+    """
+    The original join_results implementation (string-cast keys, full merge, full duplicate check).
+    """
+    df1[join_columns] = df1[join_columns].astype(str)
+    df2[join_columns] = df2[join_columns].astype(str)
+    joined_df = pd.merge(df1, df2, on=join_columns, how="inner")
+    duplicated_rows_count = joined_df.duplicated().sum()
+    return joined_df[output_columns], duplicated_rows_count
+
+
+def measure(func, make_args):
+    """
+    Runs a function twice: once for wall time and once under tracemalloc for peak memory,
+    since tracing slows down allocation-heavy code.
+
+    Args:
+        func (callable): The function to measure.
+        make_args (callable): Returns fresh positional arguments for each run.
+
+    Returns:
+        tuple: (result, wall time in seconds, peak traced memory in MB).
+    """
+    args = make_args()
+    start_time = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start_time
+
+    args = make_args()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 ** 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.orders)
+    orders = make_orders(args.orders)
+
+    # The legacy join mutates its inputs, so it gets its own copies
+    (legacy_df, _), legacy_time, legacy_peak = measure(
+        legacy_join, lambda: (events.copy(), orders.copy(), JOIN_COLUMNS, OUTPUT_COLUMNS)
+    )
+    (new_df, _), new_time, new_peak = measure(
+        hash_join, lambda: (events, orders, JOIN_COLUMNS, OUTPUT_COLUMNS)
+    )
+
+    assert len(legacy_df) == len(new_df), "Join results differ in size"
+
+    print(
+        f"Events: {args.events:,} rows, orders: {args.orders:,} rows, "
+        f"joined: {len(new_df):,} rows"
+    )
+    print(f"{'implementation':<16}{'time (s)':>12}{'peak (MB)':>12}")
+    print(f"{'legacy':<16}{legacy_time:>12.2f}{legacy_peak:>12.1f}")
+    print(f"{'hash_join':<16}{new_time:>12.2f}{new_peak:>12.1f}")
+    print(
+        f"speedup: {legacy_time / new_time:.1f}x, "
+        f"peak memory: {new_peak / legacy_peak:.0%} of legacy"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Local stand-ins for the Snowflake and BigQuery client objects used by DatabaseQueryTool.
+
+The fakes return synthetic results shaped like queries/bigquery_query.sql (events) and
+queries/snowflake_query.sql (orders) with a configurable row count, column mix and latency,
+so the query, join and write paths can be benchmarked without credentials. Inject them
+into a tool before the first query:
+
+    tool = DatabaseQueryTool({}, {})
+    tool.bigquery_client = FakeBigQueryClient(make_events(100_000, 20_000))
+    tool.snowflake_conn = FakeSnowflakeConnection(make_orders(20_000))
+
+Results are converted to Arrow once when a fake is created, so the benchmarks measure the
+tool rather than the data generation.
+"""
+import glob
+import re
+import time
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+EVENT_COLUMNS = [
+    "event_timestamp_utc", "event_action", "event_label", "item_sku", "user_id", "order_id",
+    "traffic_source", "traffic_medium", "user_country", "device_category",
+]
+ORDER_COLUMNS = [
+    "order_date", "order_id", "user_id", "item_sku", "item_name", "item_category_l1",
+    "item_category_l2", "item_category_l3", "item_price",
+]
+
+
+def make_events(rows, orders, seed=0, columns=None):
+    """
+    Generates a frame shaped like the result of queries/bigquery_query.sql.
+
+    Args:
+        rows (int): Number of events.
+        orders (int): Number of distinct orders the events refer to.
+        seed (int): Random seed.
+        columns (list): Subset of EVENT_COLUMNS to return (all if None).
+    """
+    rng = np.random.default_rng(seed)
+    order_ids = rng.integers(1_500_000_000, 1_500_000_000 + orders, rows)
+    df = pd.DataFrame({
+        "event_timestamp_utc": pd.Timestamp("2017-08-01", tz="UTC")
+        + pd.to_timedelta(rng.integers(0, 86_400 * 365, rows), unit="s"),
+        "event_action": rng.choice(
+            ["Quickview Click", "Product Click", "Add to Cart", "Remove from Cart"], rows
+        ),
+        "event_label": rng.choice(["Google Kick Ball", "YouTube Tee", None], rows),
+        "item_sku": np.char.add("GGOEGAAX0", (order_ids % 500).astype(str)).astype(object),
+        "user_id": np.char.add("7", (order_ids % 97_000).astype(str)).astype(object),
+        "order_id": order_ids,
+        "traffic_source": rng.choice(["google", "(direct)", "youtube.com", "facebook.com"], rows),
+        "traffic_medium": rng.choice(["organic", "(none)", "referral", "cpc"], rows),
+        "user_country": rng.choice(["United States", "India", "United Kingdom", "Canada"], rows),
+        "device_category": rng.choice(["desktop", "mobile", "tablet"], rows),
+    })
+    return df if columns is None else df[columns]
+
+
+def make_orders(orders, seed=1, columns=None):
+    """
+    Generates a frame shaped like the result of queries/snowflake_query.sql.
+    Snowflake returns the order ID as a string, so the key dtypes differ between sides.
+
+    Args:
+        orders (int): Number of orders.
+        seed (int): Random seed.
+        columns (list): Subset of ORDER_COLUMNS to return (all if None).
+    """
+    rng = np.random.default_rng(seed)
+    order_ids = np.arange(1_500_000_000, 1_500_000_000 + orders)
+    df = pd.DataFrame({
+        "order_date": pd.Timestamp("2017-08-01")
+        + pd.to_timedelta(rng.integers(0, 365, orders), unit="D"),
+        "order_id": order_ids.astype(str).astype(object),
+        "user_id": np.char.add("7", (order_ids % 97_000).astype(str)).astype(object),
+        "item_sku": np.char.add("GGOEGAAX0", (order_ids % 500).astype(str)).astype(object),
+        "item_name": rng.choice(["Google Kick Ball", "YouTube Tee", "Android Sticker"], orders),
+        "item_category_l1": rng.choice(["Home", "Apparel"], orders),
+        "item_category_l2": rng.choice(["Shop by Brand", "Accessories", "Bags"], orders),
+        "item_category_l3": rng.choice(["YouTube", "Google", "Android"], orders),
+        "item_price": rng.uniform(1, 100, orders).round(2),
+    })
+    return df if columns is None else df[columns]
+
+
+class FakeSnowflakeCursor:
+    """
+    A Snowflake cursor returning a fixed result for SELECT statements.
+
+    Other statements (CREATE, PUT, COPY, MERGE, ...) are recorded in the connection's
+    `statements` and return an empty result. PUT statements read the staged local files,
+    so bulk loads pay for the file I/O a real upload would.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.sfqid = None
+        self.description = None
+        self._table = None
+        self._offset = 0
+        self._rows = None
+
+    def execute(self, query, params=None):
+        time.sleep(self.connection.latency_sec)
+        self.connection.statements.append(query)
+        self.sfqid = uuid.uuid4().hex
+        self._offset = 0
+        self._rows = None
+
+        statement = query.lstrip().upper()
+        if statement.startswith(("SELECT", "WITH")):
+            self._table = self.connection.table
+        else:
+            self._table = pa.table({"status": pa.array([], pa.string())})
+            if statement.startswith("PUT"):
+                self._read_put_files(query)
+        self.description = [
+            (name, None, None, None, None, None, True) for name in self._table.column_names
+        ]
+        return self
+
+    def executemany(self, query, seqparams):
+        time.sleep(self.connection.latency_sec)
+        self.connection.statements.append(query)
+        self.connection.rows_inserted += len(seqparams)
+        return self
+
+    def describe(self, query):
+        return [SimpleNamespace(name=name) for name in self.connection.table.column_names]
+
+    def fetch_arrow_batches(self):
+        if not self.connection.arrow:
+            raise NotImplementedError("Arrow results are disabled")
+        for batch in self._table.to_batches(max_chunksize=self.connection.batch_rows):
+            time.sleep(self.connection.batch_latency_sec)
+            yield pa.Table.from_batches([batch])
+
+    def get_result_batches(self):
+        return [
+            SimpleNamespace(to_arrow=lambda batch=batch: pa.Table.from_batches([batch]))
+            for batch in self._table.to_batches(max_chunksize=self.connection.batch_rows)
+        ]
+
+    def fetchall(self):
+        return self.fetchmany(None)
+
+    def fetchmany(self, size=None):
+        if self._rows is None:
+            # The connector builds Python tuples from the wire format, so this cost is kept
+            self._rows = list(zip(*(column.to_pylist() for column in self._table.columns)))
+        end = len(self._rows) if size is None else self._offset + size
+        rows = self._rows[self._offset:end]
+        self._offset += len(rows)
+        return rows
+
+    def close(self):
+        self._table = None
+        self._rows = None
+
+    def _read_put_files(self, query):
+        pattern = re.search(r"'file://([^']+)'", query).group(1)
+        for path in glob.glob(pattern):
+            with open(path, "rb") as file:
+                self.connection.bytes_staged += len(file.read())
+
+
+class FakeSnowflakeConnection:
+    """
+    A Snowflake connection whose cursors return `df` for every SELECT.
+
+    Attributes:
+        table (pyarrow.Table): The result returned for SELECT statements.
+        latency_sec (float): Delay added to every executed statement.
+        batch_rows (int): Rows per Arrow result batch (the connector's result chunks).
+        batch_latency_sec (float): Delay added to every fetched result batch.
+        arrow (bool): Whether fetch_arrow_batches is supported.
+        statements (list): Executed statements, in order.
+        rows_inserted (int): Rows received through executemany.
+        bytes_staged (int): Bytes of local files uploaded with PUT.
+    """
+    def __init__(self, df, latency_sec=0.0, batch_rows=50_000, batch_latency_sec=0.0, arrow=True):
+        self.table = pa.Table.from_pandas(df, preserve_index=False)
+        self.latency_sec = latency_sec
+        self.batch_rows = batch_rows
+        self.batch_latency_sec = batch_latency_sec
+        self.arrow = arrow
+        self.statements = []
+        self.rows_inserted = 0
+        self.bytes_staged = 0
+        self._closed = False
+
+    def cursor(self):
+        return FakeSnowflakeCursor(self)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+class FakeRowIterator:
+    """
+    The result of a FakeQueryJob, paged like google.cloud.bigquery.table.RowIterator.
+    """
+    def __init__(self, job, page_size=None):
+        self.job = job
+        self.total_rows = job.client.table.num_rows
+        self.schema = job.schema
+        self._page_size = page_size or job.client.page_rows
+
+    def to_arrow_iterable(self):
+        for batch in self.job.client.table.to_batches(max_chunksize=self._page_size):
+            time.sleep(self.job.client.page_latency_sec)
+            yield batch
+
+    def to_arrow(self):
+        return pa.Table.from_batches(
+            list(self.to_arrow_iterable()), schema=self.job.client.table.schema
+        )
+
+    def to_dataframe(self):
+        return self.to_arrow().to_pandas()
+
+
+class FakeQueryJob:
+    """
+    A finished query job; `result` waits for the configured latency.
+    """
+    def __init__(self, client, query, job_config=None):
+        self.client = client
+        self.query = query
+        self.job_id = uuid.uuid4().hex
+        self.referenced_tables = []
+        self.schema = [SimpleNamespace(name=name) for name in client.table.column_names]
+        self.total_bytes_processed = client.table.nbytes
+        self.total_bytes_billed = client.table.nbytes
+        self._dry_run = bool(getattr(job_config, "dry_run", False))
+
+    def result(self, page_size=None, timeout=None):
+        if not self._dry_run:
+            time.sleep(self.client.latency_sec)
+        return FakeRowIterator(self, page_size)
+
+    def cancel(self):
+        return True
+
+
+class FakeBigQueryClient:
+    """
+    A BigQuery client whose jobs return `df` for every query.
+
+    Attributes:
+        table (pyarrow.Table): The result of every query.
+        latency_sec (float): Delay until a job finishes.
+        page_rows (int): Rows per result page.
+        page_latency_sec (float): Delay added to every fetched page.
+        queries (list): Submitted queries, in order.
+    """
+    def __init__(self, df, latency_sec=0.0, page_rows=50_000, page_latency_sec=0.0):
+        self.table = pa.Table.from_pandas(df, preserve_index=False)
+        self.latency_sec = latency_sec
+        self.page_rows = page_rows
+        self.page_latency_sec = page_latency_sec
+        self.queries = []
+        self.project = "fake-project"
+
+    def query(self, query, job_config=None, **kwargs):
+        self.queries.append(query)
+        return FakeQueryJob(self, query, job_config)
+
+    def get_table(self, table):
+        return SimpleNamespace(modified=None, num_rows=self.table.num_rows)
+
+    def close(self):
+        pass
+
+
+def fake_tool(events=100_000, orders=20_000, latency_sec=0.0):
+    """
+    Returns a DatabaseQueryTool wired to fakes serving events (BigQuery) and orders (Snowflake).
+
+    Args:
+        events (int): Rows returned by BigQuery.
+        orders (int): Rows returned by Snowflake.
+        latency_sec (float): Query latency of both fakes.
+    """
+    from query_tool import DatabaseQueryTool
+
+    tool = DatabaseQueryTool({}, {})
+    tool.bigquery_client = FakeBigQueryClient(make_events(events, orders), latency_sec=latency_sec)
+    tool.snowflake_conn = FakeSnowflakeConnection(make_orders(orders), latency_sec=latency_sec)
+    return tool
@@ -0,0 +1,249 @@
+"""
+Offline benchmark of the DatabaseQueryTool hot paths against local fakes (see fakes.py).
+
+Each case is run once to warm up, `--repeat` times for latency percentiles and once more
+under tracemalloc for peak memory. Results are compared with benchmarks/baselines.json
+and the run exits with status 1 if a case is slower or uses more memory than its baseline
+by more than `--threshold`, or if importing query_tool in a fresh interpreter exceeds
+`--import-budget` or imports a warehouse client library. Baselines are only compared when
+they were recorded with the same sizes and latency; they are machine-specific, so
+re-record them with `--save` after an intended change or on a new machine.
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --events 1000000 --orders 200000 --cases query_snowflake_arrow
+    python benchmarks/run.py --save
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fakes import fake_tool, make_events, make_orders  # noqa: E402
+from joins import hash_join  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+SRC = os.path.join(ROOT, "src")
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Modules that must only be imported when their backend is used (see src/backends.py)
+LAZY_MODULES = ["google.cloud.bigquery", "snowflake.connector", "dotenv"]
+# Absolute slack per metric, so timer and allocator noise on very fast cases is not flagged
+NOISE_FLOOR = {"p50_sec": 0.01, "peak_mb": 1.0}
+JOIN_COLUMNS = ["order_id", "user_id", "item_sku"]
+OUTPUT_COLUMNS = [
+    "event_timestamp_utc", "order_id", "user_id", "event_action", "item_sku", "item_price",
+    "traffic_source", "user_country", "device_category",
+]
+
+
+def read_query(name):
+    with open(os.path.join(ROOT, "queries", name)) as file:
+        return file.read()
+
+
+def import_query_tool(_):
+    """
+    Imports query_tool in a fresh interpreter, like a short CLI invocation or worker process.
+
+    Raises:
+        RuntimeError: If the import loaded one of LAZY_MODULES.
+    """
+    code = (
+        f"import json, sys; sys.path.insert(0, {SRC!r}); import query_tool; "
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    loaded = json.loads(output.strip().splitlines()[-1])
+    if loaded:
+        raise RuntimeError(f"Importing query_tool eagerly imported {loaded}")
+    return 1
+
+
+def make_cases(args):
+    """
+    Returns the benchmark cases as {name: (setup, run)}, where setup() returns the state
+    passed to run(state) and run returns the number of rows processed.
+    """
+    bigquery_query = read_query("bigquery_query.sql")
+    snowflake_query = read_query("snowflake_query.sql")
+    events = make_events(args.events, args.orders)
+    orders = make_orders(args.orders)
+    joined, _ = hash_join(events, orders, JOIN_COLUMNS, OUTPUT_COLUMNS, check_duplicates=None)
+
+    def new_tool():
+        return fake_tool(args.events, args.orders, latency_sec=args.latency)
+
+    def write(method):
+        def run(tool):
+            tool.write_to_snowflake(joined, '"benchmark"', method=method)
+            if tool.write_logs.empty:
+                raise RuntimeError(f"write_to_snowflake ({method}) failed, see the log")
+            return len(joined)
+        return run
+
+    return {
+        "import_query_tool": (lambda: None, import_query_tool),
+        "query_bigquery": (
+            new_tool, lambda tool: len(tool.query_bigquery(bigquery_query, use_cache=False))
+        ),
+        "query_snowflake_arrow": (
+            new_tool, lambda tool: len(tool.query_snowflake(snowflake_query, use_cache=False))
+        ),
+        "query_snowflake_fetchall": (
+            new_tool,
+            lambda tool: len(
+                tool.query_snowflake(snowflake_query, use_arrow=False, use_cache=False)
+            ),
+        ),
+        "join_results": (
+            new_tool,
+            lambda tool: len(tool.join_results(events, orders, JOIN_COLUMNS, OUTPUT_COLUMNS)),
+        ),
+        "write_to_snowflake_insert": (new_tool, write("insert")),
+        "write_to_snowflake_bulk": (new_tool, write("bulk")),
+    }
+
+
+def measure(setup, run, repeat):
+    """
+    Runs a case and returns its latency percentiles, throughput and peak traced memory.
+
+    Args:
+        setup (callable): Returns the fresh state of one run.
+        run (callable): Runs the case on the state and returns the number of rows processed.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: p50_sec, p95_sec, p99_sec, rows_per_sec and peak_mb.
+    """
+    run(setup())  # warm-up
+
+    latencies = []
+    for _ in range(repeat):
+        state = setup()
+        start_time = time.perf_counter()
+        rows = run(state)
+        latencies.append(time.perf_counter() - start_time)
+
+    state = setup()
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "p50_sec": round(float(p50), 4),
+        "p95_sec": round(float(p95), 4),
+        "p99_sec": round(float(p99), 4),
+        "rows_per_sec": round(rows / p50),
+        "peak_mb": round(peak / (1024 ** 2), 1),
+    }
+
+
+def regressions(results, baselines, threshold):
+    """
+    Compares results with baselines.
+
+    Returns:
+        list: One message per metric that regressed beyond the threshold.
+    """
+    messages = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for metric in ("p50_sec", "peak_mb"):
+            if result[metric] > baseline[metric] * (1 + threshold) + NOISE_FLOOR[metric]:
+                messages.append(
+                    f"{name}: {metric} {result[metric]} exceeds baseline {baseline[metric]} "
+                    f"by more than {threshold:.0%}"
+                )
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--orders", type=int, default=40_000)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Query latency of the fakes in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed regression, e.g. 0.25 for 25%%")
+    parser.add_argument("--import-budget", type=float, default=1.0,
+                        help="Maximum seconds to start an interpreter and import query_tool")
+    parser.add_argument("--cases", nargs="*", help="Cases to run (all if omitted)")
+    parser.add_argument("--save", action="store_true",
+                        help="Store the results as the new baselines")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    config = {"events": args.events, "orders": args.orders, "latency_sec": args.latency}
+    cases = make_cases(args)
+    unknown = set(args.cases or []) - set(cases)
+    if unknown:
+        parser.error(f"Unknown cases: {sorted(unknown)}")
+
+    results = {}
+    print(
+        f"{'case':<28}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}{'rows/s':>14}"
+        f"{'peak (MB)':>12}"
+    )
+    for name, (setup, run) in cases.items():
+        if args.cases and name not in args.cases:
+            continue
+        result = results[name] = measure(setup, run, args.repeat)
+        print(
+            f"{name:<28}{result['p50_sec']:>10.3f}{result['p95_sec']:>10.3f}"
+            f"{result['p99_sec']:>10.3f}{result['rows_per_sec']:>14,}{result['peak_mb']:>12.1f}"
+        )
+
+    stored = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as file:
+            stored = json.load(file)
+
+    if args.save:
+        if stored.get("config") != config:
+            stored = {"config": config, "cases": {}}
+        stored["cases"].update(results)
+        with open(BASELINES_PATH, "w") as file:
+            json.dump(stored, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baselines saved to {BASELINES_PATH}")
+        return 0
+
+    messages = []
+    import_result = results.get("import_query_tool")
+    if import_result is not None and import_result["p50_sec"] > args.import_budget:
+        messages.append(
+            f"import_query_tool: p50_sec {import_result['p50_sec']} exceeds the import "
+            f"budget of {args.import_budget} seconds"
+        )
+    if stored.get("config") == config:
+        messages.extend(regressions(results, stored["cases"], args.threshold))
+    else:
+        print("No baselines recorded for this configuration, skipping the regression check.")
+
+    for message in messages:
+        print(f"REGRESSION {message}")
+    if not messages and stored.get("config") == config:
+        print(f"No regressions beyond {args.threshold:.0%} of the baselines.")
+    return 1 if messages else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,7 @@
 # Import necessary libraries
-import pandas as pd
 from dotenv import load_dotenv
+from pipeline import Pipeline
 from query_tool import DatabaseQueryTool
-from utils import read_sql_file
 import os
 
 # Load environment variables
@@ -26,40 +25,11 @@ bigquery_config = {
 # Initialize the query tool
 query_tool = DatabaseQueryTool(snowflake_config, bigquery_config)
 
-# Read SQL queries from files
-snowflake_query = read_sql_file("queries/snowflake_query.sql")
-bigquery_query = read_sql_file("queries/bigquery_query.sql")
-
-# Execute query on BigQuery
-print("Running BigQuery query...")
-bigquery_df = query_tool.query_bigquery(bigquery_query)
-print(f"BigQuery query completed. Retrieved {len(bigquery_df)} rows.")
-
-# Execute query on Snowflake
-print("Running Snowflake query...")
-snowflake_df = query_tool.query_snowflake(snowflake_query)
-print(f"Snowflake query completed. Retrieved {len(snowflake_df)} rows.")
-
-# Inner Join Results
-print("Performing left join on orders, users, and items as skus...")
-join_columns = ["order_id", "user_id", "item_sku"]
-output_columns = [
-    "event_timestamp_utc", "order_id", "user_id", "event_action", "item_sku", "item_price", "traffic_source",
-    "user_country", "device_category"
-]
-
-result_df = query_tool.join_results(bigquery_df, snowflake_df, join_columns, output_columns)
-
-# Output results
-print("Left join completed. Here are the first few rows of the result:")
-print(result_df.head())
-
-# Add a new column to the result - if the event_action is "Add to Cart", then the new column "is_purchase" should be 1, otherwise 0.
-result_df["is_purchase"] = result_df["event_action"].apply(lambda x: 1 if x == "Add to Cart" else 0)
-
-# Write the result_df to a Snowflake table named "orders_items_events"
-table_name = '"orders_items_events"'
-query_tool.write_to_snowflake(result_df, table_name)
+# Run the daily pipeline: extract from BigQuery and Snowflake in parallel, join, derive
+# is_purchase and write to Snowflake. Stages whose inputs did not change are skipped.
+pipeline = Pipeline.from_yaml("pipelines/daily.yaml")
+statuses = pipeline.run(query_tool)
+print(f"Pipeline {pipeline.name} finished: {statuses}")
 
 ## Import logs
 import_logs = query_tool.import_logs
@@ -68,3 +38,7 @@ import_logs
 ## Join logs
 join_logs = query_tool.join_logs
 join_logs
+
+## Timing spans per stage and phase (stage, connect, submit, wait, fetch, convert, join, write)
+span_logs = query_tool.span_logs
+span_logs.groupby(["span", "source"], dropna=False)["time_sec"].sum()
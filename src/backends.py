@@ -0,0 +1,233 @@
+import importlib
+import logging
+import sqlite3
+import threading
+
+import pandas as pd
+
+# Backend factories by name, and the backends created from them (see get_backend)
+_FACTORIES = {}
+_BACKENDS = {}
+_LOCK = threading.Lock()
+_entry_points_loaded = False
+
+# Entry point group third-party packages can use to register backends on install
+ENTRY_POINT_GROUP = "query_tool.backends"
+
+
+class Backend:
+    """
+    A data source DatabaseQueryTool can query by name (see `DatabaseQueryTool.query`).
+
+    Subclasses implement `connect` and `query`; they should import their client libraries
+    inside these methods, so registering a backend costs nothing until it is used.
+    """
+    name = None
+
+    def connect(self, config):
+        """
+        Opens a connection or client.
+
+        Args:
+            config (dict): Backend-specific connection parameters.
+
+        Returns:
+            The connection object passed to `query` and `close`.
+        """
+        raise NotImplementedError
+
+    def query(self, conn, query, params=None):
+        """
+        Executes a query and returns the result.
+
+        Args:
+            conn: The connection returned by `connect`.
+            query (str): The SQL query.
+            params: Optional query parameters in the backend's parameter style.
+
+        Returns:
+            pandas.DataFrame: The query result.
+        """
+        raise NotImplementedError
+
+    def close(self, conn):
+        """
+        Closes a connection returned by `connect`.
+        """
+        conn.close()
+
+
+class BigQueryBackend(Backend):
+    """
+    Google BigQuery, through google-cloud-bigquery (imported on first use).
+    """
+    name = "bigquery"
+
+    @property
+    def sdk(self):
+        """
+        module: The google.cloud.bigquery module.
+        """
+        from google.cloud import bigquery
+
+        return bigquery
+
+    def connect(self, config):
+        return self.sdk.Client.from_service_account_json(config["credentials"])
+
+    def connect_storage(self, config):
+        """
+        Opens a BigQuery Storage Read API client (requires google-cloud-bigquery-storage).
+        """
+        from google.cloud import bigquery_storage
+
+        return bigquery_storage.BigQueryReadClient.from_service_account_json(config["credentials"])
+
+    def query(self, conn, query, params=None):
+        job_config = self.sdk.QueryJobConfig(query_parameters=params) if params else None
+        return conn.query(query, job_config=job_config).result().to_dataframe()
+
+
+class SnowflakeBackend(Backend):
+    """
+    Snowflake, through snowflake-connector-python (imported on first use).
+    """
+    name = "snowflake"
+
+    @property
+    def sdk(self):
+        """
+        module: The snowflake.connector module.
+        """
+        import snowflake.connector
+
+        return snowflake.connector
+
+    def connect(self, config):
+        return self.sdk.connect(**config)
+
+    def query(self, conn, query, params=None):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetch_pandas_all()
+        finally:
+            cursor.close()
+
+
+class SQLiteBackend(Backend):
+    """
+    A local SQLite database, e.g. for tests and examples without warehouse credentials.
+    The config's "database" is a file path, or ":memory:" (the default).
+    """
+    name = "sqlite"
+
+    def __init__(self):
+        # SQLite connections must not be used by two threads at once (e.g. in query_many)
+        self._lock = threading.Lock()
+
+    def connect(self, config):
+        return sqlite3.connect(config.get("database", ":memory:"), check_same_thread=False)
+
+    def query(self, conn, query, params=None):
+        with self._lock:
+            return pd.read_sql_query(query, conn, params=params)
+
+
+def register_backend(name, factory, replace=False):
+    """
+    Registers a backend under a name (case-insensitive).
+
+    Args:
+        name (str): The backend name, used as the source of queries.
+        factory (callable or str): Class or function returning the Backend, or its import path
+            as "module:attribute", so the module is only imported when the backend is used.
+        replace (bool): Whether to replace an already registered backend.
+
+    Raises:
+        ValueError: If a backend with the name is registered and `replace` is not set.
+    """
+    name = name.lower()
+    with _LOCK:
+        if name in _FACTORIES and not replace:
+            raise ValueError(f"Backend '{name}' is already registered.")
+        _FACTORIES[name] = factory
+        _BACKENDS.pop(name, None)
+
+
+def available_backends():
+    """
+    Returns the names of the registered backends, including installed entry points.
+
+    Returns:
+        list: Backend names.
+    """
+    _load_entry_points()
+    with _LOCK:
+        return sorted(_FACTORIES)
+
+
+def get_backend(name):
+    """
+    Returns the backend registered under a name, creating it on first use.
+
+    Args:
+        name (str): The backend name (case-insensitive).
+
+    Returns:
+        Backend: The backend.
+
+    Raises:
+        ValueError: If no backend is registered under the name.
+    """
+    name = name.lower()
+    backend = _BACKENDS.get(name)
+    if backend is not None:
+        return backend
+
+    if name not in _FACTORIES:
+        _load_entry_points()
+    with _LOCK:
+        if name not in _BACKENDS:
+            factory = _FACTORIES.get(name)
+            if factory is None:
+                raise ValueError(f"Unknown backend '{name}', expected one of {sorted(_FACTORIES)}.")
+            if isinstance(factory, str):
+                module_name, _, attribute = factory.partition(":")
+                factory = getattr(importlib.import_module(module_name), attribute)
+            _BACKENDS[name] = factory()
+        return _BACKENDS[name]
+
+
+def bigquery_sdk():
+    """
+    Returns the google.cloud.bigquery module, importing it on first use.
+    """
+    return get_backend("bigquery").sdk
+
+
+def _load_entry_points():
+    """
+    Registers the backends advertised by installed packages in the ENTRY_POINT_GROUP group,
+    once per process. Entry points are only resolved when their backend is used.
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    from importlib.metadata import entry_points
+
+    try:
+        advertised = entry_points(group=ENTRY_POINT_GROUP)
+    except Exception as e:
+        logging.warning(f"Could not read backend entry points: {e}")
+        return
+    for entry_point in advertised:
+        with _LOCK:
+            _FACTORIES.setdefault(entry_point.name.lower(), entry_point.value)
+
+
+register_backend("bigquery", BigQueryBackend)
+register_backend("snowflake", SnowflakeBackend)
+register_backend("sqlite", SQLiteBackend)
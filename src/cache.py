@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# String literals and quoted identifiers are kept verbatim, comments and whitespace are collapsed
+SQL_TOKEN_PATTERN = re.compile(
+    r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"]|"")*"|`[^`]*`)|((?:\s|--[^\n]*|/\*.*?\*/)+)""",
+    re.DOTALL,
+)
+
+
+def normalize_sql(query):
+    """
+    Normalizes SQL text so that formatting-only differences map to the same cache entry.
+
+    Comments are removed, runs of whitespace are collapsed to a single space and trailing
+    semicolons are dropped. String literals and quoted identifiers are left untouched.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        str: The normalized SQL query.
+    """
+    def replace(match):
+        if match.group(1) is not None:
+            return match.group(1)
+        return " "
+
+    normalized = SQL_TOKEN_PATTERN.sub(replace, query).strip()
+    return normalized.rstrip(";").strip()
+
+
+class FileLock:
+    """
+    An exclusive inter-process lock backed by a lock file.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to the lock file (created if it does not exist).
+        """
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class QueryCache:
+    """
+    An on-disk cache of query results stored as Parquet files.
+
+    Entries are keyed by source, normalized SQL text and connection target, expire after
+    `ttl_sec` and are evicted least-recently-used first once the cache exceeds `max_bytes`.
+    Files are written atomically and eviction is serialized with a lock file, so several
+    processes can share one cache directory.
+
+    Attributes:
+        directory (str): Directory holding the cache files.
+        ttl_sec (float): Time to live of an entry in seconds (None for no expiry).
+        max_bytes (int): Byte budget of the cache (None for no limit).
+        hits (int): Number of cache hits served by this instance.
+        misses (int): Number of cache misses seen by this instance.
+    """
+    def __init__(self, directory=".query_cache", ttl_sec=24 * 3600, max_bytes=5 * 1024 ** 3):
+        """
+        Initializes the cache and creates its directory if needed.
+
+        Args:
+            directory (str): Directory holding the cache files.
+            ttl_sec (float): Time to live of an entry in seconds (None for no expiry).
+            max_bytes (int): Byte budget of the cache (None for no limit).
+        """
+        self.directory = directory
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, query, target=None):
+        """
+        Builds the cache key of a query.
+
+        Args:
+            source (str): The data source ("BigQuery" or "Snowflake").
+            query (str): The SQL query.
+            target (dict): Connection target (project, account, database, ...) the query
+                runs against.
+
+        Returns:
+            str: The cache key.
+        """
+        payload = json.dumps(
+            [source.lower(), normalize_sql(query), target or {}], sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _data_path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _metadata_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, validator=None):
+        """
+        Returns the cached result for a key, or None on a miss.
+
+        Args:
+            key (str): The cache key.
+            validator (callable): Optional function receiving the entry metadata and returning
+                False if the entry is stale (e.g. its source tables changed).
+
+        Returns:
+            pandas.DataFrame: The cached result, or None.
+        """
+        try:
+            with open(self._metadata_path(key)) as file:
+                metadata = json.load(file)
+
+            expired = self.ttl_sec is not None and time.time() - metadata["created"] > self.ttl_sec
+            if expired or (validator is not None and not validator(metadata)):
+                logging.info(f"Cache entry {key[:12]} is stale, invalidating it.")
+                self.invalidate(key)
+                self.misses += 1
+                return None
+
+            df = pd.read_parquet(self._data_path(key))
+        except (FileNotFoundError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        # Refresh the access time used for LRU eviction
+        try:
+            os.utime(self._data_path(key))
+        except FileNotFoundError:
+            pass
+
+        self.hits += 1
+        return df
+
+    def put(self, key, df, metadata=None):
+        """
+        Stores a result in the cache and evicts old entries if the byte budget is exceeded.
+
+        Args:
+            key (str): The cache key.
+            df (pd.DataFrame): The result to store.
+            metadata (dict): Additional metadata stored with the entry (e.g. source tables).
+
+        Returns:
+            bool: True if the result was stored.
+        """
+        tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+        data_path = self._data_path(key)
+        metadata_path = self._metadata_path(key)
+
+        try:
+            df.to_parquet(data_path + tmp_suffix, index=False)
+        except Exception as e:
+            logging.warning(f"Result could not be cached: {e}")
+            if os.path.exists(data_path + tmp_suffix):
+                os.remove(data_path + tmp_suffix)
+            return False
+
+        entry = dict(metadata or {})
+        entry["created"] = time.time()
+        entry["bytes"] = os.path.getsize(data_path + tmp_suffix)
+        with open(metadata_path + tmp_suffix, "w") as file:
+            json.dump(entry, file, default=str)
+
+        with FileLock(os.path.join(self.directory, ".lock")):
+            # Data first, metadata last: an entry without metadata is treated as a miss
+            os.replace(data_path + tmp_suffix, data_path)
+            os.replace(metadata_path + tmp_suffix, metadata_path)
+            self._evict()
+
+        return True
+
+    def invalidate(self, key):
+        """
+        Removes an entry from the cache.
+
+        Args:
+            key (str): The cache key.
+        """
+        with FileLock(os.path.join(self.directory, ".lock")):
+            for path in (self._metadata_path(key), self._data_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with FileLock(os.path.join(self.directory, ".lock")):
+            for name in os.listdir(self.directory):
+                if name.endswith((".parquet", ".json", ".tmp")):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _evict(self):
+        """
+        Evicts least-recently-used entries until the cache fits its byte budget.
+        Must be called while holding the cache lock.
+        """
+        if self.max_bytes is None:
+            return
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, name[:-len(".parquet")]))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            logging.info(f"Evicting cache entry {key[:12]} ({size} bytes).")
+            for path in (self._metadata_path(key), self._data_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            total_bytes -= size
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+# Job states reported by QueryJob.status
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueryJob:
+    """
+    A handle on a query running in a warehouse, returned by `DatabaseQueryTool.submit_bigquery`
+    and `submit_snowflake`.
+
+    The query runs server-side, so no thread or connection is held while it runs. The
+    handle can be polled with `status`/`done`, collected with `result` (blocking), awaited
+    from asyncio (`await job` or `result_async`), wrapped in a concurrent.futures.Future
+    with `to_future`, and cancelled server-side with `cancel`. The result is fetched once,
+    when it is first collected, and recorded in the tool's `import_logs` at that moment;
+    its time_sec spans from submission to collection.
+
+    Attributes:
+        tool (DatabaseQueryTool): The tool that submitted the query.
+        source (str): "BigQuery" or "Snowflake".
+        query (str): The SQL query.
+        job_id (str): The BigQuery job ID or Snowflake query ID.
+        submitted_at (float): Submission time (time.time()).
+    """
+    def __init__(self, tool, source, query, job_id):
+        self.tool = tool
+        self.source = source
+        self.query = query
+        self.job_id = job_id
+        self.submitted_at = time.time()
+        self._cancelled = False
+        self._result = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(job_id={self.job_id!r})"
+
+    def status(self):
+        """
+        Returns the state of the query: "running", "succeeded", "failed" or "cancelled".
+        """
+        raise NotImplementedError
+
+    def done(self):
+        """
+        Returns True if the query is no longer running.
+        """
+        return self._result is not None or self.status() != RUNNING
+
+    def cancel(self):
+        """
+        Cancels the query server-side. Cancelling a finished query has no effect.
+
+        Returns:
+            bool: True if the query was still running.
+        """
+        if self.done():
+            return False
+        logging.info(f"Cancelling {self.source} query {self.job_id}...")
+        self._cancel()
+        self._cancelled = True
+        return True
+
+    def wait(self, timeout=None, poll_interval=1.0):
+        """
+        Blocks until the query is no longer running.
+
+        Args:
+            timeout (float): Maximum seconds to wait (None to wait indefinitely).
+            poll_interval (float): Maximum seconds between status checks; checks start
+                at 0.1 seconds and back off to this interval.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the query is still running after `timeout`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.1
+        while not self.done():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(
+                    f"{self.source} query {self.job_id} still running after {timeout} seconds."
+                )
+            time.sleep(delay if remaining is None else min(delay, remaining))
+            delay = min(delay * 2, poll_interval)
+
+    def result(self, timeout=None, poll_interval=1.0, cancel_on_timeout=False):
+        """
+        Waits for the query and returns its result, fetching it on the first call.
+
+        Args:
+            timeout (float): Maximum seconds to wait for the query (None to wait indefinitely).
+            poll_interval (float): Maximum seconds between status checks.
+            cancel_on_timeout (bool): Cancel the query server-side if it times out.
+
+        Returns:
+            pandas.DataFrame: The query result.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the query is still running after `timeout`.
+            Exception: The warehouse error if the query failed or was cancelled.
+        """
+        try:
+            self.wait(timeout, poll_interval)
+        except TimeoutError:
+            if cancel_on_timeout:
+                self.cancel()
+            raise
+
+        with self._lock:
+            if self._result is None:
+                start_time = time.time()
+                df = self._fetch()
+                self.tool._log_import(
+                    self.source, self.query, len(df), len(df.columns), self._data_mb(),
+                    time.time() - self.submitted_at,
+                )
+                logging.info(
+                    f"{self.source} job {self.job_id} collected: Rows={len(df)}, "
+                    f"Columns={len(df.columns)}, Fetch Time={time.time() - start_time:.2f} seconds."
+                )
+                self._result = df
+        return self._result
+
+    async def result_async(self, timeout=None, poll_interval=1.0, cancel_on_timeout=False):
+        """
+        Awaits the query without blocking the event loop and returns its result.
+        Status checks and the download run in the loop's default executor.
+
+        Args:
+            timeout (float): Maximum seconds to wait for the query (None to wait indefinitely).
+            poll_interval (float): Maximum seconds between status checks.
+            cancel_on_timeout (bool): Cancel the query server-side if it times out.
+
+        Returns:
+            pandas.DataFrame: The query result.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.1
+        try:
+            while not await loop.run_in_executor(None, self.done):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"{self.source} query {self.job_id} still running after {timeout} seconds."
+                    )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, poll_interval)
+        except (TimeoutError, asyncio.CancelledError):
+            if cancel_on_timeout:
+                await loop.run_in_executor(None, self.cancel)
+            raise
+        return await loop.run_in_executor(None, self.result)
+
+    def __await__(self):
+        return self.result_async().__await__()
+
+    def to_future(self, timeout=None, poll_interval=1.0):
+        """
+        Returns a concurrent.futures.Future resolved with the result by a background thread,
+        e.g. to combine jobs with concurrent.futures.wait or as_completed.
+
+        The future stays pending while the query runs, so cancelling it before the query
+        finishes cancels the query server-side. Once the query is done the future runs
+        (fetching the result) and can no longer be cancelled.
+
+        Args:
+            timeout (float): Maximum seconds to wait for the query (None to wait indefinitely).
+            poll_interval (float): Maximum seconds between status checks.
+
+        Returns:
+            concurrent.futures.Future: The future result.
+        """
+        future = Future()
+
+        def on_done(completed):
+            if completed.cancelled():
+                self.cancel()
+
+        def collect():
+            deadline = None if timeout is None else time.monotonic() + timeout
+            delay = 0.1
+            try:
+                while not self.done():
+                    if future.cancelled():
+                        return
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError(
+                            f"{self.source} query {self.job_id} still running after "
+                            f"{timeout} seconds."
+                        )
+                    time.sleep(delay)
+                    delay = min(delay * 2, poll_interval)
+            except BaseException as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+                return
+
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.result())
+            except BaseException as e:
+                future.set_exception(e)
+
+        future.add_done_callback(on_done)
+        threading.Thread(target=collect, name=f"collect-{self.job_id}", daemon=True).start()
+        return future
+
+    def _fetch(self):
+        raise NotImplementedError
+
+    def _cancel(self):
+        raise NotImplementedError
+
+    def _data_mb(self):
+        return None
+
+
+class BigQueryJob(QueryJob):
+    """
+    A handle on a BigQuery query job.
+
+    Attributes:
+        query_job (bigquery.QueryJob): The job.
+    """
+    def __init__(self, tool, query, query_job):
+        super().__init__(tool, "BigQuery", query, query_job.job_id)
+        self.query_job = query_job
+
+    def status(self):
+        if self._cancelled:
+            return CANCELLED
+        if not self.query_job.done():  # reloads the job state
+            return RUNNING
+        return FAILED if self.query_job.error_result else SUCCEEDED
+
+    def _cancel(self):
+        self.query_job.cancel()
+
+    def _fetch(self):
+        metrics = self.tool.metrics
+        with metrics.span("wait", "BigQuery", job_id=self.job_id) as span:
+            result = self.query_job.result()
+            span.set(rows=result.total_rows, bytes=self.query_job.total_bytes_processed)
+        with metrics.span("fetch", "BigQuery", job_id=self.job_id) as span:
+            df = result.to_dataframe()
+            span.set(rows=len(df), bytes=int(df.memory_usage(index=False).sum()))
+        return self.tool._compact(df, "BigQuery")
+
+    def _data_mb(self):
+        return (self.query_job.total_bytes_billed or 0) * 0.000001
+
+
+class SnowflakeJob(QueryJob):
+    """
+    A handle on a Snowflake query submitted with execute_async.
+
+    Status checks and result retrieval check a connection out of the tool's pool only for
+    the duration of the call; Snowflake keeps the result of the query ID for 24 hours.
+
+    Attributes:
+        use_arrow (bool): Whether to fetch the result through the Arrow path.
+        arrow_dtypes (bool): Whether to keep Arrow-backed dtypes.
+    """
+    def __init__(self, tool, query, query_id, use_arrow=True, arrow_dtypes=False):
+        super().__init__(tool, "Snowflake", query, query_id)
+        self.use_arrow = use_arrow
+        self.arrow_dtypes = arrow_dtypes
+
+    def status(self):
+        with self.tool.snowflake_connection() as conn:
+            status = conn.get_query_status(self.job_id)
+            if conn.is_still_running(status):
+                return RUNNING
+            if self._cancelled or status.name in ("ABORTING", "ABORTED"):
+                return CANCELLED
+            return FAILED if conn.is_an_error(status) else SUCCEEDED
+
+    def _cancel(self):
+        with self.tool.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (self.job_id,))
+            finally:
+                cursor.close()
+
+    def _fetch(self):
+        with self.tool.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                with self.tool.metrics.span("wait", "Snowflake", job_id=self.job_id):
+                    # Raises the query's error if it failed or was cancelled
+                    conn.get_query_status_throw_if_error(self.job_id)
+                    cursor.get_results_from_sfqid(self.job_id)
+                df = self.tool._fetch_snowflake(cursor, self.use_arrow, self.arrow_dtypes)
+            finally:
+                cursor.close()
+        return self.tool._compact(df, "Snowflake")
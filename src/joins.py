@@ -0,0 +1,396 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Name of the temporary composite key column used during the merge
+JOIN_KEY_COLUMN = "__join_key__"
+JOIN_TYPES = ("inner", "left", "right", "outer")
+# Rough ratio of peak memory during an in-memory join to the size of its inputs
+JOIN_MEMORY_FACTOR = 3
+
+
+def _is_string_like(series):
+    """
+    Checks whether a Series holds strings (object, pandas string, Arrow string or categorical).
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _is_string_like(pd.Series(dtype.categories))
+    return (
+        pd.api.types.is_object_dtype(dtype)
+        or pd.api.types.is_string_dtype(dtype)
+        or (isinstance(dtype, pd.ArrowDtype) and pd.api.types.is_string_dtype(dtype.numpy_dtype))
+    )
+
+
+def _keys_compatible(left, right):
+    """
+    Checks whether two key columns can be compared without converting them to strings.
+    """
+    if _is_string_like(left) and _is_string_like(right):
+        return True
+    # Booleans count as numeric, but only compare numerically with booleans
+    any_bool = pd.api.types.is_bool_dtype(left.dtype) or pd.api.types.is_bool_dtype(right.dtype)
+    for check in (pd.api.types.is_numeric_dtype, pd.api.types.is_datetime64_any_dtype):
+        if check(left.dtype) and check(right.dtype) and not any_bool:
+            return True
+    return left.dtype == right.dtype
+
+
+def shared_codes(left, right):
+    """
+    Encodes two key columns with a shared integer dictionary.
+
+    Each side is factorized on its own dtype, and only the distinct values are aligned
+    between the sides, so equal values get equal codes on both sides and nulls get -1.
+    Columns with incompatible dtypes (e.g. integers and strings) are compared by the string
+    representation of their distinct values, like the original string-cast join.
+
+    Args:
+        left (pd.Series): Key column of the left frame.
+        right (pd.Series): Key column of the right frame.
+
+    Returns:
+        tuple: (left_codes, right_codes) as int64 NumPy arrays.
+    """
+    left_codes, left_uniques = pd.factorize(left)
+    right_codes, right_uniques = pd.factorize(right)
+
+    left_uniques = pd.Series(np.asarray(left_uniques))
+    right_uniques = pd.Series(np.asarray(right_uniques))
+    if not _keys_compatible(left, right):
+        left_uniques = left_uniques.astype(str)
+        right_uniques = right_uniques.astype(str)
+
+    unique_codes, _ = pd.factorize(pd.concat([left_uniques, right_uniques], ignore_index=True))
+    left_map = unique_codes[:len(left_uniques)].astype(np.int64)
+    right_map = unique_codes[len(left_uniques):].astype(np.int64)
+
+    # Append -1 so that null codes (-1) index the last element and stay -1
+    left_codes = np.append(left_map, -1)[left_codes]
+    right_codes = np.append(right_map, -1)[right_codes]
+    return left_codes, right_codes
+
+
+def composite_key(left, right, on):
+    """
+    Builds a single int64 join key per row from one or more key columns.
+
+    The per-column codes are combined pairwise and re-factorized after each step,
+    so the key stays within int64 for any number of columns.
+
+    Args:
+        left (pd.DataFrame): The left frame.
+        right (pd.DataFrame): The right frame.
+        on (list): Key column names present in both frames.
+
+    Returns:
+        tuple: (left_key, right_key) as int64 NumPy arrays.
+    """
+    left_key, right_key = None, None
+    for column in on:
+        left_codes, right_codes = shared_codes(left[column], right[column])
+        if left_key is None:
+            left_key, right_key = left_codes, right_codes
+            continue
+
+        # Shift by one so nulls (-1) stay distinct, then compress back to dense codes
+        cardinality = max(left_codes.max(initial=-1), right_codes.max(initial=-1)) + 2
+        combined = np.concatenate([left_key, right_key]) * cardinality + np.concatenate(
+            [left_codes, right_codes]
+        ) + 1
+        codes, _ = pd.factorize(combined)
+        left_key, right_key = codes[:len(left)], codes[len(left):]
+
+    return left_key.astype(np.int64, copy=False), right_key.astype(np.int64, copy=False)
+
+
+def count_duplicate_rows(df, method="hash"):
+    """
+    Counts duplicated rows in a DataFrame.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to check.
+        method (str): "hash" compares one 64-bit hash per row, "full" compares all values.
+
+    Returns:
+        int: Number of rows that duplicate an earlier row.
+    """
+    if df.empty:
+        return 0
+    if method == "full":
+        return int(df.duplicated().sum())
+    return int(pd.util.hash_pandas_object(df, index=False).duplicated().sum())
+
+
+def hash_join(left, right, on, columns=None, how="inner", check_duplicates="hash"):
+    """
+    Joins two DataFrames on key columns without modifying them.
+
+    Key columns are encoded into a single shared int64 key instead of being cast to
+    strings, and both inputs are projected to the requested output columns before the
+    merge. Output columns present in both frames are taken from the left frame; for
+    outer and right joins, key columns are filled from the right frame where the left
+    side has no match.
+
+    Args:
+        left (pd.DataFrame): The left frame.
+        right (pd.DataFrame): The right frame.
+        on (list): Key column names present in both frames.
+        columns (list): Output columns. Defaults to all columns of both frames.
+        how (str): Join type: "inner", "left", "right" or "outer".
+        check_duplicates (str): "hash", "full" or None/False to skip the duplicate row check.
+
+    Returns:
+        tuple: (joined DataFrame, number of duplicated rows or None if not checked).
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Unknown join type '{how}', expected one of {JOIN_TYPES}.")
+
+    if columns is None:
+        columns = list(left.columns) + [col for col in right.columns if col not in left.columns]
+    missing_columns = [
+        col for col in columns if col not in left.columns and col not in right.columns
+    ]
+    if missing_columns:
+        raise KeyError(f"Output columns not found in either DataFrame: {missing_columns}")
+
+    left_key, right_key = composite_key(left, right, on)
+
+    left_columns = [col for col in columns if col in left.columns]
+    right_columns = [col for col in columns if col in right.columns and col not in left_columns]
+    # Key columns are carried from the right side too when unmatched left rows may be missing them
+    right_key_columns = []
+    if how in ("right", "outer"):
+        right_key_columns = [col for col in on if col in left_columns]
+
+    left_projected = left[left_columns].assign(**{JOIN_KEY_COLUMN: left_key})
+    right_projected = right[right_columns + right_key_columns].rename(
+        columns={col: f"{col}__right" for col in right_key_columns}
+    ).assign(**{JOIN_KEY_COLUMN: right_key})
+
+    joined = pd.merge(left_projected, right_projected, on=JOIN_KEY_COLUMN, how=how, sort=False)
+
+    for col in right_key_columns:
+        joined[col] = joined[col].where(joined[col].notna(), joined[f"{col}__right"])
+
+    result = joined[columns]
+
+    duplicated_rows = None
+    if check_duplicates:
+        duplicated_rows = count_duplicate_rows(result, check_duplicates)
+
+    return result, duplicated_rows
+
+
+def estimate_join_memory_mb(*frames):
+    """
+    Estimates the peak memory of an in-memory join of the given DataFrames in MB.
+
+    Args:
+        *frames (pd.DataFrame): The join inputs.
+
+    Returns:
+        float: Estimated peak memory in MB.
+    """
+    input_bytes = sum(df.memory_usage(deep=True).sum() for df in frames)
+    return JOIN_MEMORY_FACTOR * input_bytes / (1024 ** 2)
+
+
+def normalized_key_strings(column):
+    """
+    Converts the distinct values of a key column to strings that are equal for values the
+    in-memory join considers equal (e.g. 7, 7.0 and "7"), and returns them with the codes.
+    """
+    codes, uniques = pd.factorize(column)
+    uniques = pd.Series(np.asarray(uniques))
+    dtype = uniques.dtype
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        values = uniques.astype("float64")
+        strings = values.astype(str)
+        integral = np.isfinite(values) & (values == np.floor(values))
+        strings[integral] = values[integral].astype("int64").astype(str)
+    else:
+        strings = uniques.astype(str)
+    return codes, strings
+
+
+def partition_ids(df, on, num_partitions):
+    """
+    Assigns each row of a DataFrame to a hash partition of its key columns.
+
+    Keys are hashed through the string form of their distinct values, so rows with keys
+    that join with each other land in the same partition on both sides, even if the key
+    dtypes differ between the sides.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to partition.
+        on (list): Key column names.
+        num_partitions (int): Number of partitions.
+
+    Returns:
+        numpy.ndarray: Partition index of each row.
+    """
+    row_hashes = np.zeros(len(df), dtype=np.uint64)
+    for column in on:
+        codes, strings = normalized_key_strings(df[column])
+        unique_hashes = pd.util.hash_array(strings.to_numpy(dtype=object))
+        # Nulls (code -1) hash to 0
+        column_hashes = np.append(unique_hashes, np.uint64(0))[codes]
+        row_hashes = row_hashes * np.uint64(1_000_003) ^ column_hashes
+    return (row_hashes % np.uint64(num_partitions)).astype(np.int64)
+
+
+def _iter_frames(data, chunk_rows):
+    """
+    Yields pandas DataFrames from a DataFrame (sliced into chunks) or an iterable of
+    DataFrames / pyarrow Tables.
+    """
+    if isinstance(data, pd.DataFrame):
+        for offset in range(0, len(data), chunk_rows):
+            yield data.iloc[offset:offset + chunk_rows]
+        return
+    for chunk in data:
+        yield chunk if isinstance(chunk, pd.DataFrame) else chunk.to_pandas()
+
+
+def _spill(chunks, on, columns, num_partitions, directory):
+    """
+    Hash-partitions a stream of DataFrames into Parquet spill files.
+
+    Args:
+        chunks (iterable): pandas DataFrames.
+        on (list): Key column names.
+        columns (list): Columns to keep (None for all); key columns are always kept.
+        num_partitions (int): Number of partitions.
+        directory (str): Directory receiving one sub-directory per partition.
+
+    Returns:
+        pd.DataFrame: An empty DataFrame with the spilled schema (None if there were no chunks).
+    """
+    schema = None
+    for chunk_index, chunk in enumerate(chunks):
+        if columns is not None:
+            chunk = chunk[[col for col in chunk.columns if col in columns or col in on]]
+        if schema is None:
+            schema = chunk.iloc[:0]
+
+        partitions = partition_ids(chunk, on, num_partitions)
+        order = np.argsort(partitions, kind="stable")
+        boundaries = np.searchsorted(partitions[order], np.arange(num_partitions + 1))
+        for partition in range(num_partitions):
+            rows = order[boundaries[partition]:boundaries[partition + 1]]
+            if len(rows) == 0:
+                continue
+            partition_dir = os.path.join(directory, f"{partition:05d}")
+            os.makedirs(partition_dir, exist_ok=True)
+            chunk.take(rows).to_parquet(
+                os.path.join(partition_dir, f"{chunk_index:06d}.parquet"), index=False
+            )
+    return schema
+
+
+def _read_partition(directory, partition, schema):
+    """
+    Reads all spill files of one partition, or returns the empty schema frame if there are none.
+    """
+    partition_dir = os.path.join(directory, f"{partition:05d}")
+    if not os.path.isdir(partition_dir):
+        return schema
+    paths = sorted(os.listdir(partition_dir))
+    return pd.concat(
+        [pd.read_parquet(os.path.join(partition_dir, path)) for path in paths], ignore_index=True
+    )
+
+
+def _join_partition(partition, left_dir, right_dir, left_schema, right_schema, on, columns, how,
+                    check_duplicates):
+    """
+    Joins one partition of the spilled inputs. Runs in a worker process when parallel.
+    """
+    left = _read_partition(left_dir, partition, left_schema)
+    right = _read_partition(right_dir, partition, right_schema)
+    if how == "inner" and (left.empty or right.empty):
+        return pd.DataFrame(columns=columns), 0
+    return hash_join(left, right, on, columns, how=how, check_duplicates=check_duplicates)
+
+
+def partitioned_join(left, right, on, columns=None, how="inner", num_partitions=16, spill_dir=None,
+                     workers=1, chunk_rows=500_000, check_duplicates="hash"):
+    """
+    Joins two inputs that do not fit in memory together by hash-partitioning them to disk.
+
+    Both inputs are projected and hash-partitioned on the key columns into Parquet spill
+    files, then joined partition by partition with `hash_join`. Rows with equal keys always
+    land in the same partition, so duplicate rows can be counted per partition. Partitions
+    can be joined in parallel worker processes; results are yielded in partition order.
+
+    Args:
+        left (pd.DataFrame or iterable): The left input, a DataFrame or an iterable of
+            DataFrames / pyarrow Tables (e.g. from `DatabaseQueryTool.iter_bigquery`).
+        right (pd.DataFrame or iterable): The right input, in the same forms.
+        on (list): Key column names present in both inputs.
+        columns (list): Output columns. Defaults to all columns of both inputs.
+        how (str): Join type: "inner", "left", "right" or "outer".
+        num_partitions (int): Number of hash partitions.
+        spill_dir (str): Parent directory of the spill files (defaults to the system temp dir).
+        workers (int): Number of worker processes joining partitions (1 joins in-process).
+        chunk_rows (int): Rows per slice when partitioning DataFrame inputs.
+        check_duplicates (str): "hash", "full" or None/False to skip the duplicate row check.
+
+    Yields:
+        tuple: (joined DataFrame of one partition, its duplicated row count or None).
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Unknown join type '{how}', expected one of {JOIN_TYPES}.")
+
+    directory = tempfile.mkdtemp(prefix="join_spill_", dir=spill_dir)
+    try:
+        left_dir = os.path.join(directory, "left")
+        right_dir = os.path.join(directory, "right")
+        left_schema = _spill(_iter_frames(left, chunk_rows), on, columns, num_partitions, left_dir)
+        if left_schema is None:
+            raise ValueError("The left input of the join is empty and has no schema.")
+
+        right_columns = None
+        if columns is not None:
+            right_columns = [col for col in columns if col not in left_schema.columns]
+        right_schema = _spill(
+            _iter_frames(right, chunk_rows), on, right_columns, num_partitions, right_dir
+        )
+        if right_schema is None:
+            raise ValueError("The right input of the join is empty and has no schema.")
+
+        if columns is None:
+            columns = list(left_schema.columns) + [
+                col for col in right_schema.columns if col not in left_schema.columns
+            ]
+
+        args = (left_dir, right_dir, left_schema, right_schema, on, columns, how, check_duplicates)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # At most `workers` partitions are joined ahead of the one being yielded, so
+                # finished results do not pile up in memory
+                futures = {}
+                try:
+                    for partition in range(num_partitions):
+                        for ahead in range(partition, min(partition + workers, num_partitions)):
+                            if ahead not in futures:
+                                futures[ahead] = executor.submit(_join_partition, ahead, *args)
+                        result, duplicated_rows = futures.pop(partition).result()
+                        if len(result):
+                            yield result, duplicated_rows
+                finally:
+                    for future in futures.values():
+                        future.cancel()
+        else:
+            for partition in range(num_partitions):
+                result, duplicated_rows = _join_partition(partition, *args)
+                if len(result):
+                    yield result, duplicated_rows
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
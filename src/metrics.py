@@ -0,0 +1,286 @@
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Columns of the log tables exposed by DatabaseQueryTool, in display order
+IMPORT_LOG_COLUMNS = [
+    "source", "query", "mode", "rows", "columns", "data_mb", "time_sec", "cache", "retries",
+    "wasted_sec", "timestamp",
+]
+JOIN_LOG_COLUMNS = [
+    "df1_shape", "df2_shape", "join_columns", "output_columns", "how", "mode", "result_shape",
+    "duplicate_rows", "time_sec", "timestamp",
+]
+WRITE_LOG_COLUMNS = ["table", "method", "phase", "rows", "bytes", "time_sec", "timestamp"]
+PLAN_LOG_COLUMNS = [
+    "placement", "how", "reason", "bigquery_bytes_est", "snowflake_bytes_est", "output_bytes_est",
+    "costs", "bigquery_bytes", "snowflake_bytes", "output_bytes", "time_sec", "timestamp",
+]
+SPAN_COLUMNS = [
+    "span", "source", "rows", "bytes", "time_sec", "process_peak_rss_mb", "error", "labels",
+    "timestamp",
+]
+
+
+def process_peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process in MB, or None if unavailable.
+
+    This is the high-water mark over the whole process lifetime, not the memory used by one
+    span: it only grows, so a span shows a higher value only if it raised the peak.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / (1024 ** 2)
+    except (ImportError, AttributeError):
+        return None
+
+
+class Span:
+    """
+    A timed phase of an operation (connect, submit, wait, fetch, convert, join, write).
+
+    Attributes:
+        name (str): The phase name.
+        source (str): The data source or target the phase works on.
+        rows (int): Number of rows handled in the phase (None if unknown).
+        bytes (int): Number of bytes handled in the phase (None if unknown).
+        labels (dict): Additional labels, e.g. the write method.
+    """
+    def __init__(self, name, source=None, **labels):
+        self.name = name
+        self.source = source
+        self.rows = None
+        self.bytes = None
+        self.labels = labels
+
+    def set(self, rows=None, bytes=None, **labels):
+        """
+        Records the rows and bytes handled in the span, and additional labels.
+        """
+        if rows is not None:
+            self.rows = rows
+        if bytes is not None:
+            self.bytes = bytes
+        self.labels.update(labels)
+
+
+class MetricsRecorder:
+    """
+    An append-only, thread-safe, in-memory recorder of operation logs and timing spans.
+
+    Records are plain dicts appended to per-kind lists ("import", "join", "write", "plan", "span"),
+    so recording is O(1); DataFrames are only built on export. Hooks registered with
+    `add_hook` are called with the kind and record after each append, e.g. for profiling.
+    """
+    def __init__(self):
+        self._records = {"import": [], "join": [], "write": [], "plan": [], "span": []}
+        self._lock = threading.Lock()
+        self._hooks = []
+
+    def record(self, kind, **fields):
+        """
+        Appends a record.
+
+        Args:
+            kind (str): The record kind ("import", "join", "write", "plan" or "span").
+            **fields: The record fields; a timestamp is added if missing.
+
+        Returns:
+            dict: The appended record.
+        """
+        fields.setdefault("timestamp", time.strftime("%Y-%m-%d %H:%M:%S"))
+        with self._lock:
+            self._records.setdefault(kind, []).append(fields)
+            hooks = list(self._hooks)
+        for hook in hooks:
+            try:
+                hook(kind, fields)
+            except Exception as e:
+                logging.warning(f"Metrics hook {hook!r} failed: {e}")
+        return fields
+
+    @contextmanager
+    def span(self, name, source=None, **labels):
+        """
+        Times a block and records it as a span, also when the block raises.
+
+        Args:
+            name (str): The phase name.
+            source (str): The data source or target.
+            **labels: Additional labels.
+
+        Yields:
+            Span: The span, on which the block can set rows, bytes and labels.
+        """
+        span = Span(name, source, **labels)
+        start_time = time.perf_counter()
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            self.record_span(
+                name, time.perf_counter() - start_time, source, span.rows, span.bytes, error,
+                **span.labels,
+            )
+
+    def record_span(self, name, time_sec, source=None, rows=None, bytes=None, error=None, **labels):
+        """
+        Records a span that was timed by the caller, e.g. one spread over a generator's lifetime.
+
+        Args:
+            name (str): The phase name.
+            time_sec (float): Duration of the phase in seconds.
+            source (str): The data source or target.
+            rows (int): Number of rows handled in the phase.
+            bytes (int): Number of bytes handled in the phase.
+            error (str): The error raised in the phase, if any.
+            **labels: Additional labels.
+
+        Returns:
+            dict: The appended record.
+        """
+        return self.record(
+            "span",
+            span=name,
+            source=source,
+            rows=rows,
+            bytes=bytes,
+            time_sec=time_sec,
+            process_peak_rss_mb=process_peak_rss_mb(),
+            error=error,
+            labels=labels,
+        )
+
+    def add_hook(self, hook):
+        """
+        Registers a function called as hook(kind, record) after each record is appended.
+
+        Args:
+            hook (callable): The hook function.
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        Unregisters a hook.
+
+        Args:
+            hook (callable): The hook function.
+        """
+        with self._lock:
+            self._hooks.remove(hook)
+
+    def records(self, kind):
+        """
+        Returns a copy of the records of one kind.
+
+        Args:
+            kind (str): The record kind.
+
+        Returns:
+            list: The records as dicts.
+        """
+        with self._lock:
+            return list(self._records.get(kind, []))
+
+    def to_dataframe(self, kind, columns=None):
+        """
+        Exports the records of one kind as a DataFrame.
+
+        Args:
+            kind (str): The record kind.
+            columns (list): Columns of the DataFrame, in order. Missing fields are left empty.
+
+        Returns:
+            pandas.DataFrame: One row per record.
+        """
+        records = self.records(kind)
+        if columns is None:
+            columns = list(dict.fromkeys(key for record in records for key in record))
+        return pd.DataFrame.from_records(records, columns=columns)
+
+    def to_jsonl(self, path=None):
+        """
+        Exports all records as JSON lines with a "kind" field.
+
+        Args:
+            path (str): Optional file to append the lines to.
+
+        Returns:
+            str: The JSON lines.
+        """
+        with self._lock:
+            records = [(kind, list(items)) for kind, items in self._records.items()]
+        lines = "".join(
+            json.dumps({"kind": kind, **record}, default=str) + "\n"
+            for kind, items in records
+            for record in items
+        )
+        if path is not None:
+            with open(path, "a") as file:
+                file.write(lines)
+        return lines
+
+    def to_prometheus(self, prefix="query_tool"):
+        """
+        Exports span totals in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): Metric name prefix.
+
+        Returns:
+            str: The metrics text.
+        """
+        totals = {}
+        for record in self.records("span"):
+            key = (record["span"], record["source"] or "")
+            total = totals.setdefault(
+                key, {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "errors": 0}
+            )
+            total["count"] += 1
+            total["seconds"] += record["time_sec"]
+            total["rows"] += record["rows"] or 0
+            total["bytes"] += record["bytes"] or 0
+            total["errors"] += record["error"] is not None
+
+        lines = []
+        for metric, help_text in (
+            ("count", "Number of completed spans"),
+            ("seconds", "Total time spent in spans"),
+            ("rows", "Total rows handled in spans"),
+            ("bytes", "Total bytes handled in spans"),
+            ("errors", "Number of spans that raised"),
+        ):
+            name = f"{prefix}_span_{metric}_total"
+            lines.append(f"# HELP {name} {help_text}.")
+            lines.append(f"# TYPE {name} counter")
+            for (span, source), total in sorted(totals.items()):
+                lines.append(f'{name}{{span="{span}",source="{source}"}} {total[metric]}')
+
+        rss = process_peak_rss_mb()
+        if rss is not None:
+            name = f"{prefix}_process_peak_rss_megabytes"
+            lines.append(f"# HELP {name} Peak resident set size over the process lifetime.")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {rss:.1f}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,181 @@
+import datetime
+
+import pandas as pd
+
+from cache import normalize_sql
+
+# Identifier quoting of each warehouse dialect
+QUOTES = {"snowflake": '"{}"', "bigquery": "`{}`"}
+
+# Hash of a column as a signed 64-bit integer; NULLs hash like the empty string
+HASH_FUNCTIONS = {
+    "snowflake": "HASH({})",
+    "bigquery": "FARM_FINGERPRINT(COALESCE(CAST({} AS STRING), ''))",
+}
+
+
+def sql_literal(value):
+    """
+    Renders a partition bound as a SQL literal understood by Snowflake and BigQuery.
+
+    Args:
+        value: An int, float, str, date, datetime or pd.Timestamp.
+
+    Returns:
+        str: The literal.
+    """
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, datetime.date):
+        return f"DATE '{value.isoformat()}'"
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f"Unsupported partition bound type: {type(value).__name__}")
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+class HashPartitions:
+    """
+    Splits a query into `count` partitions by the hash of a column modulo `count`.
+
+    Every row falls into exactly one partition whatever the column's values, but each
+    partition scans the whole input of the query.
+
+    Attributes:
+        column (str): The column to hash, e.g. "order_id".
+        count (int): Number of partitions.
+    """
+    def __init__(self, column, count):
+        if count < 1:
+            raise ValueError(f"Invalid partition count: {count}")
+        self.column = column
+        self.count = count
+
+    def predicates(self, dialect):
+        """
+        Returns the WHERE predicate of each partition, in partition order.
+
+        Args:
+            dialect (str): "snowflake" or "bigquery".
+
+        Returns:
+            list: SQL predicates on the `source` alias.
+        """
+        column = "source." + QUOTES[dialect].format(self.column)
+        hashed = HASH_FUNCTIONS[dialect].format(column)
+        # MOD keeps the sign of the hash, so shift it into 0..count-1
+        return [f"MOD(MOD({hashed}, {self.count}) + {self.count}, {self.count}) = {index}"
+                for index in range(self.count)]
+
+    def __repr__(self):
+        return f"HashPartitions(column={self.column!r}, count={self.count})"
+
+
+class RangePartitions:
+    """
+    Splits a query into ranges of a column between sorted bounds.
+
+    The first partition holds values below the first bound, the last one values from the
+    last bound on, and a final partition holds NULLs, so no row is lost. Ranges on a
+    clustered or partitioned column (e.g. a date) let the warehouse prune what each
+    partition scans.
+
+    Attributes:
+        column (str): The column to split, e.g. "event_timestamp_utc".
+        bounds (list): Sorted inner bounds; N bounds give N + 2 partitions.
+    """
+    def __init__(self, column, bounds):
+        bounds = list(bounds)
+        if not bounds:
+            raise ValueError("Range partitions need at least one bound.")
+        if any(lower >= upper for lower, upper in zip(bounds, bounds[1:])):
+            raise ValueError("Range partition bounds must be strictly increasing.")
+        self.column = column
+        self.bounds = bounds
+
+    @classmethod
+    def dates(cls, column, start, end, freq="1D"):
+        """
+        Creates range partitions splitting [start, end) into periods of `freq`
+        (a pandas frequency, e.g. "1D" or "7D"), plus the open ranges outside it.
+
+        Args:
+            column (str): The date or timestamp column.
+            start: First bound (date, timestamp or ISO string).
+            end: Last bound.
+            freq (str): Length of each period.
+        """
+        bounds = pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=freq)
+        if isinstance(start, datetime.date) and not isinstance(start, datetime.datetime):
+            bounds = [bound.date() for bound in bounds]
+        return cls(column, list(bounds))
+
+    def predicates(self, dialect):
+        """
+        Returns the WHERE predicate of each partition, in partition order.
+
+        Args:
+            dialect (str): "snowflake" or "bigquery".
+
+        Returns:
+            list: SQL predicates on the `source` alias.
+        """
+        column = "source." + QUOTES[dialect].format(self.column)
+        literals = [sql_literal(bound) for bound in self.bounds]
+        predicates = [f"{column} < {literals[0]}"]
+        predicates.extend(
+            f"{column} >= {lower} AND {column} < {upper}"
+            for lower, upper in zip(literals, literals[1:])
+        )
+        predicates.append(f"{column} >= {literals[-1]}")
+        predicates.append(f"{column} IS NULL")
+        return predicates
+
+    def __repr__(self):
+        return f"RangePartitions(column={self.column!r}, bounds={self.bounds!r})"
+
+
+def make_partitions(spec):
+    """
+    Builds partitions from a HashPartitions/RangePartitions object or a spec dict, e.g.
+    {"column": "order_id", "hash": 8} or {"column": "event_timestamp_utc", "start": "2017-08-01",
+    "end": "2018-08-01", "freq": "30D"} or {"column": "order_id", "bounds": [...]}.
+
+    Args:
+        spec: Partitions object or spec dict.
+
+    Returns:
+        HashPartitions or RangePartitions: The partitions.
+    """
+    if isinstance(spec, (HashPartitions, RangePartitions)):
+        return spec
+    if "hash" in spec:
+        return HashPartitions(spec["column"], spec["hash"])
+    if "bounds" in spec:
+        return RangePartitions(spec["column"], spec["bounds"])
+    if "start" in spec:
+        return RangePartitions.dates(
+            spec["column"], spec["start"], spec["end"], spec.get("freq", "1D")
+        )
+    raise ValueError(f"Invalid partition spec: {spec}")
+
+
+def partition_queries(query, partitions, dialect):
+    """
+    Wraps a query once per partition, filtered to the partition's rows.
+
+    Args:
+        query (str): The SQL query.
+        partitions (HashPartitions or RangePartitions): The partitions.
+        dialect (str): "snowflake" or "bigquery".
+
+    Returns:
+        list: The partition queries, in partition order.
+    """
+    return [
+        f"SELECT *\nFROM (\n{normalize_sql(query)}\n) AS source\nWHERE {predicate}"
+        for predicate in partitions.predicates(dialect)
+    ]
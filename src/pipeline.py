@@ -0,0 +1,380 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from cache import normalize_sql
+from storage import LocalDataset
+from utils import read_sql_file
+
+
+def frame_fingerprint(df):
+    """
+    Hashes the contents of a DataFrame (column names, dtypes and values, not the index).
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+
+    Returns:
+        str: The fingerprint.
+    """
+    digest = hashlib.sha256()
+    dtypes = [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    digest.update(json.dumps(dtypes).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def run_extract(tool, stage, inputs):
+    """
+    Runs a query on the stage's source ("bigquery", "snowflake" or a registered backend).
+    The SQL is given inline as "query" or read from "query_file"; other options
+    (params, use_cache, ...) are passed to `DatabaseQueryTool.query`.
+    """
+    options = {
+        k: v for k, v in stage.options.items()
+        if k not in ("source", "query", "query_file", "max_age_sec")
+    }
+    return tool.query(stage.options["source"], stage.sql, **options)
+
+
+def run_join(tool, stage, inputs):
+    """
+    Joins the stage's two inputs with `DatabaseQueryTool.join_results`. The options are
+    join_columns, output_columns and any other join_results argument (how, ...).
+    """
+    left, right = inputs
+    return tool.join_results(left, right, **stage.options)
+
+
+def run_derive(tool, stage, inputs):
+    """
+    Adds the stage's "columns" ({name: expression}) to its input. Expressions are evaluated
+    in order with DataFrame.eval, so they are vectorized and can refer to earlier columns,
+    e.g. "(event_action == 'Add to Cart').astype('int64')".
+    """
+    df = inputs[0].copy(deep=False)
+    for column, expression in stage.options["columns"].items():
+        df[column] = df.eval(expression)
+    return df
+
+
+def run_write(tool, stage, inputs):
+    """
+    Writes the stage's input to the Snowflake "table"; other options (method, ...) are
+    passed to `DatabaseQueryTool.write_to_snowflake`.
+    """
+    options = {k: v for k, v in stage.options.items() if k != "table"}
+    tool.write_to_snowflake(inputs[0], stage.options["table"], raise_errors=True, **options)
+    return None
+
+
+def run_save(tool, stage, inputs):
+    """
+    Saves the stage's input to the local dataset at "path" (see `storage.LocalDataset`);
+    "format", "partition_by", "compression" and "append" (default True) are optional.
+    """
+    dataset = LocalDataset(
+        stage.options["path"],
+        format=stage.options.get("format", "parquet"),
+        partition_by=stage.options.get("partition_by"),
+        compression=stage.options.get("compression", "default"),
+    )
+    dataset.write(inputs[0], append=stage.options.get("append", True))
+    return None
+
+
+# Stage types of a pipeline spec:
+# function(tool, stage, input DataFrames) -> output DataFrame or None
+STAGE_TYPES = {
+    "extract": run_extract,
+    "join": run_join,
+    "derive": run_derive,
+    "write": run_write,
+    "save": run_save,
+}
+
+
+class Stage:
+    """
+    A stage of a pipeline.
+
+    Attributes:
+        name (str): The stage name, referenced by the inputs of other stages.
+        type (str): One of STAGE_TYPES.
+        inputs (list): Names of the stages whose outputs this stage consumes, in order.
+        options (dict): The type-specific options of the stage.
+    """
+    def __init__(self, name, type, inputs=None, **options):
+        if type not in STAGE_TYPES:
+            raise ValueError(
+                f"Stage '{name}' has unknown type '{type}', expected one of {list(STAGE_TYPES)}."
+            )
+        self.name = name
+        self.type = type
+        self.inputs = list(inputs or [])
+        self.options = options
+        self._sql = None
+
+    @property
+    def sql(self):
+        """
+        str: The query of an extract stage.
+        """
+        if self._sql is None:
+            if "query_file" in self.options:
+                self._sql = read_sql_file(self.options["query_file"])
+            else:
+                self._sql = self.options["query"]
+        return self._sql
+
+    def fingerprint(self, input_fingerprints):
+        """
+        Hashes the stage definition together with the fingerprints of its inputs, so a stage
+        only needs to run again if its definition or its input data changed.
+
+        Args:
+            input_fingerprints (list): Output fingerprints of the input stages.
+
+        Returns:
+            str: The fingerprint.
+        """
+        definition = {"type": self.type, "options": self.options, "inputs": input_fingerprints}
+        if self.type == "extract":
+            definition["sql"] = normalize_sql(self.sql)
+        payload = json.dumps(definition, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Pipeline:
+    """
+    A DAG of extract, join, derive, write and save stages run by a DatabaseQueryTool.
+
+    Stages run as soon as their inputs are available, so independent stages (e.g. the
+    BigQuery and Snowflake extracts) run in parallel. Stage outputs are stored as Parquet
+    files in `state_dir` with fingerprints of their definition and inputs; a stage whose
+    definition and input data did not change since its last successful run is skipped and
+    its stored output reused. Extract stages read from the warehouse on every run (the
+    tool's query cache may still serve them) unless they set "max_age_sec".
+
+    Every stage is timed as a "stage" span in the tool's `span_logs`, labelled with its
+    type and status ("ran" or "skipped").
+
+    A spec is a dict (or YAML file) of the form:
+
+        name: daily
+        stages:
+          events: {type: extract, source: bigquery, query_file: queries/bigquery_query.sql}
+          orders: {type: extract, source: snowflake, query_file: queries/snowflake_query.sql}
+          joined: {type: join, inputs: [events, orders], join_columns: [...], output_columns: [...]}
+          enriched: {type: derive, inputs: [joined], columns: {is_purchase: "..."}}
+          write: {type: write, inputs: [enriched], table: '"orders_items_events"', method: bulk}
+          save: {type: save, inputs: [enriched], path: data/orders_items_events,
+                 partition_by: [order_date]}
+
+    Attributes:
+        name (str): The pipeline name, used for its state directory.
+        stages (dict): Stages by name, in topological order.
+        state_dir (str): Directory holding the stored outputs and fingerprints.
+        max_workers (int): Maximum number of stages running at once.
+    """
+    def __init__(self, name, stages, state_dir=".pipeline_state", max_workers=4):
+        """
+        Validates the stage graph.
+
+        Args:
+            name (str): The pipeline name.
+            stages (dict): Stage specs by name ({"type": ..., "inputs": [...], **options}).
+            state_dir (str): Directory holding the stored outputs and fingerprints.
+            max_workers (int): Maximum number of stages running at once.
+
+        Raises:
+            ValueError: If a stage has an unknown type or input, or the stages form a cycle.
+        """
+        self.name = name
+        self.state_dir = os.path.join(state_dir, name)
+        self.max_workers = max_workers
+
+        stages = {stage_name: Stage(stage_name, **spec) for stage_name, spec in stages.items()}
+        for stage in stages.values():
+            unknown = [name for name in stage.inputs if name not in stages]
+            if unknown:
+                raise ValueError(f"Stage '{stage.name}' has unknown inputs: {unknown}")
+        self.stages = {name: stages[name] for name in self._topological_order(stages)}
+
+    @classmethod
+    def from_spec(cls, spec, **kwargs):
+        """
+        Creates a pipeline from a spec dict with "name", "stages" and optionally "state_dir"
+        and "max_workers". Keyword arguments override the spec.
+        """
+        options = {k: v for k, v in spec.items() if k in ("state_dir", "max_workers")}
+        options.update(kwargs)
+        return cls(spec["name"], spec["stages"], **options)
+
+    @classmethod
+    def from_yaml(cls, path, **kwargs):
+        """
+        Creates a pipeline from a YAML spec file (requires PyYAML).
+        """
+        import yaml
+
+        with open(path) as file:
+            return cls.from_spec(yaml.safe_load(file), **kwargs)
+
+    @staticmethod
+    def _topological_order(stages):
+        """
+        Orders the stages so that every stage comes after its inputs.
+
+        Raises:
+            ValueError: If the stages form a cycle.
+        """
+        remaining = {name: set(stage.inputs) for name, stage in stages.items()}
+        order = []
+        while remaining:
+            ready = [name for name, inputs in remaining.items() if not inputs]
+            if not ready:
+                raise ValueError(f"Pipeline stages form a cycle: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for inputs in remaining.values():
+                inputs.difference_update(ready)
+        return order
+
+    def run(self, tool, force=False):
+        """
+        Runs the pipeline.
+
+        Args:
+            tool (DatabaseQueryTool): The tool running the queries, joins and writes.
+            force (bool): Run every stage, even if its inputs did not change.
+
+        Returns:
+            dict: The status of each stage ("ran" or "skipped").
+
+        Raises:
+            Exception: The first error raised by a stage; stages already running are
+                finished, no further stages are started.
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        state = self._load_state()
+        outputs = {}
+        fingerprints = {}
+        statuses = {}
+        pending = dict(self.stages)
+        running = {}
+
+        def inputs_of(stage):
+            # Outputs of skipped stages are only read from disk when a later stage needs them
+            for name in stage.inputs:
+                if outputs.get(name) is None:
+                    outputs[name] = pd.read_parquet(self._output_path(name))
+            return [outputs[name] for name in stage.inputs]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            error = None
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if error is not None or not all(dep in fingerprints for dep in stage.inputs):
+                        continue
+                    del pending[name]
+                    fingerprint = stage.fingerprint([fingerprints[dep] for dep in stage.inputs])
+                    if not force and self._is_fresh(stage, state.get(name), fingerprint):
+                        with tool.metrics.span("stage", name, type=stage.type, status="skipped"):
+                            fingerprints[name] = state[name]["output"]
+                            statuses[name] = "skipped"
+                        logging.info(
+                            f"Pipeline {self.name}: stage '{name}' is up to date, skipping it."
+                        )
+                        continue
+                    inputs = inputs_of(stage)
+                    future = executor.submit(self._run_stage, tool, stage, inputs)
+                    running[future] = (name, fingerprint)
+
+                if not running:
+                    if pending and error is None:
+                        raise RuntimeError(
+                            f"Pipeline {self.name}: stages {sorted(pending)} cannot run."
+                        )
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, fingerprint = running.pop(future)
+                    try:
+                        output, output_fingerprint = future.result()
+                    except Exception as e:
+                        logging.error(f"Pipeline {self.name}: stage '{name}' failed: {e}")
+                        error = error or e
+                        continue
+                    outputs[name] = output
+                    # Stages without output (writes, saves) are identified by their own fingerprint
+                    fingerprints[name] = output_fingerprint or fingerprint
+                    statuses[name] = "ran"
+                    state[name] = {
+                        "fingerprint": fingerprint,
+                        "output": fingerprints[name],
+                        "completed": time.time(),
+                    }
+                    self._save_state(state)
+
+            if error is not None:
+                raise error
+
+        return statuses
+
+    def _run_stage(self, tool, stage, inputs):
+        """
+        Runs a stage, stores its output and returns it with its fingerprint.
+        """
+        with tool.metrics.span("stage", stage.name, type=stage.type, status="ran") as span:
+            output = STAGE_TYPES[stage.type](tool, stage, inputs)
+            if output is None:
+                return None, None
+
+            span.set(rows=len(output), bytes=int(output.memory_usage(index=False).sum()))
+            path = self._output_path(stage.name)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            output.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            return output, frame_fingerprint(output)
+
+    def _is_fresh(self, stage, entry, fingerprint):
+        """
+        Checks whether the stored result of a stage can be reused.
+        """
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return False
+        has_output = stage.type not in ("write", "save")
+        if has_output and not os.path.exists(self._output_path(stage.name)):
+            return False
+        if stage.type == "extract":
+            max_age_sec = stage.options.get("max_age_sec")
+            return max_age_sec is not None and time.time() - entry["completed"] <= max_age_sec
+        return True
+
+    def _output_path(self, name):
+        return os.path.join(self.state_dir, f"{name}.parquet")
+
+    def _state_path(self):
+        return os.path.join(self.state_dir, "state.json")
+
+    def _load_state(self):
+        try:
+            with open(self._state_path()) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        tmp_path = f"{self._state_path()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self._state_path())
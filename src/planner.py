@@ -0,0 +1,223 @@
+import logging
+
+from cache import normalize_sql
+
+# Where a federated join can run: in pandas after downloading both sides, or in one of the
+# warehouses after shipping the other side's result into a temporary table there
+PLACEMENTS = ("client", "snowflake", "bigquery")
+
+# SQL join clause of each join type
+SQL_JOIN_TYPES = {
+    "inner": "INNER JOIN", "left": "LEFT JOIN", "right": "RIGHT JOIN", "outer": "FULL OUTER JOIN",
+}
+
+# Bytes per value of fixed-width Snowflake types by cursor type code, as BigQuery counts
+# them: FIXED, REAL, DATE, TIMESTAMP, TIMESTAMP_LTZ/TZ/NTZ, TIME and BOOLEAN
+SNOWFLAKE_TYPE_BYTES = {0: 8, 1: 8, 3: 8, 4: 8, 6: 8, 7: 8, 8: 8, 12: 8, 13: 1}
+# Assumed average length of a string value when estimating result sizes
+ESTIMATED_STRING_BYTES = 32
+
+# Identifier quoting and string cast of each warehouse dialect
+DIALECTS = {
+    "snowflake": {"quote": '"{}"', "to_string": "TO_VARCHAR({})"},
+    "bigquery": {"quote": "`{}`", "to_string": "CAST({} AS STRING)"},
+}
+
+
+def estimate_bigquery(client, query, job_config):
+    """
+    Estimates the size of a BigQuery result with a dry run, which reads no data.
+
+    The estimate is the number of uncompressed bytes the query would scan, an upper bound
+    of the result size for the projections and filters the tool runs.
+
+    Args:
+        client (bigquery.Client): The BigQuery client.
+        query (str): The SQL query.
+        job_config (bigquery.QueryJobConfig): A dry-run job configuration.
+
+    Returns:
+        tuple: (estimated bytes, result column names).
+    """
+    job = client.query(query, job_config=job_config)
+    return job.total_bytes_processed, [field.name for field in job.schema]
+
+
+def snowflake_row_width(description):
+    """
+    Estimates the uncompressed width of a Snowflake result row, in the units BigQuery
+    reports scanned bytes in (8 bytes per number or timestamp, 2 bytes plus the length
+    per string), so it can be compared with `estimate_bigquery`.
+
+    Args:
+        description (list): Column metadata from cursor.describe().
+
+    Returns:
+        int: Estimated bytes per row.
+    """
+    width = 0
+    for column in description:
+        type_code = getattr(column, "type_code", None)
+        if type_code in SNOWFLAKE_TYPE_BYTES:
+            width += SNOWFLAKE_TYPE_BYTES[type_code]
+        else:
+            # Strings and semi-structured values: the declared length caps the estimate
+            max_length = getattr(column, "internal_size", None) or ESTIMATED_STRING_BYTES
+            width += 2 + min(max_length, ESTIMATED_STRING_BYTES)
+    return width
+
+
+def estimate_snowflake(cursor, query):
+    """
+    Estimates the size of a Snowflake result as its row count times its estimated row
+    width (see `snowflake_row_width`).
+
+    The row count runs the query as COUNT(*), which Snowflake answers from metadata for
+    plain table scans. Snowflake's own size estimates (EXPLAIN) count compressed
+    micro-partitions and are not comparable with BigQuery's uncompressed bytes.
+
+    Args:
+        cursor: Snowflake cursor.
+        query (str): The SQL query.
+
+    Returns:
+        tuple: (estimated bytes or None, row count or None).
+    """
+    try:
+        row_width = snowflake_row_width(cursor.describe(normalize_sql(query)))
+        cursor.execute(f"SELECT COUNT(*) FROM (\n{normalize_sql(query)}\n)")
+        row_count = cursor.fetchone()[0]
+    except Exception as e:
+        logging.warning(f"Could not estimate the Snowflake result size: {e}")
+        return None, None
+    return row_count * row_width, row_count
+
+
+class JoinPlan:
+    """
+    The placement chosen for a federated join of a BigQuery (left) and a Snowflake (right) result.
+
+    Attributes:
+        placement (str): "client", "snowflake" or "bigquery".
+        how (str): The join type.
+        bigquery_bytes (int): Estimated size of the BigQuery result (None if unknown).
+        snowflake_bytes (int): Estimated size of the Snowflake result (None if unknown).
+        output_bytes (int): Estimated size of the joined result (None if unknown).
+        costs (dict): Estimated bytes moved over the network by each placement considered.
+        reason (str): Why the placement was chosen.
+    """
+    def __init__(self, placement, how, bigquery_bytes, snowflake_bytes, output_bytes, costs,
+                 reason):
+        self.placement = placement
+        self.how = how
+        self.bigquery_bytes = bigquery_bytes
+        self.snowflake_bytes = snowflake_bytes
+        self.output_bytes = output_bytes
+        self.costs = costs
+        self.reason = reason
+
+    def __repr__(self):
+        return f"JoinPlan(placement={self.placement!r}, costs={self.costs}, reason={self.reason!r})"
+
+
+def estimate_output_bytes(bigquery_bytes, snowflake_bytes, how):
+    """
+    Estimates the size of a join result from the sizes of its inputs.
+
+    Inner joins are assumed to be bounded by their smaller side (a filtered dimension
+    matches a fraction of the facts), outer joins by the preserved side(s).
+    """
+    return {
+        "inner": min(bigquery_bytes, snowflake_bytes),
+        "left": bigquery_bytes,
+        "right": snowflake_bytes,
+        "outer": bigquery_bytes + snowflake_bytes,
+    }[how]
+
+
+def plan_join(bigquery_bytes, snowflake_bytes, how="inner", placements=PLACEMENTS, min_savings=0.2,
+              max_ship_bytes=None):
+    """
+    Picks the placement of a federated join that moves the fewest bytes over the network.
+
+    A client-side join downloads both results. Joining in a warehouse downloads the other
+    warehouse's result, uploads it there and downloads the joined result, so it pays off
+    when that result is small and the warehouse's own side is large.
+
+    Args:
+        bigquery_bytes (int): Estimated size of the BigQuery result (None if unknown).
+        snowflake_bytes (int): Estimated size of the Snowflake result (None if unknown).
+        how (str): Join type: "inner", "left", "right" or "outer".
+        placements (tuple): Placements to consider; "client" is always considered.
+        min_savings (float): Fraction of the client-side cost a warehouse placement must save
+            to be chosen, as it adds a round trip and warehouse compute.
+        max_ship_bytes (int): Maximum estimated size of a result shipped into the other
+            warehouse (None for no limit).
+
+    Returns:
+        JoinPlan: The chosen placement with its cost estimates.
+    """
+    if how not in SQL_JOIN_TYPES:
+        raise ValueError(f"Unknown join type '{how}', expected one of {list(SQL_JOIN_TYPES)}.")
+    if bigquery_bytes is None or snowflake_bytes is None:
+        return JoinPlan("client", how, bigquery_bytes, snowflake_bytes, None, {},
+                        "size estimates are not available")
+
+    output_bytes = estimate_output_bytes(bigquery_bytes, snowflake_bytes, how)
+    costs = {"client": bigquery_bytes + snowflake_bytes}
+    # Joining in Snowflake ships the BigQuery result there, and vice versa
+    shipped = {"snowflake": bigquery_bytes, "bigquery": snowflake_bytes}
+    for placement in ("snowflake", "bigquery"):
+        within_limit = max_ship_bytes is None or shipped[placement] <= max_ship_bytes
+        if placement in placements and within_limit:
+            costs[placement] = 2 * shipped[placement] + output_bytes
+
+    placement = min(costs, key=costs.get)
+    if placement != "client" and costs[placement] > (1 - min_savings) * costs["client"]:
+        reason = f"joining in {placement} saves less than {min_savings:.0%}"
+        placement = "client"
+    else:
+        reason = "lowest estimated transfer"
+    return JoinPlan(placement, how, bigquery_bytes, snowflake_bytes, output_bytes, costs, reason)
+
+
+def join_sql(dialect, left_source, right_source, join_columns, left_columns, output_columns, how):
+    """
+    Builds the SQL of a join running in one warehouse.
+
+    Keys are compared by their string form, like the client-side join of results with
+    different key types. Output columns present on both sides are taken from the left side;
+    for right and outer joins, key columns fall back to the right side (as strings).
+
+    Args:
+        dialect (str): "snowflake" or "bigquery".
+        left_source (str): Table name or parenthesized query of the BigQuery (left) side.
+        right_source (str): Table name or parenthesized query of the Snowflake (right) side.
+        join_columns (list): Key column names present on both sides.
+        left_columns (list): Columns available on the left side.
+        output_columns (list): Columns of the result.
+        how (str): Join type: "inner", "left", "right" or "outer".
+
+    Returns:
+        str: The SQL query.
+    """
+    quote = DIALECTS[dialect]["quote"].format
+    to_string = DIALECTS[dialect]["to_string"].format
+
+    select_list = []
+    for col in output_columns:
+        if col in join_columns and how in ("right", "outer"):
+            expression = f"COALESCE({to_string('l.' + quote(col))}, {to_string('r.' + quote(col))})"
+        else:
+            expression = ("l." if col in left_columns else "r.") + quote(col)
+        select_list.append(f"{expression} AS {quote(col)}")
+
+    on_clause = " AND ".join(
+        f"{to_string('l.' + quote(col))} = {to_string('r.' + quote(col))}" for col in join_columns
+    )
+    return (
+        f"SELECT {', '.join(select_list)}\n"
+        f"FROM {left_source} AS l\n"
+        f"{SQL_JOIN_TYPES[how]} {right_source} AS r\n"
+        f"ON {on_clause}"
+    )
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# Process-wide pools keyed by connection parameters, see get_pool
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def connect_snowflake(config):
+    """
+    Opens a Snowflake connection.
+
+    Args:
+        config (dict): Keyword arguments of snowflake.connector.connect.
+
+    Returns:
+        snowflake.connector.SnowflakeConnection: The connection.
+    """
+    from backends import get_backend
+
+    return get_backend("snowflake").connect(config)
+
+
+def pool_key(config):
+    """
+    Builds the key of the pool serving a connection configuration.
+
+    Connections are only shared between identical configurations, so tools using another
+    warehouse, database, schema, role or user get their own pool. The key is a hash, so
+    passwords are not kept in it.
+
+    Args:
+        config (dict): Keyword arguments of snowflake.connector.connect.
+
+    Returns:
+        str: The pool key.
+    """
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_pool(config, **options):
+    """
+    Returns the process-wide pool for a connection configuration, creating it if needed.
+
+    Options only apply when the pool is created; later calls with the same configuration
+    return the existing pool. Pools are not shared with forked child processes.
+
+    Args:
+        config (dict): Keyword arguments of snowflake.connector.connect.
+        **options: Passed to SnowflakeConnectionPool (min_size, max_size, ...).
+
+    Returns:
+        SnowflakeConnectionPool: The pool.
+    """
+    key = (os.getpid(), pool_key(config))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = SnowflakeConnectionPool(config, **options)
+        return pool
+
+
+def drain_pools():
+    """
+    Closes the idle connections of all pools of this process.
+    """
+    with _POOLS_LOCK:
+        pools = [pool for (pid, _), pool in _POOLS.items() if pid == os.getpid()]
+    for pool in pools:
+        pool.drain()
+
+
+class SnowflakeConnectionPool:
+    """
+    A thread-safe pool of Snowflake connections sharing one configuration.
+
+    Checked-in connections are kept idle and handed out again, so only the first checkout
+    pays for the login handshake. On checkout a connection is checked for liveness: closed
+    connections are dropped, and connections idle for longer than `validate_after_sec` are
+    probed with SELECT 1, so an expired session is transparently replaced by a new one.
+    Connections idle for longer than `idle_timeout_sec` are closed, down to `min_size`.
+
+    Attributes:
+        config (dict): Keyword arguments of snowflake.connector.connect.
+        min_size (int): Connections kept open by idle eviction (opened up front by `warm`).
+        max_size (int): Maximum number of open connections; further checkouts wait.
+        idle_timeout_sec (float): Idle time after which a connection is closed (None to keep).
+        validate_after_sec (float): Idle time after which a connection is probed on checkout.
+    """
+    def __init__(self, config, min_size=0, max_size=8, idle_timeout_sec=600, validate_after_sec=60,
+                 connect=connect_snowflake):
+        """
+        Initializes an empty pool; connections are opened on demand.
+
+        Args:
+            config (dict): Keyword arguments of snowflake.connector.connect.
+            min_size (int): Connections kept open by idle eviction.
+            max_size (int): Maximum number of open connections.
+            idle_timeout_sec (float): Idle time after which a connection is closed (None to keep).
+            validate_after_sec (float): Idle time after which a connection is probed on checkout.
+            connect (callable): Function opening a connection from `config`.
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout_sec = idle_timeout_sec
+        self.validate_after_sec = validate_after_sec
+        self._connect = connect
+
+        self._condition = threading.Condition()
+        self._idle = []  # (connection, checked in at), most recently used last
+        self._size = 0  # open connections, idle or checked out, including ones being opened
+        self._generation = 0
+        self._generations = {}  # id(connection) -> generation it was opened in
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "closed": 0,
+            "failed_checks": 0,
+            "wait_sec": 0.0,
+            "max_wait_sec": 0.0,
+        }
+
+    def acquire(self, timeout=None):
+        """
+        Checks out a live connection, opening one if none is idle and the pool is not full.
+
+        Args:
+            timeout (float): Maximum seconds to wait for a connection when the pool is full
+                (None to wait indefinitely).
+
+        Returns:
+            snowflake.connector.SnowflakeConnection: The connection.
+
+        Raises:
+            TimeoutError: If no connection became available within the timeout.
+        """
+        start_time = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            expired = []
+            try:
+                with self._condition:
+                    expired = self._evict_idle()
+                    while not self._idle and self._size >= self.max_size:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise TimeoutError(
+                                f"No Snowflake connection available within {timeout} seconds."
+                            )
+                        self._condition.wait(remaining)
+
+                    if self._idle:
+                        conn, checked_in = self._idle.pop()
+                    else:
+                        conn, checked_in = None, None
+                        self._size += 1
+            finally:
+                for expired_conn in expired:
+                    self._close(expired_conn)
+
+            if conn is None:
+                conn = self._open()
+            elif not self._is_alive(conn, time.monotonic() - checked_in):
+                logging.info("Replacing a Snowflake connection that failed its liveness check.")
+                self._discard(conn, failed_check=True)
+                continue
+
+            wait_sec = time.perf_counter() - start_time
+            with self._condition:
+                self._stats["checkouts"] += 1
+                self._stats["wait_sec"] += wait_sec
+                self._stats["max_wait_sec"] = max(self._stats["max_wait_sec"], wait_sec)
+            return conn
+
+    def release(self, conn, discard=False):
+        """
+        Returns a checked-out connection to the pool.
+
+        Args:
+            conn: The connection returned by `acquire`.
+            discard (bool): Close the connection instead, e.g. after a session error.
+        """
+        with self._condition:
+            stale = self._generations.get(id(conn)) != self._generation
+        if discard or stale or conn.is_closed():
+            self._discard(conn)
+            return
+
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def warm(self):
+        """
+        Opens connections until `min_size` are open.
+        """
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            self.release(conn)
+
+    def drain(self):
+        """
+        Closes all idle connections; checked-out connections are closed when they are released.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """
+        Returns pool counters: checkouts, created, closed, failed_checks, wait_sec (total
+        checkout wait), max_wait_sec, and the current size, idle and in_use connections.
+
+        Returns:
+            dict: The counters.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+        return stats
+
+    def _open(self):
+        """
+        Opens a connection for a slot already counted in `_size`.
+        """
+        try:
+            conn = self._connect(self.config)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats["created"] += 1
+            self._generations[id(conn)] = self._generation
+        return conn
+
+    def _discard(self, conn, failed_check=False):
+        """
+        Closes a connection and frees its slot.
+        """
+        self._close(conn)
+        with self._condition:
+            self._size -= 1
+            self._generations.pop(id(conn), None)
+            self._stats["closed"] += 1
+            self._stats["failed_checks"] += failed_check
+            self._condition.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logging.warning(f"Error while closing a Snowflake connection: {e}")
+
+    def _is_alive(self, conn, idle_sec):
+        """
+        Checks a connection before handing it out.
+        """
+        try:
+            if conn.is_closed():
+                return False
+            if self.validate_after_sec is not None and idle_sec >= self.validate_after_sec:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT 1")
+                finally:
+                    cursor.close()
+            return True
+        except Exception as e:
+            logging.info(f"Snowflake connection is not usable: {e}")
+            return False
+
+    def _evict_idle(self):
+        """
+        Removes connections idle for longer than the idle timeout from the pool, keeping
+        `min_size` open, and frees their slots. Must be called while holding the pool lock;
+        the caller closes the returned connections after releasing it, since closing logs
+        out over the network.
+
+        Returns:
+            list: The expired connections.
+        """
+        if self.idle_timeout_sec is None:
+            return []
+        now = time.monotonic()
+        expired = []
+        # Oldest first: connections are appended when checked in
+        while self._idle and self._size > self.min_size:
+            conn, checked_in = self._idle[0]
+            if now - checked_in < self.idle_timeout_sec:
+                break
+            del self._idle[0]
+            self._size -= 1
+            self._generations.pop(id(conn), None)
+            self._stats["closed"] += 1
+            expired.append(conn)
+        if expired:
+            logging.info(f"Closing {len(expired)} idle Snowflake connection(s).")
+        return expired
@@ -0,0 +1,291 @@
+import numpy as np
+import pandas as pd
+
+# Multiplier combining per-column hashes into one hash per row (wraps around in uint64)
+ROW_HASH_MULTIPLIER = np.uint64(1_000_003)
+# Hash standing for a null value
+NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _min_max(series):
+    """
+    Returns the minimum and maximum non-null value of a Series, or (None, None) if the
+    values are not comparable (e.g. unordered categoricals or mixed types) or all null.
+    """
+    try:
+        minimum, maximum = series.min(), series.max()
+    except (TypeError, ValueError):
+        return None, None
+    if pd.isna(minimum) or pd.isna(maximum):
+        return None, None
+    return minimum, maximum
+
+
+class ProfileReport:
+    """
+    Data-quality profile of a DataFrame, built by DataProfiler.
+
+    Attributes:
+        rows (int): Number of rows.
+        columns (pd.DataFrame): One row per column with dtype, nulls, null_fraction,
+            distinct (non-null values, None if not computed), min and max.
+        duplicate_rows (int): Rows duplicating an earlier row, by row hash (None if not computed).
+        key_columns (list): Columns whose combination should be unique.
+        duplicate_keys (int): Rows duplicating an earlier key, by key hash (None without key
+            columns).
+    """
+    def __init__(self, rows, columns, duplicate_rows=None, key_columns=None, duplicate_keys=None):
+        self.rows = rows
+        self.columns = columns
+        self.duplicate_rows = duplicate_rows
+        self.key_columns = key_columns or []
+        self.duplicate_keys = duplicate_keys
+
+    @property
+    def null_cells(self):
+        """
+        int: Number of null values in all columns.
+        """
+        return int(self.columns["nulls"].sum())
+
+    def check(self, required_columns=None, not_null=None, unique_columns=None,
+              max_duplicate_rows=None, max_null_fraction=None):
+        """
+        Evaluates validation rules against the profile.
+
+        Args:
+            required_columns (list): Columns that must be present.
+            not_null (bool or list): Columns that must not contain nulls (True for all columns).
+            unique_columns (list): Columns whose combination must be unique; must match the
+                key columns the profile was built with.
+            max_duplicate_rows (int): Maximum number of duplicated rows.
+            max_null_fraction (float): Maximum fraction of nulls in any column.
+
+        Returns:
+            list: One message per failed rule (empty if the profile passes).
+        """
+        failures = []
+        if required_columns:
+            missing_columns = [col for col in required_columns if col not in self.columns.index]
+            if missing_columns:
+                failures.append(f"Missing required columns: {', '.join(map(str, missing_columns))}")
+
+        if not_null:
+            columns = self.columns if not_null is True else self.columns.reindex(
+                [col for col in not_null if col in self.columns.index]
+            )
+            null_columns = columns.index[columns["nulls"] > 0].tolist()
+            if null_columns:
+                failures.append(f"Missing values in columns: {', '.join(map(str, null_columns))}")
+
+        if unique_columns:
+            if list(unique_columns) != list(self.key_columns):
+                raise ValueError(
+                    f"The profile was built with key columns {self.key_columns}, "
+                    f"not {unique_columns}."
+                )
+            if self.duplicate_keys:
+                failures.append(
+                    f"{self.duplicate_keys} rows with duplicate keys {list(unique_columns)}"
+                )
+
+        if max_duplicate_rows is not None:
+            if self.duplicate_rows is None:
+                raise ValueError("The profile was built without duplicate row counts.")
+            if self.duplicate_rows > max_duplicate_rows:
+                failures.append(
+                    f"{self.duplicate_rows} duplicated rows "
+                    f"(at most {max_duplicate_rows} allowed)"
+                )
+
+        if max_null_fraction is not None:
+            null_fraction = self.columns["null_fraction"]
+            too_sparse = self.columns.index[null_fraction > max_null_fraction].tolist()
+            if too_sparse:
+                failures.append(
+                    f"Null fraction above {max_null_fraction:.0%} in columns: "
+                    f"{', '.join(map(str, too_sparse))}"
+                )
+
+        return failures
+
+    def summary(self):
+        """
+        Returns the table-level figures of the profile.
+
+        Returns:
+            dict: rows, columns, null_cells, duplicate_rows and duplicate_keys.
+        """
+        return {
+            "rows": self.rows,
+            "columns": len(self.columns),
+            "null_cells": self.null_cells,
+            "duplicate_rows": self.duplicate_rows,
+            "duplicate_keys": self.duplicate_keys,
+        }
+
+    def __repr__(self):
+        return f"ProfileReport({self.summary()})"
+
+
+class DataProfiler:
+    """
+    Profiles a DataFrame, or a stream of DataFrame chunks, in a single pass.
+
+    Each column is factorized once; null counts, min/max and value hashes are derived from
+    its codes and unique values. The hashes give the column cardinality and are combined
+    into one hash per row and per key, from which duplicate rows and duplicate keys are
+    counted, so no further pass over the frame (duplicated(), isnull().any(), ...) is needed.
+    Memory is bounded by the distinct hashes kept (8 bytes each), not by the data.
+
+    Usage:
+        profiler = DataProfiler(key_columns=["order_id"])
+        for chunk in chunks:
+            profiler.update(chunk)
+        report = profiler.report()
+    """
+    def __init__(self, key_columns=None, distinct=True, duplicates=True):
+        """
+        Args:
+            key_columns (list): Columns whose combination should be unique (None to skip).
+            distinct (bool): Count distinct values per column.
+            duplicates (bool): Count duplicated rows.
+        """
+        self.key_columns = list(key_columns or [])
+        self.distinct = distinct
+        self.duplicates = duplicates
+        self.rows = 0
+        self._dtypes = None
+        self._nulls = {}
+        self._min = {}
+        self._max = {}
+        self._distinct_hashes = {}  # column -> list of arrays of distinct hashes per chunk
+        self._row_hashes = []
+        self._key_hashes = []
+
+    def update(self, df):
+        """
+        Adds a DataFrame (or the next chunk of a stream) to the profile.
+
+        Args:
+            df (pd.DataFrame): The data; chunks must have the same columns.
+        """
+        if self._dtypes is None:
+            missing_keys = [col for col in self.key_columns if col not in df.columns]
+            if missing_keys:
+                raise KeyError(f"Key columns missing from the DataFrame: {missing_keys}")
+            self._dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+            for col in df.columns:
+                self._nulls[col] = 0
+                self._distinct_hashes[col] = []
+        elif list(df.columns) != list(self._dtypes):
+            raise ValueError("All chunks of a profile must have the same columns.")
+
+        self.rows += len(df)
+        hash_rows = self.duplicates
+        row_hash = np.zeros(len(df), dtype=np.uint64) if hash_rows else None
+        key_hash = np.zeros(len(df), dtype=np.uint64) if self.key_columns else None
+
+        for col in df.columns:
+            # Factorizing is the one pass over the column: nulls, cardinality and min/max
+            # come from the codes and the (usually few) unique values
+            try:
+                codes, uniques = pd.factorize(df[col])
+                comparable = True
+            except TypeError:
+                # Unhashable values (lists or arrays, e.g. BigQuery REPEATED fields) are
+                # profiled by their repr; min/max are not defined for them
+                series = df[col]
+                codes, uniques = pd.factorize(series.map(repr).where(series.notna()))
+                comparable = False
+            uniques = pd.Series(uniques)
+            self._nulls[col] += int((codes < 0).sum())
+            if comparable:
+                self._update_min_max(col, uniques)
+
+            if not (self.distinct or hash_rows or self.key_columns):
+                continue
+            unique_hashes = pd.util.hash_pandas_object(uniques, index=False).to_numpy()
+            if self.distinct:
+                self._distinct_hashes[col].append(unique_hashes)
+            if hash_rows or col in self.key_columns:
+                # Code -1 (null) picks the null hash appended last
+                hashes = np.append(unique_hashes, NULL_HASH)[codes]
+                if hash_rows:
+                    row_hash = row_hash * ROW_HASH_MULTIPLIER ^ hashes
+                if col in self.key_columns:
+                    key_hash = key_hash * ROW_HASH_MULTIPLIER ^ hashes
+
+        # Keep only the distinct hashes of each chunk; duplicates across chunks are found in
+        # report()
+        if hash_rows:
+            self._row_hashes.append(pd.unique(row_hash))
+        if self.key_columns:
+            self._key_hashes.append(pd.unique(key_hash))
+
+    def _update_min_max(self, col, series):
+        minimum, maximum = _min_max(series)
+        if minimum is None:
+            return
+        try:
+            self._min[col] = minimum if col not in self._min else min(self._min[col], minimum)
+            self._max[col] = maximum if col not in self._max else max(self._max[col], maximum)
+        except TypeError:  # chunks with incomparable values
+            self._min[col] = self._max[col] = None
+
+    def report(self):
+        """
+        Builds the report of the data added so far.
+
+        Returns:
+            ProfileReport: The profile.
+        """
+        dtypes = self._dtypes or {}
+        columns = pd.DataFrame(
+            {
+                "dtype": list(dtypes.values()),
+                "nulls": [self._nulls[col] for col in dtypes],
+                "null_fraction": [
+                    self._nulls[col] / self.rows if self.rows else 0.0 for col in dtypes
+                ],
+                "distinct": [
+                    _count_distinct(self._distinct_hashes[col]) if self.distinct else None
+                    for col in dtypes
+                ],
+                "min": [self._min.get(col) for col in dtypes],
+                "max": [self._max.get(col) for col in dtypes],
+            },
+            index=pd.Index(list(dtypes), name="column"),
+        )
+        duplicate_rows = self.rows - _count_distinct(self._row_hashes) if self.duplicates else None
+        duplicate_keys = self.rows - _count_distinct(self._key_hashes) if self.key_columns else None
+        return ProfileReport(self.rows, columns, duplicate_rows, self.key_columns, duplicate_keys)
+
+
+def _count_distinct(hash_arrays):
+    """
+    Counts the distinct values of a list of hash arrays.
+    """
+    if not hash_arrays:
+        return 0
+    if len(hash_arrays) == 1:
+        return len(hash_arrays[0])
+    return len(pd.unique(np.concatenate(hash_arrays)))
+
+
+def profile_dataframe(df, key_columns=None, distinct=True, duplicates=True):
+    """
+    Profiles a DataFrame in a single pass (see DataProfiler).
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+        key_columns (list): Columns whose combination should be unique (None to skip).
+        distinct (bool): Count distinct values per column.
+        duplicates (bool): Count duplicated rows.
+
+    Returns:
+        ProfileReport: The profile.
+    """
+    profiler = DataProfiler(key_columns, distinct, duplicates)
+    profiler.update(df)
+    return profiler.report()
@@ -0,0 +1,140 @@
+import re
+
+from cache import normalize_sql
+
+# A column identifier: `backquoted`, "double-quoted" or a bare name
+IDENTIFIER = r'`[^`]+`|"[^"]+"|[A-Za-z_][\w$]*'
+COLUMN_PATTERN = re.compile(rf"^({IDENTIFIER})(?:\s+AS\s+({IDENTIFIER}))?$", re.IGNORECASE)
+PROJECTION_PATTERN = re.compile(
+    r"^SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>[\w$.`\"-]+)(?:\s+WHERE\s+(?P<filter>.+))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+# Keywords that make a filter more than a row restriction on the table
+UNSUPPORTED_FILTER = re.compile(
+    r"\b(SELECT|JOIN|GROUP\s+BY|ORDER\s+BY|HAVING|QUALIFY|LIMIT|UNION|WINDOW)\b", re.IGNORECASE
+)
+
+
+def unquote(identifier):
+    """
+    Strips the quotes of a `backquoted` or "double-quoted" identifier.
+    """
+    if identifier[:1] in ('"', "`") and identifier[-1:] == identifier[:1]:
+        return identifier[1:-1]
+    return identifier
+
+
+class TableRead:
+    """
+    A plain read of one table: a projection of its columns, optionally renamed, filtered
+    by a row restriction. Such reads need no query job; `DatabaseQueryTool.read_table`
+    reads them directly (see there).
+
+    Attributes:
+        table (str): The table, e.g. "ecom-442020.ga_sessions.events_unnest".
+        columns (list): (column identifier, alias) pairs, alias None if not renamed;
+            None for all columns.
+        row_filter (str): SQL predicate on the table's columns (None for all rows).
+    """
+    def __init__(self, table, columns=None, row_filter=None):
+        """
+        Args:
+            table (str): The table, optionally quoted.
+            columns (list or dict): Column names, or a dict of column name to output name.
+            row_filter (str): SQL predicate on the table's columns.
+        """
+        self.table = table
+        if isinstance(columns, dict):
+            columns = list(columns.items())
+        self.columns = None if columns is None else [
+            (column, None) if isinstance(column, str) else tuple(column) for column in columns
+        ]
+        self.row_filter = row_filter
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Builds a read from a TableRead or a spec dict, e.g. {"table": "project.dataset.table",
+        "columns": {"visitor_id": "user_id", ...}, "filter": "event_action = 'Add to Cart'"}.
+        """
+        if isinstance(spec, TableRead):
+            return spec
+        return cls(spec["table"], spec.get("columns"), spec.get("filter"))
+
+    def table_parts(self):
+        """
+        Returns the table name split into its unquoted parts, e.g. ["project", "dataset", "table"].
+        """
+        return [unquote(part) for part in unquote(self.table).split(".")]
+
+    def column_names(self):
+        """
+        Returns the unquoted names of the selected table columns (None for all columns).
+        """
+        return None if self.columns is None else [unquote(column) for column, _ in self.columns]
+
+    def output_names(self, dialect):
+        """
+        Returns the output name of each selected column, as the query would name it:
+        the alias if given, else the column. Snowflake folds unquoted names to upper case.
+
+        Args:
+            dialect (str): "bigquery" or "snowflake".
+
+        Returns:
+            list: The output names (None for all columns).
+        """
+        if self.columns is None:
+            return None
+
+        def name(identifier):
+            if dialect == "snowflake" and identifier[:1] != '"':
+                return identifier.upper()
+            return unquote(identifier)
+
+        return [name(alias or column) for column, alias in self.columns]
+
+    def sql(self):
+        """
+        Returns the projection as a query without aliases; the aliases are applied to
+        the result on the client.
+        """
+        columns = "*" if self.columns is None else ", ".join(column for column, _ in self.columns)
+        where = f" WHERE {self.row_filter}" if self.row_filter else ""
+        return f"SELECT {columns} FROM {self.table}{where}"
+
+    def __repr__(self):
+        return (
+            f"TableRead(table={self.table!r}, columns={self.columns!r}, "
+            f"row_filter={self.row_filter!r})"
+        )
+
+
+def parse_projection(query):
+    """
+    Recognizes a query that only projects (and optionally renames) columns of one table,
+    with an optional WHERE clause, e.g. queries/bigquery_query.sql.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        TableRead: The equivalent table read, or None if the query does more (joins,
+            expressions, aggregation, ordering, ...).
+    """
+    match = PROJECTION_PATTERN.match(normalize_sql(query))
+    if match is None:
+        return None
+    row_filter = match.group("filter")
+    if row_filter is not None and UNSUPPORTED_FILTER.search(row_filter):
+        return None
+
+    if match.group("columns").strip() == "*":
+        return TableRead(match.group("table"), None, row_filter)
+    columns = []
+    for item in match.group("columns").split(","):
+        column = COLUMN_PATTERN.match(item.strip())
+        if column is None:
+            return None
+        columns.append((column.group(1), column.group(2)))
+    return TableRead(match.group("table"), columns, row_filter)
@@ -1,13 +1,172 @@
+import datetime
+import functools
+import hashlib
+import itertools
+import json
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
+import uuid
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, TimeoutError, wait
+import numpy as np
 import pandas as pd
 import time
-from google.cloud import bigquery
-import snowflake.connector
-from dotenv import load_dotenv
 import logging
 
-# Load environment variables
-load_dotenv('config/.env')
+from backends import bigquery_sdk, get_backend
+from cache import normalize_sql
+from metrics import (
+    IMPORT_LOG_COLUMNS, JOIN_LOG_COLUMNS, PLAN_LOG_COLUMNS, SPAN_COLUMNS, WRITE_LOG_COLUMNS,
+    MetricsRecorder,
+)
+from jobs import BigQueryJob, SnowflakeJob
+from joins import (
+    JOIN_TYPES, estimate_join_memory_mb, hash_join, normalized_key_strings, partitioned_join,
+)
+from partitions import make_partitions, partition_queries
+from planner import PLACEMENTS, estimate_bigquery, estimate_snowflake, join_sql, plan_join
+from pool import get_pool
+from profiler import DataProfiler
+from projection import TableRead, parse_projection
+from resilience import ChunkCheckpoint, RetryPolicy, RetryStats
+from storage import LocalDataset
+from utils import compact_dtypes
+
+# Snowflake column types for pandas dtypes inferred by pd.api.types.infer_dtype
+SNOWFLAKE_TYPES = {
+    "integer": "NUMBER(38, 0)",
+    "floating": "FLOAT",
+    "mixed-integer-float": "FLOAT",
+    "decimal": "NUMBER(38, 9)",
+    "boolean": "BOOLEAN",
+    "datetime64": "TIMESTAMP_NTZ",
+    "datetime": "TIMESTAMP_NTZ",
+    "date": "DATE",
+    "string": "VARCHAR",
+}
+# Below this many rows, the "auto" write method inserts rows instead of staging files,
+# as the PUT and COPY round-trips outweigh the insert binds of a small frame
+BULK_WRITE_MIN_ROWS = 10_000
+
+
+def rechunk_arrow(tables, chunk_rows):
+    """
+    Regroups a stream of pyarrow Tables into Tables of exactly `chunk_rows` rows
+    (the last one may be shorter).
+
+    Args:
+        tables (iterable): pyarrow Tables or RecordBatches.
+        chunk_rows (int): Number of rows per output Table.
+
+    Yields:
+        pyarrow.Table: The next chunk.
+    """
+    import pyarrow as pa
+
+    buffer = []
+    buffered_rows = 0
+    for table in tables:
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        buffer.append(table)
+        buffered_rows += table.num_rows
+        while buffered_rows >= chunk_rows:
+            combined = pa.concat_tables(buffer, promote_options="permissive")
+            yield combined.slice(0, chunk_rows)
+            rest = combined.slice(chunk_rows)
+            buffer = [rest] if rest.num_rows else []
+            buffered_rows = rest.num_rows
+    if buffered_rows:
+        yield pa.concat_tables(buffer, promote_options="permissive")
+
+
+def iter_fetchmany(cursor, columns, chunk_rows):
+    """
+    Yields the result of an executed DB-API cursor as DataFrames built from fetchmany.
+
+    Args:
+        cursor: DB-API cursor on which a query has been executed.
+        columns (list): Column names of the result.
+        chunk_rows (int): Number of rows per DataFrame.
+
+    Yields:
+        pandas.DataFrame: The next chunk.
+    """
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        yield pd.DataFrame(rows, columns=columns)
+
+
+def pa_table_from_pandas(df):
+    """
+    Converts a DataFrame into a pyarrow Table without its index.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to convert.
+
+    Returns:
+        pyarrow.Table: The converted table.
+    """
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def bigquery_parameter_type(value):
+    """
+    Returns the BigQuery query parameter type of a Python value.
+
+    Args:
+        value: A datetime, date, int, float or str.
+
+    Returns:
+        str: The BigQuery type name.
+    """
+    if isinstance(value, datetime.datetime):
+        return "TIMESTAMP" if value.tzinfo is not None else "DATETIME"
+    if isinstance(value, datetime.date):
+        return "DATE"
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    return "STRING"
+
+
+def frame_nbytes(df, deep=False):
+    """
+    Returns the in-memory size of a DataFrame. By default Python objects are not inspected
+    (object columns count their pointers only), which is cheap enough for every query.
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+        deep (bool): Whether to include the size of the Python objects, e.g. strings.
+
+    Returns:
+        int: Size in bytes.
+    """
+    return int(df.memory_usage(index=False, deep=deep).sum())
+
+
+def snowflake_column_type(series):
+    """
+    Infers the Snowflake column type for a pandas Series.
+
+    Args:
+        series (pd.Series): The column to inspect.
+
+    Returns:
+        str: The Snowflake type name (VARCHAR for anything that cannot be mapped).
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return "TIMESTAMP_TZ"
+    return SNOWFLAKE_TYPES.get(pd.api.types.infer_dtype(series, skipna=True), "VARCHAR")
+
 
 class DatabaseQueryTool:
     """
@@ -19,35 +178,111 @@ class DatabaseQueryTool:
     Attributes:
         snowflake_config (dict): Configuration parameters for Snowflake connection.
         bigquery_config (dict): Configuration parameters for BigQuery client.
-        snowflake_conn: Snowflake connection object (initialized on demand).
+        snowflake_conn: Snowflake connection pinned to this instance (checked out on demand by
+            `get_snowflake_connection`, or set explicitly). Queries use it instead of the pool.
+        snowflake_pool (SnowflakeConnectionPool): Pool Snowflake connections are checked out from.
         bigquery_client: BigQuery client object (initialized on demand).
+        cache (QueryCache): Optional on-disk cache of query results.
+        metrics (MetricsRecorder): Recorder of operation logs and per-phase timing spans.
+        compact (bool or dict): Whether query results are converted to compact dtypes, or the
+            options of `utils.compact_dtypes`.
     """
-    def __init__(self, snowflake_config, bigquery_config):
+    def __init__(self, snowflake_config, bigquery_config, cache=None, metrics=None,
+                 snowflake_pool=None, compact=False, backend_configs=None, retry_policy=None):
         """
         Initializes the DatabaseQueryTool with Snowflake and BigQuery configurations.
 
         Args:
             snowflake_config (dict): Snowflake configuration parameters (user, password, account, etc.).
             bigquery_config (dict): BigQuery configuration parameters (credentials, etc.).
+            cache (QueryCache): Optional result cache. Query results are only cached if set.
+            metrics (MetricsRecorder): Optional recorder, e.g. shared between several tools.
+            snowflake_pool (SnowflakeConnectionPool): Optional pool. By default the process-wide
+                pool of the Snowflake configuration is used (see `pool.get_pool`), so instances
+                with the same configuration share logged-in sessions.
+            compact (bool or dict): Convert query results to compact dtypes (categoricals, Arrow
+                strings, downcast integers, parsed timestamps) to cut memory. A dict is passed
+                as options to `utils.compact_dtypes`, e.g. {"timestamp_columns": [...]}.
+            backend_configs (dict): Connection parameters of other registered backends by name,
+                e.g. {"sqlite": {"database": "local.db"}} (see `backends.register_backend`).
+            retry_policy (RetryPolicy): Backoff and error classification of retried operations
+                (resumable extractions, partitions, bulk load statements). Defaults to
+                RetryPolicy().
         """
         self.snowflake_config = snowflake_config
         self.bigquery_config = bigquery_config
+        self.cache = cache
+        self.compact = compact
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
         
         # Initialize connections as None (they will be created on demand)
         self.snowflake_conn = None
+        self.snowflake_pool = snowflake_pool
         self.bigquery_client = None
+        self.bigquery_storage_client = None
 
-        # DataFrames to store logs
-        self.import_logs = pd.DataFrame(
-            columns=["source", "query", "rows", "columns", "data_mb", "time_sec", "timestamp"]
-        )
-        self.join_logs = pd.DataFrame(
-            columns=["df1_shape", "df2_shape", "join_columns", "output_columns", "result_shape", "duplicate_rows", "timestamp"]
-        )
+        # Connections of other registered backends, opened on demand by `query`
+        self.backend_configs = backend_configs or {}
+        self._backend_connections = {}
+
+        # Whether snowflake_conn was checked out from the pool, and the connection each
+        # thread currently holds, so nested checkouts share one session (e.g. temp tables)
+        self._snowflake_conn_pooled = False
+        self._snowflake_session = threading.local()
+
+        # Watermarks of incremental queries, persisted by commit_watermarks once the run succeeded
+        self._pending_watermarks = {}
+
+        # Lock guarding the lazy connection initializers, so a single instance can be
+        # shared by concurrent queries (see query_many)
+        self._connection_lock = threading.Lock()
+
+        # Append-only recorder of import/join/write logs and timing spans
+        self.metrics = metrics if metrics is not None else MetricsRecorder()
 
         # Set up logging
         logging.basicConfig(level=logging.INFO)
 
+    @property
+    def import_logs(self):
+        """
+        pandas.DataFrame: One row per query (source, query, rows, columns, data_mb, time_sec,
+        cache, timestamp).
+        """
+        return self.metrics.to_dataframe("import", IMPORT_LOG_COLUMNS)
+
+    @property
+    def join_logs(self):
+        """
+        pandas.DataFrame: One row per join (input/result shapes, columns, duplicate_rows,
+        time_sec, ...).
+        """
+        return self.metrics.to_dataframe("join", JOIN_LOG_COLUMNS)
+
+    @property
+    def write_logs(self):
+        """
+        pandas.DataFrame: One row per write phase (table, method, phase, rows, bytes, time_sec,
+        timestamp).
+        """
+        return self.metrics.to_dataframe("write", WRITE_LOG_COLUMNS)
+
+    @property
+    def plan_logs(self):
+        """
+        pandas.DataFrame: One row per federated join (placement, estimated and actual bytes,
+        time_sec).
+        """
+        return self.metrics.to_dataframe("plan", PLAN_LOG_COLUMNS)
+
+    @property
+    def span_logs(self):
+        """
+        pandas.DataFrame: One row per timing span (connect, submit, wait, fetch, convert, join,
+        write).
+        """
+        return self.metrics.to_dataframe("span", SPAN_COLUMNS)
+
     def get_bigquery_client(self):
         """
         Initializes and returns a BigQuery client if not already initialized.
@@ -56,51 +291,227 @@ class DatabaseQueryTool:
             bigquery.Client: The BigQuery client object.
         """
         if not self.bigquery_client:
-            logging.info("Initializing BigQuery client...")
-            self.bigquery_client = bigquery.Client.from_service_account_json(self.bigquery_config["credentials"])
+            with self._connection_lock:
+                if not self.bigquery_client:
+                    logging.info("Initializing BigQuery client...")
+                    with self.metrics.span("connect", "BigQuery"):
+                        self.bigquery_client = get_backend("bigquery").connect(self.bigquery_config)
         return self.bigquery_client
 
+    def get_bigquery_storage_client(self):
+        """
+        Initializes and returns a BigQuery Storage Read API client if not already initialized.
+
+        Returns:
+            bigquery_storage.BigQueryReadClient: The client.
+        """
+        if not self.bigquery_storage_client:
+            with self._connection_lock:
+                if not self.bigquery_storage_client:
+                    logging.info("Initializing BigQuery Storage client...")
+                    with self.metrics.span("connect", "BigQuery Storage"):
+                        self.bigquery_storage_client = get_backend("bigquery").connect_storage(
+                            self.bigquery_config
+                        )
+        return self.bigquery_storage_client
+
+    def get_snowflake_pool(self):
+        """
+        Returns the pool Snowflake connections are checked out from.
+
+        Returns:
+            SnowflakeConnectionPool: The instance pool, or the process-wide pool of the
+                configuration.
+        """
+        if self.snowflake_pool is None:
+            with self._connection_lock:
+                if self.snowflake_pool is None:
+                    self.snowflake_pool = get_pool({
+                        "user": self.snowflake_config["user"],
+                        "password": self.snowflake_config["password"],
+                        "account": self.snowflake_config["account"],
+                        "warehouse": self.snowflake_config["warehouse"],
+                        "database": self.snowflake_config["database"],
+                        "schema": self.snowflake_config["schema"],
+                    })
+        return self.snowflake_pool
+
     def get_snowflake_connection(self):
         """
-        Initializes and returns a Snowflake connection if not already initialized.
+        Returns the Snowflake connection pinned to this instance, checking one out of the pool
+        if there is none yet or if the pinned connection was closed (e.g. its session expired).
+
+        The connection stays checked out until `close_connections`. Prefer `snowflake_connection`,
+        which holds a connection only for the duration of a block.
 
         Returns:
             snowflake.connector.SnowflakeConnection: The Snowflake connection object.
         """
-        if not self.snowflake_conn:
-            logging.info("Initializing Snowflake connection...")
-            self.snowflake_conn = snowflake.connector.connect(
-                user=self.snowflake_config["user"],
-                password=self.snowflake_config["password"],
-                account=self.snowflake_config["account"],
-                warehouse=self.snowflake_config["warehouse"],
-                database=self.snowflake_config["database"],
-                schema=self.snowflake_config["schema"]
-            )
+        if not self.snowflake_conn or self.snowflake_conn.is_closed():
+            pool = self.get_snowflake_pool()
+            with self._connection_lock:
+                if self.snowflake_conn and self.snowflake_conn.is_closed():
+                    logging.info("Snowflake connection was closed, reconnecting...")
+                    if self._snowflake_conn_pooled:
+                        pool.release(self.snowflake_conn, discard=True)
+                    self.snowflake_conn = None
+                if not self.snowflake_conn:
+                    logging.info("Initializing Snowflake connection...")
+                    with self.metrics.span("connect", "Snowflake"):
+                        self.snowflake_conn = pool.acquire()
+                    self._snowflake_conn_pooled = True
         return self.snowflake_conn
 
-    def write_to_snowflake(self, df, table_name):
+    @contextmanager
+    def snowflake_connection(self, timeout=None):
+        """
+        Checks out a Snowflake connection for the duration of a block.
+
+        The pinned connection is used if there is one (see `get_snowflake_connection`).
+        Otherwise a connection is checked out of the pool, so concurrent queries get separate
+        sessions and only new connections pay for the login. Nested blocks in one thread get
+        the same connection, so session state such as temporary tables stays visible.
+
+        Args:
+            timeout (float): Maximum seconds to wait for a free connection (None to wait).
+
+        Yields:
+            snowflake.connector.SnowflakeConnection: The connection.
+        """
+        if self.snowflake_conn:
+            yield self.get_snowflake_connection()
+            return
+
+        session = self._snowflake_session
+        if getattr(session, "depth", 0):
+            session.depth += 1
+            try:
+                yield session.conn
+            finally:
+                session.depth -= 1
+            return
+
+        pool = self.get_snowflake_pool()
+        with self.metrics.span("checkout", "Snowflake"):
+            conn = pool.acquire(timeout)
+        session.conn, session.depth = conn, 1
+        try:
+            yield conn
+        finally:
+            session.conn, session.depth = None, 0
+            pool.release(conn)
+
+    def write_to_snowflake(self, df, table_name, method="insert", chunk_rows=1_000_000,
+                           compression="snappy", raise_errors=False, validate=None):
         """
         Writes a pandas DataFrame to a Snowflake table with lowercase column names.
 
+        Three methods are supported:
+            - "insert": creates the table with STRING columns and inserts rows with executemany.
+            - "bulk": writes the frame to compressed Parquet files, uploads them to the table
+              stage with PUT and loads them with a single COPY INTO. The table is created with
+              column types inferred from the pandas dtypes.
+            - "auto": "bulk" for frames of at least `BULK_WRITE_MIN_ROWS` rows, "insert" for
+              smaller ones.
+
+        The caller's DataFrame is not modified. Rows, bytes and elapsed time of each phase
+        are recorded in `write_logs`.
+
         Args:
             df (pd.DataFrame): The pandas DataFrame to write.
             table_name (str): The name of the Snowflake table where the data will be written.
+            method (str): "insert", "bulk" or "auto".
+            chunk_rows (int): Maximum rows per staged Parquet file (bulk method only).
+            compression (str): Parquet compression codec (bulk method only).
+            raise_errors (bool): Re-raise write errors after logging them.
+            validate (bool or dict): Profile the frame before writing (see `profile`) and skip
+                the write if it fails the rules, e.g. {"not_null": ["order_id"],
+                "unique_columns": ["order_id"], "max_duplicate_rows": 0} (see
+                `profiler.ProfileReport.check`). True checks that no column has nulls.
+
+        Returns:
+            pandas.DataFrame: The written DataFrame with lowercase column names.
         """
-        conn = self.get_snowflake_connection()
-        cursor = conn.cursor()
+        if method not in ("insert", "bulk", "auto"):
+            raise ValueError(
+                f"Unknown write method '{method}', expected 'insert', 'bulk' or 'auto'."
+            )
+        if method == "auto":
+            method = "bulk" if len(df) >= BULK_WRITE_MIN_ROWS else "insert"
 
-        try:
+        report = None
+        if validate:
+            rules = {"not_null": True} if validate is True else dict(validate)
+            report = self.profile(
+                df, table_name, key_columns=rules.get("unique_columns"),
+                duplicates=rules.get("max_duplicate_rows") is not None,
+            )
+            failures = report.check(**rules)
+            if failures:
+                message = (
+                    f"DataFrame failed validation for Snowflake table '{table_name}': "
+                    f"{'; '.join(failures)}"
+                )
+                logging.error(message)
+                if raise_errors:
+                    raise ValueError(message)
+                return df.rename(columns=lambda col: col.lower())
+
+        # Work on a renamed copy so the caller's frame keeps its columns and dtypes
+        df = df.rename(columns=lambda col: col.lower())
+
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                if method == "bulk":
+                    self._write_to_snowflake_bulk(cursor, df, table_name, chunk_rows, compression)
+                else:
+                    null_columns = None
+                    if report is not None:
+                        null_columns = [
+                            col.lower() for col, nulls in report.columns["nulls"].items() if nulls
+                        ]
+                    df = self._write_to_snowflake_insert(cursor, df, table_name, null_columns)
+
+                logging.info(f"Successfully inserted {len(df)} rows into Snowflake table '{table_name}'.")
+
+            except Exception as e:
+                logging.error(f"Error while writing data to Snowflake: {str(e)}")
+                if raise_errors:
+                    raise
+            finally:
+                cursor.close()
+
+        # Return DataFrame with lowercase column names for verification
+        return df
+
+    def _write_to_snowflake_insert(self, cursor, df, table_name, null_columns=None):
+        """
+        Inserts a DataFrame into a Snowflake table row by row with executemany.
+
+        Args:
+            cursor: Snowflake cursor.
+            df (pd.DataFrame): DataFrame with lowercase column names (owned by the caller).
+            table_name (str): The target table name.
+            null_columns (list): Columns known to contain nulls, e.g. from a profile
+                (None to detect them).
+
+        Returns:
+            pandas.DataFrame: The DataFrame as inserted (datetimes as strings, NaN as None).
+        """
+        with self._write_phase(table_name, "insert", "insert", len(df)):
             # Convert datetime columns to string before insertion
             for col in df.columns:
                 if pd.api.types.is_datetime64_any_dtype(df[col]):  # Check if the column is a timestamp/datetime
                     df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')  # Convert to string format
 
-            # Handle NaN values by replacing them with None (interpreted as NULL in Snowflake)
-            df = df.where(pd.notnull(df), None)
-
-            # Convert column names to lowercase
-            df.columns = [col.lower() for col in df.columns]
+            # Handle NaN values by replacing them with None (interpreted as NULL in Snowflake),
+            # converting only the columns that contain nulls instead of the whole frame
+            if null_columns is None:
+                null_columns = [col for col in df.columns if df[col].isna().any()]
+            for col in null_columns:
+                df[col] = df[col].astype(object).where(df[col].notna(), None)
 
             # Check if the table exists, create it if it doesn't (with lowercase column names)
             create_table_statement = f"CREATE TABLE IF NOT EXISTS {table_name} (" + \
@@ -118,40 +529,214 @@ class DatabaseQueryTool:
             # Execute the insert
             cursor.executemany(insert_statement, data)
 
-            logging.info(f"Successfully inserted {len(df)} rows into Snowflake table '{table_name}'.")
+        return df
 
-        except Exception as e:
-            logging.error(f"Error while writing data to Snowflake: {str(e)}")
-        finally:
-            cursor.close()
+    def _write_to_snowflake_bulk(self, cursor, df, table_name, chunk_rows, compression):
+        """
+        Loads a DataFrame into a Snowflake table through Parquet files on the table stage.
 
-        # Return DataFrame with lowercase column names for verification
-        return df
+        Args:
+            cursor: Snowflake cursor.
+            df (pd.DataFrame): DataFrame with lowercase column names.
+            table_name (str): The target table name.
+            chunk_rows (int): Maximum rows per Parquet file.
+            compression (str): Parquet compression codec.
+        """
+        import pyarrow.parquet as pq
+
+        # Columns with mixed Python objects cannot be converted to Arrow, load them as strings
+        column_types = {col: snowflake_column_type(df[col]) for col in df.columns}
+        mixed_columns = [
+            col for col in df.columns
+            if df[col].dtype == object and column_types[col] == "VARCHAR"
+            and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty")
+        ]
+        if mixed_columns:
+            df = df.assign(**{col: df[col].astype("string") for col in mixed_columns})
+
+        create_table_statement = f"CREATE TABLE IF NOT EXISTS {table_name} (" + \
+            ", ".join([f'"{col}" {col_type}' for col, col_type in column_types.items()]) + ")"
+        cursor.execute(create_table_statement)
+
+        stage_path = f"@%{table_name}/{uuid.uuid4().hex}/"
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Phase 1: serialize to compressed Parquet files
+            with self._write_phase(table_name, "bulk", "serialize", len(df)) as span:
+                table = pa_table_from_pandas(df)
+                file_bytes = 0
+                for i, offset in enumerate(range(0, max(table.num_rows, 1), chunk_rows)):
+                    file_path = os.path.join(tmp_dir, f"part_{i:05d}.parquet")
+                    pq.write_table(
+                        table.slice(offset, chunk_rows),
+                        file_path,
+                        compression=compression,
+                        coerce_timestamps="us",
+                        allow_truncated_timestamps=True,
+                    )
+                    file_bytes += os.path.getsize(file_path)
+                del table
+                span.set(bytes=file_bytes)
+
+            try:
+                # Phase 2: upload the files to the table stage. PUT with OVERWRITE and COPY
+                # (which skips files it already loaded) can both be retried safely
+                with self._write_phase(table_name, "bulk", "stage", len(df), file_bytes) as span:
+                    local_pattern = os.path.join(tmp_dir, "part_*.parquet").replace("\\", "/")
+                    stats = RetryStats()
+                    self.retry_policy.call(
+                        cursor.execute,
+                        f"PUT 'file://{local_pattern}' '{stage_path}' "
+                        f"AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL=8",
+                        name="Snowflake PUT", stats=stats,
+                    )
+                    span.set(retries=stats.retries)
+
+                # Phase 3: load all staged files with a single COPY
+                with self._write_phase(table_name, "bulk", "copy", len(df), file_bytes) as span:
+                    stats = RetryStats()
+                    self.retry_policy.call(
+                        cursor.execute,
+                        f"COPY INTO {table_name} FROM '{stage_path}' "
+                        f"FILE_FORMAT = (TYPE = PARQUET) "
+                        f"MATCH_BY_COLUMN_NAME = CASE_SENSITIVE PURGE = TRUE",
+                        name="Snowflake COPY", stats=stats,
+                    )
+                    span.set(retries=stats.retries)
+            except Exception:
+                cursor.execute(f"REMOVE '{stage_path}'")
+                raise
+
+    @contextmanager
+    def _write_phase(self, table_name, method, phase, rows, data_bytes=None):
+        """
+        Times a write phase as a "write" span and appends its entry to `write_logs`.
+
+        Args:
+            table_name (str): The target table name.
+            method (str): The write method ("insert", "bulk" or "merge").
+            phase (str): The write phase (e.g. "serialize", "stage", "copy").
+            rows (int): Number of rows handled in the phase.
+            data_bytes (int): Number of bytes handled in the phase (None if unknown).
+
+        Yields:
+            Span: The span, on which the phase can set the bytes once known.
+        """
+        start_time = time.perf_counter()
+        with self.metrics.span("write", table_name, method=method, phase=phase) as span:
+            span.set(rows=rows, bytes=data_bytes)
+            yield span
+        elapsed = time.perf_counter() - start_time
+
+        self.metrics.record(
+            "write", table=table_name, method=method, phase=phase, rows=rows, bytes=span.bytes,
+            time_sec=elapsed,
+        )
+        logging.info(
+            f"Snowflake write ({method}/{phase}): Rows={rows}, Bytes={span.bytes}, "
+            f"Time={elapsed:.2f} seconds."
+        )
 
-    def query_bigquery(self, query):
+    def query_bigquery(self, query, use_cache=True, job_config=None, partitions=None,
+                       read_streams=None, max_workers=4, retries=2, compact=None, direct=False):
         """
         Executes a SQL query on BigQuery and retrieves the result as a pandas DataFrame.
 
+        If the tool has a cache, results are served from it while the tables referenced by
+        the query are unchanged. The cache holds the result as fetched and `compact` is
+        applied after reading it, so calls with different settings share an entry.
+
+        A large result can be fetched in parallel in two ways:
+            - `read_streams`: the query runs once and its result table is read over several
+              BigQuery Storage read streams (requires google-cloud-bigquery-storage). This is
+              usually preferable, as the query is only billed once. Row order is not kept.
+            - `partitions`: the query is split into one query per partition (see
+              `iter_partitions`); each partition scans the query's input again.
+
+        With `direct`, a query that only selects (and renames) columns of one table, e.g.
+        queries/bigquery_query.sql, is read from the table without a query job (see
+        `read_table`); other queries run as jobs.
+
         Args:
             query (str): The SQL query to execute.
+            use_cache (bool): Whether to use the result cache (if configured).
+            job_config (bigquery.QueryJobConfig): Optional job configuration, e.g. query parameters.
+            partitions: HashPartitions, RangePartitions or a spec dict (see
+                `partitions.make_partitions`).
+            read_streams (int): Maximum number of Storage read streams.
+            max_workers (int): Number of partitions or streams fetched concurrently.
+            retries (int): Retries of a failed partition or stream.
+            compact (bool or dict): Overrides the tool's `compact` setting for this query.
+            direct (bool): Read plain projections directly from the table.
 
         Returns:
             pandas.DataFrame: Query result as a DataFrame.
         """
+        if direct and partitions is None and job_config is None:
+            table_read = parse_projection(query)
+            if table_read is not None:
+                return self.read_table(
+                    "bigquery", table_read, read_streams=read_streams or 1, max_workers=max_workers,
+                    retries=retries, compact=compact, query=query,
+                )
+            logging.info("Query is not a plain projection of a table, running it as a query job.")
+
+        if partitions is not None:
+            return self._query_partitioned(
+                "BigQuery", query, partitions, max_workers, retries, compact,
+                use_cache=use_cache, job_config=job_config,
+            )
+
+        cache_key = None
+        if self.cache is not None and use_cache:
+            target = self._bigquery_target()
+            if job_config is not None:
+                target["job_config"] = job_config.to_api_repr()
+            cache_key = self.cache.key("BigQuery", query, target)
+            df = self._get_cached(
+                "BigQuery", query, cache_key, self._bigquery_tables_unchanged, compact
+            )
+            if df is not None:
+                return df
+
         try:
             logging.info("Executing query on BigQuery...")
             start_time = time.time()
 
             # Initialize the BigQuery client
             client = self.get_bigquery_client()
-            query_job = client.query(query)
+            with self.metrics.span("submit", "BigQuery"):
+                query_job = client.query(query, job_config=job_config)
 
             # Wait for the query to complete and fetch results
-            result = query_job.result()
-            query_time = time.time() - start_time
+            with self.metrics.span("wait", "BigQuery") as span:
+                result = query_job.result()
+                span.set(rows=result.total_rows, bytes=query_job.total_bytes_processed)
+
+            # Download and convert results to a DataFrame
+            if read_streams:
+                destination = query_job.destination
+                df = self._read_bigquery_streams(
+                    [destination.project, destination.dataset_id, destination.table_id],
+                    [field.name for field in result.schema], read_streams, max_workers, retries,
+                )
+            else:
+                with self.metrics.span("fetch", "BigQuery") as span:
+                    df = result.to_dataframe()
+                    span.set(rows=len(df), bytes=frame_nbytes(df))
 
-            # Convert results to a DataFrame
-            df = result.to_dataframe()
+            # The fetched result is cached; compaction is applied on every read (see _get_cached)
+            if cache_key is not None:
+                self.cache.put(
+                    cache_key,
+                    df,
+                    {
+                        "source": "BigQuery",
+                        "tables": self._bigquery_table_versions(query_job.referenced_tables),
+                    },
+                )
+            df = self._compact(df, "BigQuery", compact)
+            query_time = time.time() - start_time
 
             # Fetch statistics from the QueryJob object
             row_count = len(df)
@@ -159,29 +744,11 @@ class DatabaseQueryTool:
             transmitted_bytes = query_job.total_bytes_billed or 0  # Handle None gracefully
             transmitted_mb = transmitted_bytes * 0.000001
 
-            # Prepare the new log entry
-            new_log_entry = pd.DataFrame(
-                [
-                    {
-                        "source": "BigQuery",
-                        "query": query,
-                        "row_count": row_count,
-                        "col_count": col_count,
-                        "data_mb": transmitted_mb,
-                        "time_sec": query_time,
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    }
-                ]
+            self._log_import(
+                "BigQuery", query, row_count, col_count, transmitted_mb, query_time,
+                cache="miss" if cache_key is not None else None,
             )
 
-            # Safely concatenate logs
-            if self.import_logs is None or self.import_logs.empty:
-                self.import_logs = new_log_entry
-            else:
-                self.import_logs = pd.concat(
-                    [self.import_logs, new_log_entry], ignore_index=True
-                )
-
             # Log statistics
             logging.info(
                 f"BigQuery: Rows={row_count}, Columns={col_count}, Data={transmitted_mb:.2f} MB, "
@@ -201,140 +768,1987 @@ class DatabaseQueryTool:
             logging.error(f"An error occurred while executing the BigQuery query: {e}")
             raise e
 
-    def query_snowflake(self, query):
+    def query_snowflake(self, query, use_arrow=True, arrow_dtypes=False, use_cache=True,
+                        params=None, partitions=None, max_workers=4, retries=2, compact=None,
+                        direct=False):
         """
         Executes a SQL query on Snowflake and retrieves the result as a pandas DataFrame.
 
+        By default the result is fetched as Arrow record batches and assembled column-wise,
+        which avoids materializing every value as a Python object. If Arrow results are not
+        available (e.g. the connector's pandas extra or pyarrow is missing), the query falls
+        back to fetching tuples.
+
         Args:
             query (str): The SQL query to execute.
+            use_arrow (bool): Whether to fetch the result through the Arrow path.
+            arrow_dtypes (bool): Whether to keep Arrow-backed dtypes (pd.ArrowDtype)
+                instead of converting to NumPy dtypes. Only applies to the Arrow path.
+            use_cache (bool): Whether to use the result cache (if configured). Results are
+                cached per `use_arrow`/`arrow_dtypes` setting and compacted after reading.
+            params (dict or sequence): Optional bind parameters of the query.
+            partitions: HashPartitions, RangePartitions or a spec dict. The query is split into
+                one query per partition, fetched concurrently over separate pooled connections
+                and concatenated in partition order (see `iter_partitions`).
+            max_workers (int): Number of partitions fetched concurrently.
+            retries (int): Retries of a failed partition.
+            compact (bool or dict): Overrides the tool's `compact` setting for this query.
+            direct (bool): Read plain projections of one table with `read_table`.
 
         Returns:
             pandas.DataFrame: Query result as a DataFrame.
         """
+        if direct and partitions is None and params is None:
+            table_read = parse_projection(query)
+            if table_read is not None:
+                return self.read_table(
+                    "snowflake", table_read, arrow_dtypes=arrow_dtypes, compact=compact,
+                    query=query,
+                )
+            logging.info("Query is not a plain projection of a table, running it as a query.")
+
+        if partitions is not None:
+            return self._query_partitioned(
+                "Snowflake", query, partitions, max_workers, retries, compact,
+                use_arrow=use_arrow, arrow_dtypes=arrow_dtypes, use_cache=use_cache, params=params,
+            )
+
+        cache_key = None
+        if self.cache is not None and use_cache:
+            target = self._snowflake_target()
+            if params is not None:
+                target["params"] = params
+            # The fetch path decides the dtypes of the cached frame, so it is part of the key
+            target["fetch"] = {"use_arrow": use_arrow, "arrow_dtypes": arrow_dtypes}
+            cache_key = self.cache.key("Snowflake", query, target)
+            df = self._get_cached("Snowflake", query, cache_key, compact=compact)
+            if df is not None:
+                return df
+
         logging.info("Executing query on Snowflake...")
         start_time = time.time()
 
-        conn = self.get_snowflake_connection()
-        cursor = conn.cursor()
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute(query)
+            try:
+                with self.metrics.span("wait", "Snowflake"):
+                    cursor.execute(query, params)
+
+                df = self._fetch_snowflake(cursor, use_arrow, arrow_dtypes)
+                if cache_key is not None:
+                    self.cache.put(cache_key, df, {"source": "Snowflake"})
+                df = self._compact(df, "Snowflake", compact)
+
+                query_time = time.time() - start_time
+
+                self._log_import(
+                    "Snowflake", query, len(df), len(df.columns), None, query_time,
+                    cache="miss" if cache_key is not None else None,
+                )
+
+                # Log statistics
+                logging.info(
+                    f"Snowflake Query Completed: Rows={len(df)}, Columns={len(df.columns)}, "
+                    f"Processing Time={query_time:.2f} seconds."
+                )
+
+            finally:
+                cursor.close()
+
+        return df
+
+    def _fetch_snowflake(self, cursor, use_arrow=True, arrow_dtypes=False):
+        """
+        Fetches the result of an executed Snowflake cursor into a DataFrame, through the
+        Arrow path if requested and available, otherwise as tuples.
+
+        Args:
+            cursor: Snowflake cursor on which a query has been executed.
+            use_arrow (bool): Whether to fetch the result through the Arrow path.
+            arrow_dtypes (bool): Whether to keep Arrow-backed dtypes in the DataFrame.
+
+        Returns:
+            pandas.DataFrame: The result.
+        """
+        df = None
+        if use_arrow:
+            df = self._fetch_snowflake_arrow(cursor, arrow_dtypes)
+        if df is None:
+            with self.metrics.span("fetch", "Snowflake") as span:
+                data = cursor.fetchall()
+                span.set(rows=len(data))
+            with self.metrics.span("convert", "Snowflake") as span:
+                columns = [col[0] for col in cursor.description]
+                df = pd.DataFrame(data, columns=columns)
+                span.set(rows=len(df), bytes=frame_nbytes(df))
+        return df
+
+    def _fetch_snowflake_arrow(self, cursor, arrow_dtypes=False):
+        """
+        Fetches the result of an executed Snowflake cursor as Arrow batches and converts
+        them into a single pandas DataFrame.
+
+        Args:
+            cursor: Snowflake cursor on which a query has been executed.
+            arrow_dtypes (bool): Whether to keep Arrow-backed dtypes in the DataFrame.
+
+        Returns:
+            pandas.DataFrame: The result, or None if Arrow results are not available
+            (in which case nothing has been consumed from the cursor).
+        """
+        with self.metrics.span("fetch", "Snowflake", format="arrow") as span:
+            try:
+                import pyarrow as pa
+
+                batches = iter(cursor.fetch_arrow_batches())
+                first_batch = next(batches, None)
+            except Exception as e:
+                logging.info(f"Arrow results are not available, falling back to tuple fetch: {e}")
+                span.set(fallback=True)
+                return None
 
-            # Fetch results into a DataFrame
-            data = cursor.fetchall()
             columns = [col[0] for col in cursor.description]
-            df = pd.DataFrame(data, columns=columns)
+            if first_batch is None:
+                return pd.DataFrame(columns=columns)
 
-            query_time = time.time() - start_time
+            tables = [first_batch]
+            tables.extend(batches)
+            # Result chunks may use different integer widths, so let Arrow promote the types
+            table = pa.concat_tables(tables, promote_options="permissive")
+            del tables, first_batch
+            span.set(rows=table.num_rows, bytes=table.nbytes)
 
-            # Create the log DataFrame
-            log_entry = pd.DataFrame(
-                [
-                    {
-                        "source": "Snowflake",
-                        "query": query,
-                        "row_count": len(df),
-                        "col_count": len(df.columns),
-                        "data_mb": None,  # No data size
-                        "time_sec": query_time,
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    }
-                ]
+        with self.metrics.span("convert", "Snowflake") as span:
+            # self_destruct releases the Arrow buffers column by column while converting,
+            # so memory does not peak at twice the size of the result
+            df = table.to_pandas(
+                types_mapper=pd.ArrowDtype if arrow_dtypes else None,
+                split_blocks=True,
+                self_destruct=True,
             )
+            del table
+            span.set(rows=len(df), bytes=frame_nbytes(df))
+
+        return df
 
-            # Drop columns that are all NA or empty to avoid the FutureWarning
-            log_entry = log_entry.dropna(axis=1, how='all')
+    def submit_bigquery(self, query, job_config=None):
+        """
+        Submits a SQL query to BigQuery without waiting for it.
 
-            # Concatenate the log entry to the main logs DataFrame
-            self.import_logs = pd.concat([self.import_logs, log_entry], ignore_index=True)
+        Args:
+            query (str): The SQL query to execute.
+            job_config (bigquery.QueryJobConfig): Optional job configuration, e.g. query
+                parameters or a server-side job_timeout_ms.
 
-            # Log statistics
-            logging.info(
-                f"Snowflake Query Completed: Rows={len(df)}, Columns={len(df.columns)}, "
-                f"Processing Time={query_time:.2f} seconds."
-            )
+        Returns:
+            jobs.BigQueryJob: Handle to poll, await, collect or cancel the query.
+        """
+        client = self.get_bigquery_client()
+        with self.metrics.span("submit", "BigQuery") as span:
+            query_job = client.query(query, job_config=job_config)
+            span.set(job_id=query_job.job_id)
+        logging.info(f"Submitted BigQuery job {query_job.job_id}.")
+        return BigQueryJob(self, query, query_job)
 
-        finally:
-            cursor.close()
+    def submit_snowflake(self, query, params=None, use_arrow=True, arrow_dtypes=False):
+        """
+        Submits a SQL query to Snowflake asynchronously (execute_async) without waiting for it.
+        The connection is returned to the pool right away; the query keeps running.
 
-        return df
+        Args:
+            query (str): The SQL query to execute.
+            params (dict or sequence): Optional bind parameters of the query.
+            use_arrow (bool): Whether to fetch the result through the Arrow path.
+            arrow_dtypes (bool): Whether to keep Arrow-backed dtypes (Arrow path only).
 
-    def join_results(self, df1, df2, join_columns, output_columns):
+        Returns:
+            jobs.SnowflakeJob: Handle to poll, await, collect or cancel the query.
         """
-        Joins two pandas DataFrames on specified columns, logs statistics, and stores results in a log DataFrame.
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                with self.metrics.span("submit", "Snowflake") as span:
+                    cursor.execute_async(query, params)
+                    span.set(job_id=cursor.sfqid)
+                query_id = cursor.sfqid
+            finally:
+                cursor.close()
+        logging.info(f"Submitted Snowflake query {query_id}.")
+        return SnowflakeJob(self, query, query_id, use_arrow, arrow_dtypes)
+
+    def _read_bigquery_streams(self, table, columns, read_streams, max_workers, retries,
+                               selected_fields=None, row_restriction=None, stats=None):
+        """
+        Reads a BigQuery table (e.g. a query's result table) over several Storage read streams
+        concurrently and concatenates them in stream order.
 
         Args:
-            df1 (pd.DataFrame): The first DataFrame.
-            df2 (pd.DataFrame): The second DataFrame.
-            join_columns (list): List of column names to join on.
-            output_columns (list): List of column names to include in the output.
+            table (list): Project, dataset and table ID of the table to read.
+            columns (list): Column names, for an empty result.
+            read_streams (int): Maximum number of read streams.
+            max_workers (int): Number of streams read concurrently.
+            retries (int): Retries of a failed stream.
+            selected_fields (list): Columns to read (None for all); the server returns
+                them in table order.
+            row_restriction (str): SQL predicate filtering the rows server-side.
+            stats (dict): Optional dict receiving the read session's "bytes_scanned" estimate
+                and the "arrow_bytes" of the data read.
 
         Returns:
-            pandas.DataFrame: The joined DataFrame with selected output columns.
+            pandas.DataFrame: The table contents.
         """
-        logging.info("Joining results...")
+        import pyarrow as pa
+        from google.cloud import bigquery_storage
 
-        # Log initial shapes of DataFrames
-        initial_df1_shape = df1.shape
-        initial_df2_shape = df2.shape
-        logging.info(f"Initial df1 shape: {initial_df1_shape}, df2 shape: {initial_df2_shape}")
+        client = self.get_bigquery_storage_client()
+        with self.metrics.span("submit", "BigQuery Storage") as span:
+            session = client.create_read_session(
+                parent=f"projects/{self.get_bigquery_client().project}",
+                read_session=bigquery_storage.types.ReadSession(
+                    table="projects/{}/datasets/{}/tables/{}".format(*table),
+                    data_format=bigquery_storage.types.DataFormat.ARROW,
+                    read_options=bigquery_storage.types.ReadSession.TableReadOptions(
+                        selected_fields=selected_fields or [],
+                        row_restriction=row_restriction or "",
+                    ),
+                ),
+                max_stream_count=read_streams,
+            )
+            span.set(streams=len(session.streams))
+        if stats is not None:
+            stats["bytes_scanned"] = getattr(session, "estimated_total_bytes_scanned", None)
+            stats["arrow_bytes"] = 0
+        if not session.streams:
+            return pd.DataFrame(columns=columns)
 
-        # Convert the data types of join columns to the same type if necessary
-        df1[join_columns] = df1[join_columns].astype(str)  # Convert to string
-        df2[join_columns] = df2[join_columns].astype(str)  # Convert to string
+        def read_stream(index, stream):
+            return self._with_retries(
+                "BigQuery Storage", index, retries,
+                lambda: client.read_rows(stream.name).to_arrow(session),
+            )
 
-        # Check for duplicated columns in both DataFrames
-        duplicated_columns_df1 = df1.columns[df1.columns.duplicated()].tolist()
-        duplicated_columns_df2 = df2.columns[df2.columns.duplicated()].tolist()
+        with self.metrics.span("fetch", "BigQuery Storage") as span:
+            with ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="read_stream"
+            ) as executor:
+                tables = list(executor.map(read_stream, itertools.count(), session.streams))
+            table = pa.concat_tables(tables, promote_options="permissive")
+            del tables
+            span.set(rows=table.num_rows, bytes=table.nbytes, streams=len(session.streams))
+            if stats is not None:
+                stats["arrow_bytes"] = table.nbytes
 
-        if duplicated_columns_df1:
-            logging.warning(f"Duplicated columns in df1: {duplicated_columns_df1}")
-        if duplicated_columns_df2:
-            logging.warning(f"Duplicated columns in df2: {duplicated_columns_df2}")
+        with self.metrics.span("convert", "BigQuery Storage") as span:
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table
+            span.set(rows=len(df), bytes=frame_nbytes(df))
+        return df
 
-        # Perform the join
-        joined_df = pd.merge(df1, df2, on=join_columns, how='inner')
+    def read_table(self, source, table_read, read_streams=1, max_workers=4, retries=2,
+                   arrow_dtypes=False, compact=None, query=None):
+        """
+        Reads columns of one table directly, without a query job, and renames them on the client.
 
-        # Check for duplicated rows in the joined DataFrame
-        duplicated_rows_count = joined_df.duplicated().sum()
-        if duplicated_rows_count > 0:
-            logging.warning(f"Number of duplicated rows in joined DataFrame: {duplicated_rows_count}")
-        else:
-            logging.info("No duplicated rows found in joined DataFrame.")
+        - BigQuery: the columns and rows are read through the BigQuery Storage Read API with
+          the column selection and row restriction applied server-side. No query job is
+          scheduled and no temporary result table is written; the read is billed by the
+          bytes read instead of a query's bytes processed.
+        - Snowflake has no storage read API; the read runs as the projection without aliases
+          (`TableRead.sql`), bypassing the result cache, and is fetched as Arrow batches.
 
-        # Determine final shape of the joined DataFrame
-        result_shape = joined_df.shape
-        logging.info(f"Shape of joined DataFrame: {result_shape}")
-
-        # Select specified output columns
-        result_df = joined_df[output_columns]
-        logging.info(f"Shape of final output DataFrame: {result_df.shape}")
-
-        # Log statistics into the join_logs DataFrame
-        log_entry = {
-            "df1_shape": initial_df1_shape,
-            "df2_shape": initial_df2_shape,
-            "join_columns": join_columns,
-            "output_columns": output_columns,
-            "result_shape": result_shape,
-            "duplicated_rows": duplicated_rows_count,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
+        The import is logged with mode "direct", so `import_logs` compares it with query
+        jobs ("job") of the same query, e.g. import_logs.groupby(["source", "mode"]). For
+        BigQuery, `data_mb` is the read session's estimate of the bytes scanned, which Storage
+        reads are billed by (or the Arrow size of the data read, if there is no estimate),
+        as `data_mb` of a query job is its bytes billed.
 
-        self.join_logs = pd.concat(
-            [self.join_logs, pd.DataFrame([log_entry])],
-            ignore_index=True
-        )
+        Args:
+            source (str): "bigquery" or "snowflake".
+            table_read: TableRead or a spec dict, e.g. {"table": "project.dataset.table",
+                "columns": {"visitor_id": "user_id"}, "filter": "..."} (see `projection.TableRead`).
+            read_streams (int): Maximum number of BigQuery Storage read streams.
+            max_workers (int): Number of BigQuery streams read concurrently.
+            retries (int): Retries of a failed BigQuery stream.
+            arrow_dtypes (bool): Whether to keep Arrow-backed dtypes of a Snowflake result.
+            compact (bool or dict): Overrides the tool's `compact` setting for this read.
+            query (str): The query the read replaces, for the import logs.
 
-        return result_df
+        Returns:
+            pandas.DataFrame: The selected columns, named as the query would name them.
+        """
+        dialect = source.lower()
+        if dialect not in ("bigquery", "snowflake"):
+            raise ValueError(f"Direct table reads are not supported for '{source}'.")
+        table_read = TableRead.from_spec(table_read)
+        query = query or table_read.sql()
+        start_time = time.time()
+
+        if dialect == "bigquery":
+            source = "BigQuery"
+            logging.info(f"Reading {table_read.table} directly from BigQuery Storage...")
+            table = table_read.table_parts()
+            if len(table) == 2:
+                table.insert(0, self.get_bigquery_client().project)
+            read_stats = {}
+            df = self._read_bigquery_streams(
+                table, table_read.column_names() or [], read_streams, max_workers, retries,
+                selected_fields=table_read.column_names(), row_restriction=table_read.row_filter,
+                stats=read_stats,
+            )
+            # Storage reads are billed by the bytes scanned, query jobs by the bytes billed
+            data_mb = (read_stats["bytes_scanned"] or read_stats["arrow_bytes"]) * 0.000001
+        else:
+            source = "Snowflake"
+            logging.info(f"Reading {table_read.table} directly from Snowflake...")
+            with self.snowflake_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    with self.metrics.span("wait", "Snowflake", direct=True):
+                        cursor.execute(table_read.sql())
+                    df = self._fetch_snowflake(cursor, True, arrow_dtypes)
+                finally:
+                    cursor.close()
+            data_mb = None
+
+        df = self._compact(self._apply_aliases(df, table_read, dialect), source, compact)
+        query_time = time.time() - start_time
+        self._log_import(
+            source, query, len(df), len(df.columns), data_mb, query_time, mode="direct"
+        )
+        scanned = f", Scanned={data_mb:.2f} MB" if data_mb is not None else ""
+        logging.info(
+            f"{source} direct read completed: Rows={len(df)}, Columns={len(df.columns)}"
+            f"{scanned}, Time={query_time:.2f} seconds."
+        )
+        return df
 
-    def close_connections(self):
+    def _apply_aliases(self, df, table_read, dialect):
         """
-        Closes the Snowflake connection and the BigQuery client.
+        Orders and names the columns of a direct read as the projection query would.
         """
-        if self.snowflake_conn:
-            logging.info("Closing Snowflake connection...")
-            self.snowflake_conn.close()
+        columns = table_read.column_names()
+        if columns is None:
+            return df
+        if dialect == "bigquery":
+            # The Storage API returns the selected columns in table order, named as in the table
+            by_name = {str(col).lower(): col for col in df.columns}
+            ordered = [by_name[col.lower()] for col in columns]
+            if ordered != list(df.columns):
+                df = df[ordered]
+        df.columns = table_read.output_names(dialect)
+        return df
+
+    def iter_partitions(self, source, query, partitions, max_workers=4, retries=2,
+                        retry_delay=1.0, **kwargs):
+        """
+        Splits a query into partitions and yields the partition results in partition order.
+
+        Partitions are fetched concurrently, at most `max_workers` ahead of the one being
+        yielded, so memory stays bounded by the size of a few partitions. Each Snowflake
+        partition runs on its own pooled connection. A failed partition is retried on its
+        own; the other partitions are not run again. The ORDER BY of the query is not kept
+        across partitions.
+
+        Args:
+            source (str): "bigquery" or "snowflake".
+            query (str): The SQL query to execute.
+            partitions: HashPartitions, RangePartitions or a spec dict, e.g.
+                {"column": "order_id", "hash": 8} (see `partitions.make_partitions`).
+            max_workers (int): Number of partitions fetched concurrently.
+            retries (int): Retries of a failed partition.
+            retry_delay (float): Delay before the first retry in seconds, doubled on every retry.
+            **kwargs: Passed to `query_bigquery` or `query_snowflake` for every partition.
+
+        Yields:
+            pandas.DataFrame: The result of the next partition.
+        """
+        dialect = source.lower()
+        if dialect not in ("bigquery", "snowflake"):
+            raise ValueError(f"Partitioned queries are not supported for '{source}'.")
+        partitions = make_partitions(partitions)
+        queries = partition_queries(query, partitions, dialect)
+        query_method = self.query_bigquery if dialect == "bigquery" else self.query_snowflake
+        source = "BigQuery" if dialect == "bigquery" else "Snowflake"
+        logging.info(f"Running {source} query in {len(queries)} partitions ({partitions}).")
+
+        def run_partition(index):
+            return self._with_retries(
+                source, index, retries, lambda: query_method(queries[index], **kwargs), retry_delay
+            )
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="partition")
+        futures = {}
+        try:
+            for index in range(len(queries)):
+                for ahead in range(index, min(index + max_workers, len(queries))):
+                    if ahead not in futures:
+                        futures[ahead] = executor.submit(run_partition, ahead)
+                yield futures.pop(index).result()
+        finally:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _query_partitioned(self, source, query, partitions, max_workers, retries, compact,
+                           **kwargs):
+        """
+        Fetches all partitions of a query and concatenates them in partition order. Results
+        are compacted once after concatenation, so categoricals are shared by all partitions.
+        """
+        start_time = time.time()
+        frames = list(self.iter_partitions(
+            source, query, partitions, max_workers=max_workers, retries=retries, compact=False,
+            **kwargs,
+        ))
+        with self.metrics.span("concat", source) as span:
+            # Empty partitions may have other dtypes (e.g. object), so they are left out
+            non_empty = [frame for frame in frames if len(frame)]
+            df = pd.concat(non_empty or frames[:1], ignore_index=True)
+            del frames
+            span.set(rows=len(df), bytes=frame_nbytes(df))
+        df = self._compact(df, source, compact)
+        logging.info(
+            f"{source} partitioned query completed: Rows={len(df)}, Columns={len(df.columns)}, "
+            f"Time={time.time() - start_time:.2f} seconds."
+        )
+        return df
+
+    def _with_retries(self, source, index, retries, func, retry_delay=1.0):
+        """
+        Runs one partition or read stream, retrying transient failures with exponential
+        backoff and jitter (see `resilience.RetryPolicy`). Every attempt is a "partition" span.
+
+        Args:
+            source (str): The data source, for spans and log messages.
+            index (int): The partition or stream index.
+            retries (int): Number of retries.
+            func (callable): Function fetching the partition.
+            retry_delay (float): Upper bound of the first backoff delay in seconds.
+
+        Returns:
+            The result of `func`.
+        """
+        policy = RetryPolicy(
+            retries, base_delay=retry_delay, max_delay=self.retry_policy.max_delay,
+            jitter=self.retry_policy.jitter, retryable=self.retry_policy.retryable,
+        )
+        attempts = itertools.count()
+
+        def attempt():
+            span_context = self.metrics.span(
+                "partition", source, index=index, attempt=next(attempts)
+            )
+            with span_context as span:
+                result = func()
+                span.set(rows=len(result))
+                return result
+
+        return policy.call(attempt, name=f"{source} partition {index}")
+
+    def extract_resumable(self, source, query, checkpoint_dir=".checkpoints", chunk_rows=500_000,
+                          keep_checkpoint=False, max_age_sec=24 * 3600):
+        """
+        Extracts a large query result in checkpointed chunks, so a failure does not lose the
+        chunks already downloaded.
+
+        The query runs once; its result is then read chunk by chunk and every chunk is stored
+        in `checkpoint_dir` (see `resilience.ChunkCheckpoint`). Transient errors are retried
+        with the tool's `retry_policy`, and each retry, or a new run of the same query after
+        a crash, resumes after the last stored chunk:
+            - BigQuery: the query job's result table is read from the next row offset.
+            - Snowflake: the result of the query ID is read from the next result batch.
+        Both results are kept by the warehouse for about 24 hours; if it expired, the query
+        runs again from scratch. Retries and the time they wasted are recorded in `import_logs`.
+
+        A checkpoint kept after a successful extraction (`keep_checkpoint`) is returned by
+        later calls with the same query and target until it is `max_age_sec` old; after that
+        the query is extracted again.
+
+        Args:
+            source (str): "bigquery" or "snowflake".
+            query (str): The SQL query to execute.
+            checkpoint_dir (str): Directory holding the checkpoints.
+            chunk_rows (int): Approximate rows per stored chunk.
+            keep_checkpoint (bool): Keep the chunks after a successful extraction.
+            max_age_sec (float): Age after which a completed checkpoint is extracted again
+                (None to reuse it indefinitely).
+
+        Returns:
+            pandas.DataFrame: The query result.
+        """
+        dialect = source.lower()
+        if dialect not in ("bigquery", "snowflake"):
+            raise ValueError(f"Resumable extraction is not supported for '{source}'.")
+        source = "BigQuery" if dialect == "bigquery" else "Snowflake"
+        target = self._bigquery_target() if dialect == "bigquery" else self._snowflake_target()
+        key = hashlib.sha256(
+            json.dumps(
+                [dialect, normalize_sql(query), target], sort_keys=True, default=str
+            ).encode("utf-8")
+        ).hexdigest()
+        checkpoint = ChunkCheckpoint(checkpoint_dir, key)
+
+        start_time = time.time()
+        completed = checkpoint.state.get("completed")
+        if checkpoint.state["complete"] and max_age_sec is not None and (
+            completed is None or start_time - completed > max_age_sec
+        ):
+            logging.info(
+                f"Checkpointed {source} extraction is older than {max_age_sec} seconds, "
+                f"extracting it again."
+            )
+            checkpoint.reset()
+
+        stats = RetryStats()
+        if not checkpoint.state["complete"]:
+            if checkpoint.state["chunks"]:
+                logging.info(
+                    f"Resuming {source} extraction after {checkpoint.state['rows']} rows "
+                    f"in {checkpoint.state['chunks']} chunks."
+                )
+            if dialect == "bigquery":
+                extract = self._extract_bigquery_chunks
+            else:
+                extract = self._extract_snowflake_chunks
+            self.retry_policy.call(
+                extract, query, checkpoint, chunk_rows, name=f"{source} extraction", stats=stats
+            )
+            checkpoint.save_state(complete=True, completed=time.time())
+
+        with self.metrics.span("fetch", source, checkpoint=True) as span:
+            df = checkpoint.load()
+            span.set(rows=len(df), bytes=frame_nbytes(df))
+        df = self._compact(df, source)
+        if not keep_checkpoint:
+            checkpoint.remove()
+
+        query_time = time.time() - start_time
+        self._log_import(
+            source, query, len(df), len(df.columns), None, query_time,
+            retries=stats.retries, wasted_sec=stats.wasted_sec,
+        )
+        logging.info(
+            f"{source} resumable extraction completed: Rows={len(df)}, Columns={len(df.columns)}, "
+            f"Retries={stats.retries}, Time={query_time:.2f} seconds."
+        )
+        return df
+
+    def _extract_bigquery_chunks(self, query, checkpoint, chunk_rows):
+        """
+        Runs a BigQuery query (once per checkpoint) and stores its result table in chunks,
+        starting at the row offset reached by the checkpoint.
+        """
+        client = self.get_bigquery_client()
+        destination = checkpoint.state.get("destination")
+        if destination is not None:
+            try:
+                client.get_table(destination)
+            except Exception as e:
+                if self.retry_policy.retryable(e):
+                    raise
+                logging.warning(
+                    f"Result table {destination} is no longer available, restarting: {e}"
+                )
+                checkpoint.reset()
+                destination = None
+
+        if destination is None:
+            with self.metrics.span("submit", "BigQuery"):
+                query_job = client.query(query)
+            with self.metrics.span("wait", "BigQuery") as span:
+                result = query_job.result()
+                span.set(rows=result.total_rows, bytes=query_job.total_bytes_processed)
+            table = query_job.destination
+            destination = f"{table.project}.{table.dataset_id}.{table.table_id}"
+            checkpoint.save_state(job_id=query_job.job_id, destination=destination)
+
+        offset = checkpoint.state["position"]
+        rows = client.list_rows(destination, start_index=offset, page_size=chunk_rows)
+        for table in rechunk_arrow(rows.to_arrow_iterable(), chunk_rows):
+            with self.metrics.span("fetch", "BigQuery", chunk=checkpoint.state["chunks"]) as span:
+                df = table.to_pandas()
+                offset += len(df)
+                checkpoint.add_chunk(df, offset)
+                span.set(rows=len(df), bytes=frame_nbytes(df))
+        if not checkpoint.state["chunks"]:
+            columns = [field.name for field in rows.schema]
+            checkpoint.add_chunk(pd.DataFrame(columns=columns), offset)
+
+    def _extract_snowflake_chunks(self, query, checkpoint, chunk_rows):
+        """
+        Runs a Snowflake query (once per checkpoint) and stores its result in chunks of whole
+        result batches, starting at the batch reached by the checkpoint.
+        """
+        import pyarrow as pa
+
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                query_id = checkpoint.state.get("query_id")
+                if query_id is not None:
+                    try:
+                        with self.metrics.span("wait", "Snowflake", resumed=True):
+                            cursor.get_results_from_sfqid(query_id)
+                    except Exception as e:
+                        if self.retry_policy.retryable(e):
+                            raise
+                        logging.warning(
+                            f"Result of query {query_id} is no longer available, restarting: {e}"
+                        )
+                        checkpoint.reset()
+                        query_id = None
+                if query_id is None:
+                    with self.metrics.span("wait", "Snowflake"):
+                        cursor.execute(query)
+                    checkpoint.save_state(query_id=cursor.sfqid)
+
+                # Result batches are downloaded on demand, so batches already stored are skipped
+                batches = cursor.get_result_batches() or []
+                pending = []
+                pending_rows = 0
+                for index in range(checkpoint.state["position"], len(batches)):
+                    pending.append(batches[index].to_arrow())
+                    pending_rows += pending[-1].num_rows
+                    if pending_rows >= chunk_rows or index == len(batches) - 1:
+                        chunk = checkpoint.state["chunks"]
+                        with self.metrics.span("fetch", "Snowflake", chunk=chunk) as span:
+                            df = pa.concat_tables(pending, promote_options="permissive").to_pandas()
+                            checkpoint.add_chunk(df, index + 1)
+                            span.set(rows=len(df), bytes=frame_nbytes(df))
+                        pending = []
+                        pending_rows = 0
+                if not checkpoint.state["chunks"]:
+                    columns = [col[0] for col in cursor.description]
+                    checkpoint.add_chunk(pd.DataFrame(columns=columns), 0)
+            finally:
+                cursor.close()
+
+    def iter_bigquery(self, query, chunk_rows=100_000, arrow=False):
+        """
+        Executes a SQL query on BigQuery and yields the result in chunks of bounded size.
+
+        Statistics are recorded in `import_logs` once the stream has been fully consumed.
+
+        Args:
+            query (str): The SQL query to execute.
+            chunk_rows (int): Maximum number of rows per chunk.
+            arrow (bool): Whether to yield pyarrow Tables instead of pandas DataFrames.
+
+        Yields:
+            pandas.DataFrame or pyarrow.Table: The next chunk of the result.
+        """
+        logging.info("Streaming query results from BigQuery...")
+        start_time = time.time()
+
+        client = self.get_bigquery_client()
+        with self.metrics.span("submit", "BigQuery"):
+            query_job = client.query(query)
+        with self.metrics.span("wait", "BigQuery") as span:
+            result = query_job.result(page_size=chunk_rows)
+            span.set(rows=result.total_rows, bytes=query_job.total_bytes_processed)
+
+        row_count = 0
+        col_count = 0
+        for table in rechunk_arrow(result.to_arrow_iterable(), chunk_rows):
+            row_count += table.num_rows
+            col_count = table.num_columns
+            yield table if arrow else table.to_pandas()
+
+        query_time = time.time() - start_time
+        transmitted_mb = (query_job.total_bytes_billed or 0) * 0.000001
+        self._log_import("BigQuery", query, row_count, col_count, transmitted_mb, query_time)
+        logging.info(
+            f"BigQuery stream completed: Rows={row_count}, Columns={col_count}, "
+            f"Data={transmitted_mb:.2f} MB, Time={query_time:.2f} seconds."
+        )
+
+    def iter_snowflake(self, query, chunk_rows=100_000, arrow=False):
+        """
+        Executes a SQL query on Snowflake and yields the result in chunks of bounded size.
+
+        Chunks are built from the cursor's Arrow batches when available, otherwise from
+        fetchmany. Statistics are recorded in `import_logs` once the stream has been fully
+        consumed.
+
+        Args:
+            query (str): The SQL query to execute.
+            chunk_rows (int): Maximum number of rows per chunk.
+            arrow (bool): Whether to yield pyarrow Tables instead of pandas DataFrames.
+
+        Yields:
+            pandas.DataFrame or pyarrow.Table: The next chunk of the result.
+        """
+        logging.info("Streaming query results from Snowflake...")
+        start_time = time.time()
+
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                with self.metrics.span("wait", "Snowflake"):
+                    cursor.execute(query)
+                columns = [col[0] for col in cursor.description]
+
+                try:
+                    batches = iter(cursor.fetch_arrow_batches())
+                    first_batch = next(batches, None)
+                    use_arrow = True
+                except Exception as e:
+                    logging.info(f"Arrow results are not available, falling back to fetchmany: {e}")
+                    use_arrow = False
+
+                if use_arrow:
+                    head = [first_batch] if first_batch is not None else []
+                    tables = itertools.chain(head, batches)
+                    chunks = (
+                        table if arrow else table.to_pandas()
+                        for table in rechunk_arrow(tables, chunk_rows)
+                    )
+                else:
+                    chunks = (
+                        pa_table_from_pandas(df) if arrow else df
+                        for df in iter_fetchmany(cursor, columns, chunk_rows)
+                    )
+
+                row_count = 0
+                for chunk in chunks:
+                    row_count += chunk.num_rows if arrow else len(chunk)
+                    yield chunk
+
+            finally:
+                cursor.close()
+
+        query_time = time.time() - start_time
+        self._log_import("Snowflake", query, row_count, len(columns), None, query_time)
+        logging.info(
+            f"Snowflake stream completed: Rows={row_count}, Columns={len(columns)}, "
+            f"Processing Time={query_time:.2f} seconds."
+        )
+
+    def stream_to_sink(self, chunks, sink, method="bulk"):
+        """
+        Writes a stream of result chunks to a sink without materializing the full result.
+
+        A `storage.LocalDataset` sink appends the chunks to the (partitioned) dataset.
+        Otherwise the sink is chosen by its name: paths ending with ".parquet" or ".csv" are
+        written as local files, anything else is treated as a Snowflake table name and each
+        chunk is loaded with `write_to_snowflake`.
+
+        Args:
+            chunks (iterable): pandas DataFrames or pyarrow Tables, e.g. from `iter_bigquery`.
+            sink (str or LocalDataset): Local dataset, output file path or Snowflake table name.
+            method (str): Write method passed to `write_to_snowflake` for table sinks.
+
+        Returns:
+            int: Total number of rows written.
+        """
+        logging.info(f"Streaming results to '{sink}'...")
+        row_count = 0
+
+        if isinstance(sink, LocalDataset):
+            row_count = sink.write(chunks)
+
+        elif sink.lower().endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            writer = None
+            try:
+                for chunk in chunks:
+                    if isinstance(chunk, pd.DataFrame):
+                        chunk = pa_table_from_pandas(chunk)
+                    table = chunk
+                    if writer is None:
+                        writer = pq.ParquetWriter(sink, table.schema)
+                    writer.write_table(table.cast(writer.schema))
+                    row_count += table.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        elif sink.lower().endswith(".csv"):
+            for chunk in chunks:
+                df = chunk if isinstance(chunk, pd.DataFrame) else chunk.to_pandas()
+                df.to_csv(sink, mode="a" if row_count else "w", header=not row_count, index=False)
+                row_count += len(df)
+
+        else:
+            for chunk in chunks:
+                df = chunk if isinstance(chunk, pd.DataFrame) else chunk.to_pandas()
+                self.write_to_snowflake(df, sink, method=method)
+                row_count += len(df)
+
+        logging.info(f"Streamed {row_count} rows to '{sink}'.")
+        return row_count
+
+    def query(self, source, query, params=None, **kwargs):
+        """
+        Executes a SQL query on a backend by name and returns the result as a pandas DataFrame.
+
+        "bigquery" and "snowflake" run through `query_bigquery` and `query_snowflake`. Other
+        names are looked up in the backend registry (see `backends.register_backend`) and
+        connect with their entry in `backend_configs`; their client libraries are only
+        imported on first use.
+
+        Args:
+            source (str): The backend name (case-insensitive).
+            query (str): The SQL query to execute.
+            params: Optional query parameters (Snowflake and registered backends).
+            **kwargs: Passed to `query_bigquery` or `query_snowflake`.
+
+        Returns:
+            pandas.DataFrame: Query result as a DataFrame.
+        """
+        source = source.lower()
+        if source == "bigquery":
+            return self.query_bigquery(query, **kwargs)
+        if source == "snowflake":
+            if params is not None:
+                kwargs["params"] = params
+            return self.query_snowflake(query, **kwargs)
+
+        backend = get_backend(source)
+        if source not in self._backend_connections:
+            with self._connection_lock:
+                if source not in self._backend_connections:
+                    logging.info(f"Initializing {source} connection...")
+                    with self.metrics.span("connect", source):
+                        self._backend_connections[source] = backend.connect(
+                            self.backend_configs.get(source, {})
+                        )
+        conn = self._backend_connections[source]
+
+        logging.info(f"Executing query on {source}...")
+        start_time = time.time()
+        with self.metrics.span("fetch", source) as span:
+            df = backend.query(conn, query, params)
+            span.set(rows=len(df), bytes=frame_nbytes(df))
+        df = self._compact(df, source)
+        query_time = time.time() - start_time
+
+        self._log_import(source, query, len(df), len(df.columns), None, query_time)
+        logging.info(
+            f"{source}: Rows={len(df)}, Columns={len(df.columns)}, Time={query_time:.2f} seconds."
+        )
+        return df
+
+    def query_many(self, jobs, max_workers=None, timeout=None):
+        """
+        Executes several queries concurrently and returns their results in job order.
+
+        Each job is a tuple of (source, query) or (source, query, timeout), where source is
+        "bigquery", "snowflake" or another registered backend (see `query`). Jobs run on a
+        thread pool; a job's timeout is measured from the moment it starts running. If any job
+        fails or times out, jobs that have not started yet are cancelled and the error is raised.
+
+        Args:
+            jobs (list): List of (source, query[, timeout]) tuples.
+            max_workers (int): Maximum number of concurrent queries. Defaults to one per job.
+            timeout (float): Default per-job timeout in seconds (None for no timeout).
+
+        Returns:
+            list: Query results as pandas DataFrames, in the same order as `jobs`.
+
+        Raises:
+            concurrent.futures.TimeoutError: If a job exceeds its timeout.
+        """
+        if not jobs:
+            return []
+
+        parsed_jobs = []
+        for job in jobs:
+            source, query = job[0], job[1]
+            job_timeout = job[2] if len(job) > 2 else timeout
+            # Fail before starting any job if a source is unknown
+            get_backend(source)
+            parsed_jobs.append((functools.partial(self.query, source), source, query, job_timeout))
+
+        started = {}
+
+        def run_job(index, query_method, query):
+            started[index] = time.monotonic()
+            return query_method(query)
+
+        logging.info(f"Running {len(parsed_jobs)} queries concurrently...")
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(parsed_jobs), thread_name_prefix="query_many"
+        )
+        futures = [
+            executor.submit(run_job, index, query_method, query)
+            for index, (query_method, _, query, _) in enumerate(parsed_jobs)
+        ]
+        pending = set(futures)
+
+        try:
+            while pending:
+                # Wake up at the earliest deadline of a running job, or on the first failure
+                timed = [
+                    index for index, future in enumerate(futures)
+                    if future in pending and parsed_jobs[index][3] is not None
+                ]
+                deadlines = [
+                    started[index] + parsed_jobs[index][3] for index in timed if index in started
+                ]
+                wait_timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                if any(index not in started for index in timed):
+                    # Pending jobs with a timeout have not started yet, poll until they do
+                    wait_timeout = min(wait_timeout, 0.1) if wait_timeout is not None else 0.1
+
+                done, pending = wait(pending, timeout=wait_timeout, return_when=FIRST_EXCEPTION)
+
+                for future in done:
+                    if future.exception() is not None:
+                        raise future.exception()
+
+                now = time.monotonic()
+                for index, future in enumerate(futures):
+                    job_timeout = parsed_jobs[index][3]
+                    if (future in pending and index in started and job_timeout is not None
+                            and now - started[index] >= job_timeout):
+                        raise TimeoutError(
+                            f"{parsed_jobs[index][1]} job {index} exceeded its timeout of "
+                            f"{job_timeout} seconds."
+                        )
+
+            return [future.result() for future in futures]
+
+        except BaseException:
+            cancelled = sum(future.cancel() for future in pending)
+            logging.error(f"Query job failed, cancelled {cancelled} pending job(s).")
+            raise
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract_and_join(self, bigquery_query, snowflake_query, join_columns, output_columns,
+                         how="inner", first="snowflake", filter_column=None,
+                         max_keys_per_query=100_000, **join_kwargs):
+        """
+        Extracts from BigQuery and Snowflake and joins the results, pushing the join's needs
+        down into the source queries.
+
+        Both queries are wrapped so that they select only the join columns and the output
+        columns they provide (columns are discovered with a BigQuery dry run and a Snowflake
+        DESCRIBE, without reading data). The `first` side is fetched first; its distinct values
+        of `filter_column` are then pushed to the other side as a filter, as chunked array
+        parameters on BigQuery or through a temporary table on Snowflake. The key filter is
+        only applied when it cannot drop rows the join type must keep.
+
+        Keys are compared by their string form (like the in-memory join), so the pushdown
+        works best for string and integer keys.
+
+        Args:
+            bigquery_query (str): The BigQuery query (the left side of the join).
+            snowflake_query (str): The Snowflake query (the right side of the join).
+            join_columns (list): List of column names to join on.
+            output_columns (list): List of column names to include in the output.
+            how (str): Join type: "inner", "left", "right" or "outer".
+            first (str): Side fetched first, "snowflake" or "bigquery"; usually the smaller one.
+            filter_column (str): Join column whose keys are pushed down. Defaults to the join
+                column with the most distinct values on the first side.
+            max_keys_per_query (int): Maximum number of keys per BigQuery query.
+            **join_kwargs: Additional arguments passed to `join_results`.
+
+        Returns:
+            pandas.DataFrame: The joined DataFrame with selected output columns.
+        """
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Unknown join type '{how}', expected one of {JOIN_TYPES}.")
+        if first not in ("snowflake", "bigquery"):
+            raise ValueError(f"Unknown first side '{first}', expected 'snowflake' or 'bigquery'.")
+
+        bigquery_select, snowflake_select = self._join_projections(
+            bigquery_query, snowflake_query, join_columns, output_columns
+        )
+        logging.info(
+            f"Projecting BigQuery to {bigquery_select} and Snowflake to {snowflake_select}."
+        )
+
+        # Filtering the second side only drops rows without a match, which the join type must allow
+        preserved_sides = {"inner": (), "left": ("bigquery",), "right": ("snowflake",),
+                           "outer": ("bigquery", "snowflake")}[how]
+        second = "bigquery" if first == "snowflake" else "snowflake"
+        push_keys = second not in preserved_sides
+
+        if first == "snowflake":
+            snowflake_df = self.query_snowflake(
+                self._snowflake_pushdown_query(snowflake_query, snowflake_select)
+            )
+            keys, filter_column = self._pushdown_keys(
+                snowflake_df, join_columns, filter_column, push_keys
+            )
+            bigquery_df = self._query_bigquery_pushdown(
+                bigquery_query, bigquery_select, filter_column, keys, max_keys_per_query
+            )
+        else:
+            bigquery_df = self.query_bigquery(
+                self._bigquery_pushdown_query(bigquery_query, bigquery_select)
+            )
+            keys, filter_column = self._pushdown_keys(
+                bigquery_df, join_columns, filter_column, push_keys
+            )
+            snowflake_df = self._query_snowflake_pushdown(
+                snowflake_query, snowflake_select, filter_column, keys
+            )
+
+        return self.join_results(
+            bigquery_df, snowflake_df, join_columns, output_columns, how=how, **join_kwargs
+        )
+
+    def _join_projections(self, bigquery_query, snowflake_query, join_columns, output_columns):
+        """
+        Discovers the columns of both queries and picks the ones each side of a join must
+        select: the join columns and the output columns it provides. Output columns present
+        on both sides are taken from the BigQuery (left) side.
+
+        Returns:
+            tuple: (BigQuery columns, Snowflake columns) to select.
+
+        Raises:
+            KeyError: If a join column is missing from either query.
+        """
+        bigquery_columns = self._bigquery_columns(bigquery_query)
+        snowflake_columns = self._snowflake_columns(snowflake_query)
+        for source, columns in (("BigQuery", bigquery_columns), ("Snowflake", snowflake_columns)):
+            missing_columns = [col for col in join_columns if col not in columns]
+            if missing_columns:
+                raise KeyError(f"Join columns missing from the {source} query: {missing_columns}")
+
+        bigquery_select = [
+            col for col in bigquery_columns if col in join_columns or col in output_columns
+        ]
+        snowflake_select = [
+            col for col in snowflake_columns
+            if col in join_columns or (col in output_columns and col not in bigquery_select)
+        ]
+        return bigquery_select, snowflake_select
+
+    def plan_federated_join(self, bigquery_query, snowflake_query, join_columns, output_columns,
+                            how="inner", min_savings=0.2, max_ship_bytes=None):
+        """
+        Estimates the size of both sides of a join and picks where to run it.
+
+        Both queries are projected to the columns the join needs (see `extract_and_join`).
+        The BigQuery side is estimated with a dry run, the Snowflake side from its row count
+        and estimated row width, both in uncompressed bytes; see `planner.plan_join` for the
+        cost model. Joining in BigQuery is only considered if `bigquery_config` has a
+        "temp_dataset" to stage the Snowflake result in.
+
+        Args:
+            bigquery_query (str): The BigQuery query (the left side of the join).
+            snowflake_query (str): The Snowflake query (the right side of the join).
+            join_columns (list): List of column names to join on.
+            output_columns (list): List of column names to include in the output.
+            how (str): Join type: "inner", "left", "right" or "outer".
+            min_savings (float): Fraction of the client-side cost a warehouse join must save.
+            max_ship_bytes (int): Maximum estimated size of a result shipped between warehouses.
+
+        Returns:
+            planner.JoinPlan: The chosen placement with its estimates.
+        """
+        return self._plan_federated_join(
+            bigquery_query, snowflake_query, join_columns, output_columns, how, min_savings,
+            max_ship_bytes,
+        )[0]
+
+    def federated_join(self, bigquery_query, snowflake_query, join_columns, output_columns,
+                       how="inner", placement=None, min_savings=0.2, max_ship_bytes=None,
+                       **join_kwargs):
+        """
+        Joins a BigQuery and a Snowflake query where it moves the fewest bytes.
+
+        The placement is chosen by `plan_federated_join`:
+            - "client": both projected results are downloaded and joined with `join_results`.
+            - "snowflake": the BigQuery result is uploaded into a temporary Snowflake table and
+              joined with the Snowflake query there; only the joined result is downloaded.
+            - "bigquery": the Snowflake result is loaded into a table in the BigQuery
+              "temp_dataset" and joined there; the table is deleted afterwards.
+
+        Keys are compared by their string form in the warehouse joins, and NULL keys never
+        match. The decision, estimated and actual bytes are recorded in `plan_logs`.
+
+        Args:
+            bigquery_query (str): The BigQuery query (the left side of the join).
+            snowflake_query (str): The Snowflake query (the right side of the join).
+            join_columns (list): List of column names to join on.
+            output_columns (list): List of column names to include in the output.
+            how (str): Join type: "inner", "left", "right" or "outer".
+            placement (str): Force a placement ("client", "snowflake" or "bigquery"; the latter
+                requires a "temp_dataset" in `bigquery_config`).
+            min_savings (float): Fraction of the client-side cost a warehouse join must save.
+            max_ship_bytes (int): Maximum estimated size of a result shipped between warehouses.
+            **join_kwargs: Additional arguments passed to `join_results` for client-side joins.
+
+        Returns:
+            pandas.DataFrame: The joined DataFrame with selected output columns.
+        """
+        if placement is not None and placement not in PLACEMENTS:
+            raise ValueError(f"Unknown placement '{placement}', expected one of {PLACEMENTS}.")
+        if placement == "bigquery" and not self.bigquery_config.get("temp_dataset"):
+            raise ValueError(
+                "Placement 'bigquery' requires bigquery_config['temp_dataset'] to stage the "
+                "Snowflake result in."
+            )
+
+        start_time = time.time()
+        with self.metrics.span("plan", how=how) as span:
+            plan, bigquery_sql, snowflake_sql, bigquery_select = self._plan_federated_join(
+                bigquery_query, snowflake_query, join_columns, output_columns, how, min_savings,
+                max_ship_bytes,
+            )
+            if placement is not None and placement != plan.placement:
+                plan.placement, plan.reason = placement, "forced"
+            span.set(placement=plan.placement)
+        logging.info(
+            f"Federated join placement: {plan.placement} ({plan.reason}), "
+            f"estimated costs {plan.costs}."
+        )
+
+        bigquery_bytes = snowflake_bytes = None
+        if plan.placement == "client":
+            bigquery_df = self.query_bigquery(bigquery_sql)
+            snowflake_df = self.query_snowflake(snowflake_sql)
+            bigquery_bytes = frame_nbytes(bigquery_df, deep=True)
+            snowflake_bytes = frame_nbytes(snowflake_df, deep=True)
+            result_df = self.join_results(
+                bigquery_df, snowflake_df, join_columns, output_columns, how=how, **join_kwargs
+            )
+        else:
+            join_start_time = time.time()
+            if plan.placement == "snowflake":
+                bigquery_df = self.query_bigquery(bigquery_sql)
+                bigquery_bytes = frame_nbytes(bigquery_df, deep=True)
+                result_df = self._join_in_snowflake(
+                    bigquery_df, snowflake_sql, join_columns, bigquery_select, output_columns, how
+                )
+            else:
+                snowflake_df = self.query_snowflake(snowflake_sql)
+                snowflake_bytes = frame_nbytes(snowflake_df, deep=True)
+                result_df = self._join_in_bigquery(
+                    bigquery_sql, snowflake_df, join_columns, bigquery_select, output_columns, how
+                )
+            self.metrics.record(
+                "join",
+                df1_shape=None,
+                df2_shape=None,
+                join_columns=join_columns,
+                output_columns=output_columns,
+                how=how,
+                mode=plan.placement,
+                result_shape=result_df.shape,
+                duplicate_rows=None,
+                time_sec=time.time() - join_start_time,
+            )
+
+        self.metrics.record(
+            "plan",
+            placement=plan.placement,
+            how=how,
+            reason=plan.reason,
+            bigquery_bytes_est=plan.bigquery_bytes,
+            snowflake_bytes_est=plan.snowflake_bytes,
+            output_bytes_est=plan.output_bytes,
+            costs=plan.costs,
+            bigquery_bytes=bigquery_bytes,
+            snowflake_bytes=snowflake_bytes,
+            output_bytes=frame_nbytes(result_df, deep=True),
+            time_sec=time.time() - start_time,
+        )
+        return result_df
+
+    def _plan_federated_join(self, bigquery_query, snowflake_query, join_columns, output_columns,
+                             how, min_savings, max_ship_bytes):
+        """
+        Projects both queries and plans the join.
+
+        Returns:
+            tuple: (JoinPlan, projected BigQuery query, projected Snowflake query, BigQuery
+                columns).
+        """
+        bigquery_select, snowflake_select = self._join_projections(
+            bigquery_query, snowflake_query, join_columns, output_columns
+        )
+        bigquery_sql = self._bigquery_pushdown_query(bigquery_query, bigquery_select)
+        snowflake_sql = self._snowflake_pushdown_query(snowflake_query, snowflake_select)
+
+        with self.metrics.span("estimate", "BigQuery") as span:
+            job_config = bigquery_sdk().QueryJobConfig(dry_run=True, use_query_cache=False)
+            bigquery_bytes, _ = estimate_bigquery(
+                self.get_bigquery_client(), bigquery_sql, job_config
+            )
+            span.set(bytes=bigquery_bytes)
+        with self.metrics.span("estimate", "Snowflake") as span, \
+                self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                snowflake_bytes, snowflake_rows = estimate_snowflake(cursor, snowflake_sql)
+            finally:
+                cursor.close()
+            span.set(rows=snowflake_rows, bytes=snowflake_bytes)
+
+        placements = ("client", "snowflake")
+        if self.bigquery_config.get("temp_dataset"):
+            placements += ("bigquery",)
+        plan = plan_join(
+            bigquery_bytes, snowflake_bytes, how, placements, min_savings, max_ship_bytes
+        )
+        return plan, bigquery_sql, snowflake_sql, bigquery_select
+
+    def _join_in_snowflake(self, bigquery_df, snowflake_sql, join_columns, bigquery_columns,
+                           output_columns, how):
+        """
+        Uploads the BigQuery result into a temporary Snowflake table and joins it there.
+        """
+        staging_table = f'"federated_{uuid.uuid4().hex}"'
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {staging_table} (" + ", ".join(
+                        f'"{col}" {snowflake_column_type(bigquery_df[col])}'
+                        for col in bigquery_df.columns
+                    ) + ")"
+                )
+                self._write_to_snowflake_bulk(
+                    cursor, bigquery_df, staging_table, chunk_rows=1_000_000, compression="snappy"
+                )
+                sql = join_sql(
+                    "snowflake", staging_table, f"(\n{snowflake_sql}\n)", join_columns,
+                    bigquery_columns, output_columns, how,
+                )
+                # The temporary table lives in this connection's session, like in the pushdown
+                return self.query_snowflake(sql, use_cache=False)
+            finally:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+                cursor.close()
+
+    def _join_in_bigquery(self, bigquery_sql, snowflake_df, join_columns, bigquery_columns,
+                          output_columns, how):
+        """
+        Loads the Snowflake result into a table in the BigQuery temp_dataset and joins it there.
+        """
+        client = self.get_bigquery_client()
+        dataset = self.bigquery_config["temp_dataset"]
+        if "." not in dataset:
+            dataset = f"{client.project}.{dataset}"
+        table_id = f"{dataset}.federated_{uuid.uuid4().hex}"
+
+        try:
+            with self.metrics.span("write", "BigQuery", table=table_id) as span:
+                client.load_table_from_dataframe(snowflake_df, table_id).result()
+                span.set(rows=len(snowflake_df))
+            # Expire the table in case the process dies before deleting it
+            table = client.get_table(table_id)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            table.expires = now + datetime.timedelta(days=1)
+            client.update_table(table, ["expires"])
+
+            sql = join_sql(
+                "bigquery", f"(\n{bigquery_sql}\n)", f"`{table_id}`", join_columns,
+                bigquery_columns, output_columns, how,
+            )
+            return self.query_bigquery(sql, use_cache=False)
+        finally:
+            client.delete_table(table_id, not_found_ok=True)
+
+    def query_incremental(self, source, query, watermark_column, store, key=None):
+        """
+        Executes a query and returns only the rows newer than the stored high-water mark.
+
+        The query is wrapped with a `watermark_column > watermark` filter (bound as a query
+        parameter). The new watermark, the maximum of `watermark_column` in the result, is kept
+        pending until `commit_watermarks` is called, so a failed downstream write does not
+        advance it. Without a stored watermark the full result is returned.
+
+        Args:
+            source (str): "bigquery" or "snowflake".
+            query (str): The SQL query.
+            watermark_column (str): Monotonically increasing result column, e.g.
+                "event_timestamp_utc".
+            store (WatermarkStore): Store holding the persisted watermarks.
+            key (str): Watermark key. Defaults to one derived from the source and query text.
+
+        Returns:
+            pandas.DataFrame: The rows newer than the watermark.
+        """
+        source = source.lower()
+        if source not in ("bigquery", "snowflake"):
+            raise ValueError(
+                f"Unknown query source '{source}', expected 'bigquery' or 'snowflake'."
+            )
+
+        key = key or self._watermark_key(source, query)
+        watermark = store.get(key)
+        logging.info(f"Incremental {source} query '{key}' from watermark {watermark}.")
+
+        if watermark is None:
+            df = self.query_bigquery(query) if source == "bigquery" else self.query_snowflake(query)
+        elif source == "bigquery":
+            sql = (
+                f"SELECT *\nFROM (\n{normalize_sql(query)}\n) AS source\n"
+                f"WHERE source.`{watermark_column}` > @watermark"
+            )
+            job_config = bigquery_sdk().QueryJobConfig(
+                query_parameters=[
+                    bigquery_sdk().ScalarQueryParameter(
+                        "watermark", bigquery_parameter_type(watermark), watermark
+                    )
+                ]
+            )
+            df = self.query_bigquery(sql, job_config=job_config)
+        else:
+            sql = (
+                f"SELECT *\nFROM (\n{normalize_sql(query)}\n) AS source\n"
+                f'WHERE source."{watermark_column}" > %(watermark)s'
+            )
+            df = self.query_snowflake(sql, params={"watermark": watermark})
+
+        new_watermark = df[watermark_column].max() if len(df) else None
+        if new_watermark is not None and not pd.isna(new_watermark):
+            self._pending_watermarks[key] = (store, new_watermark)
+            logging.info(
+                f"Incremental {source} query '{key}': {len(df)} new rows, "
+                f"watermark -> {new_watermark}."
+            )
+        else:
+            logging.info(f"Incremental {source} query '{key}': no new rows.")
+
+        return df
+
+    def commit_watermarks(self):
+        """
+        Persists the watermarks of the incremental queries run since the last commit.
+        Call it once the extracted delta has been written successfully.
+        """
+        for key, (store, watermark) in self._pending_watermarks.items():
+            store.set(key, watermark)
+            logging.info(f"Committed watermark of '{key}': {watermark}.")
+        self._pending_watermarks = {}
+
+    @staticmethod
+    def _watermark_key(source, query):
+        """
+        Derives a stable watermark key from the source and normalized query text.
+        """
+        digest = hashlib.sha256(normalize_sql(query).encode("utf-8")).hexdigest()[:16]
+        return f"{source}:{digest}"
+
+    def incremental_extract_and_join(self, bigquery_query, snowflake_query, join_columns,
+                                     output_columns, watermark_column, store, key=None,
+                                     how="inner", **join_kwargs):
+        """
+        Extracts the new BigQuery rows since the last watermark and joins only this delta.
+
+        The Snowflake side is projected to the needed columns and filtered to the delta's
+        keys through a temporary table (see `extract_and_join`), so only the orders that can
+        match the new events are read. Call `commit_watermarks` after writing the result.
+
+        Args:
+            bigquery_query (str): The BigQuery query (the left side of the join).
+            snowflake_query (str): The Snowflake query (the right side of the join).
+            join_columns (list): List of column names to join on.
+            output_columns (list): List of column names to include in the output.
+            watermark_column (str): BigQuery result column holding the watermark.
+            store (WatermarkStore): Store holding the persisted watermarks.
+            key (str): Watermark key of the BigQuery query.
+            how (str): Join type, "inner" or "left".
+            **join_kwargs: Additional arguments passed to `join_results`.
+
+        Returns:
+            pandas.DataFrame: The joined delta with selected output columns.
+        """
+        if how not in ("inner", "left"):
+            raise ValueError("Incremental joins support only 'inner' and 'left' joins.")
+
+        delta_df = self.query_incremental("bigquery", bigquery_query, watermark_column, store, key)
+        if delta_df.empty:
+            return pd.DataFrame(columns=output_columns)
+
+        snowflake_select = [
+            col for col in self._snowflake_columns(snowflake_query)
+            if col in join_columns or (col in output_columns and col not in delta_df.columns)
+        ]
+        keys, filter_column = self._pushdown_keys(delta_df, join_columns, None, True)
+        snowflake_df = self._query_snowflake_pushdown(
+            snowflake_query, snowflake_select, filter_column, keys
+        )
+
+        return self.join_results(
+            delta_df, snowflake_df, join_columns, output_columns, how=how, **join_kwargs
+        )
+
+    def merge_into_snowflake(self, df, table_name, key_columns, chunk_rows=1_000_000,
+                             compression="snappy"):
+        """
+        Upserts a DataFrame into a Snowflake table with MERGE on the key columns.
+
+        The frame is bulk-loaded into a temporary staging table (see `write_to_snowflake`
+        with method="bulk") and merged into the target: rows with matching keys are updated,
+        the others are inserted. The target is created with inferred column types if it does
+        not exist. Rows with duplicate keys are reduced to the last one, since MERGE requires
+        unique source keys. The caller's DataFrame is not modified.
+
+        Args:
+            df (pd.DataFrame): The pandas DataFrame to write.
+            table_name (str): The name of the target Snowflake table.
+            key_columns (list): Columns identifying a row (lowercased like the table columns).
+            chunk_rows (int): Maximum rows per staged Parquet file.
+            compression (str): Parquet compression codec.
+
+        Returns:
+            pandas.DataFrame: The merged DataFrame with lowercase column names.
+        """
+        df = df.rename(columns=lambda col: col.lower())
+        key_columns = [col.lower() for col in key_columns]
+        missing_columns = [col for col in key_columns if col not in df.columns]
+        if missing_columns:
+            raise KeyError(f"Key columns not found in DataFrame: {missing_columns}")
+
+        duplicated_keys = df.duplicated(subset=key_columns, keep="last")
+        if duplicated_keys.any():
+            logging.warning(
+                f"Dropping {duplicated_keys.sum()} rows with duplicate keys before MERGE."
+            )
+            df = df[~duplicated_keys]
+
+        staging_table = f'"merge_staging_{uuid.uuid4().hex}"'
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                create_table_statement = f"CREATE TABLE IF NOT EXISTS {table_name} (" + \
+                    ", ".join(
+                        [f'"{col}" {snowflake_column_type(df[col])}' for col in df.columns]
+                    ) + ")"
+                cursor.execute(create_table_statement)
+                cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} LIKE {table_name}")
+
+                self._write_to_snowflake_bulk(cursor, df, staging_table, chunk_rows, compression)
+
+                on_clause = " AND ".join(
+                    f'EQUAL_NULL(target."{col}", source."{col}")' for col in key_columns
+                )
+                value_columns = [col for col in df.columns if col not in key_columns]
+                merge_statement = (
+                    f"MERGE INTO {table_name} AS target USING {staging_table} AS source "
+                    f"ON {on_clause}"
+                )
+                if value_columns:
+                    merge_statement += " WHEN MATCHED THEN UPDATE SET " + ", ".join(
+                        f'target."{col}" = source."{col}"' for col in value_columns
+                    )
+                merge_statement += (
+                    " WHEN NOT MATCHED THEN INSERT ("
+                    + ", ".join(f'"{col}"' for col in df.columns) + ")"
+                    " VALUES (" + ", ".join(f'source."{col}"' for col in df.columns) + ")"
+                )
+                with self._write_phase(table_name, "merge", "merge", len(df)):
+                    cursor.execute(merge_statement)
+
+                logging.info(
+                    f"Successfully merged {len(df)} rows into Snowflake table '{table_name}'."
+                )
+
+            except Exception as e:
+                logging.error(f"Error while merging data into Snowflake: {str(e)}")
+                raise
+            finally:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+                cursor.close()
+
+        return df
+
+    def _bigquery_columns(self, query):
+        """
+        Returns the result column names of a BigQuery query using a dry run.
+        """
+        client = self.get_bigquery_client()
+        job_config = bigquery_sdk().QueryJobConfig(dry_run=True, use_query_cache=False)
+        return [field.name for field in client.query(query, job_config=job_config).schema]
+
+    def _snowflake_columns(self, query):
+        """
+        Returns the result column names of a Snowflake query without executing it.
+        """
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                return [column.name for column in cursor.describe(query)]
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def _pushdown_keys(df, join_columns, filter_column, push_keys):
+        """
+        Returns the distinct non-null keys of the filter column as strings, and the filter column.
+        Returns (None, None) if no keys should be pushed down.
+        """
+        if not push_keys:
+            return None, None
+        if filter_column is None:
+            filter_column = max(join_columns, key=lambda col: df[col].nunique())
+        _, strings = normalized_key_strings(df[filter_column])
+        logging.info(f"Pushing down {len(strings)} distinct '{filter_column}' keys.")
+        return strings.tolist(), filter_column
+
+    @staticmethod
+    def _bigquery_pushdown_query(query, columns, filter_column=None):
+        """
+        Wraps a BigQuery query to select only the given columns, optionally filtered to the
+        keys in the @join_keys array parameter.
+        """
+        select_list = ", ".join(f"source.`{col}`" for col in columns)
+        sql = f"SELECT {select_list}\nFROM (\n{normalize_sql(query)}\n) AS source"
+        if filter_column is not None:
+            sql += f"\nWHERE CAST(source.`{filter_column}` AS STRING) IN UNNEST(@join_keys)"
+        return sql
+
+    @staticmethod
+    def _snowflake_pushdown_query(query, columns, filter_column=None, key_table=None):
+        """
+        Wraps a Snowflake query to select only the given columns, optionally filtered to the
+        keys stored in a key table.
+        """
+        select_list = ", ".join(f'source."{col}"' for col in columns)
+        sql = f"SELECT {select_list}\nFROM (\n{normalize_sql(query)}\n) AS source"
+        if filter_column is not None:
+            sql += (
+                f'\nWHERE TO_VARCHAR(source."{filter_column}") '
+                f'IN (SELECT "key" FROM {key_table})'
+            )
+        return sql
+
+    def _query_bigquery_pushdown(self, query, columns, filter_column, keys, max_keys_per_query):
+        """
+        Runs a projected BigQuery query, filtered to the given keys in chunks of array parameters.
+        """
+        if keys is None:
+            return self.query_bigquery(self._bigquery_pushdown_query(query, columns))
+
+        sql = self._bigquery_pushdown_query(query, columns, filter_column)
+        frames = []
+        for offset in range(0, max(len(keys), 1), max_keys_per_query):
+            job_config = bigquery_sdk().QueryJobConfig(
+                query_parameters=[
+                    bigquery_sdk().ArrayQueryParameter(
+                        "join_keys", "STRING", keys[offset:offset + max_keys_per_query]
+                    )
+                ]
+            )
+            frames.append(self.query_bigquery(sql, job_config=job_config))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def _query_snowflake_pushdown(self, query, columns, filter_column, keys):
+        """
+        Runs a projected Snowflake query, filtered to the given keys through a temporary table.
+        """
+        if keys is None:
+            return self.query_snowflake(self._snowflake_pushdown_query(query, columns))
+
+        key_table = f'"join_keys_{uuid.uuid4().hex}"'
+        with self.snowflake_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'CREATE TEMPORARY TABLE {key_table} ("key" VARCHAR)')
+                self._write_to_snowflake_bulk(
+                    cursor, pd.DataFrame({"key": pd.Series(keys, dtype=object)}), key_table,
+                    chunk_rows=1_000_000, compression="snappy",
+                )
+                # The temporary table lives in this connection's session; the nested checkout in
+                # query_snowflake gets the same connection
+                return self.query_snowflake(
+                    self._snowflake_pushdown_query(query, columns, filter_column, key_table),
+                    use_cache=False,
+                )
+            finally:
+                cursor.execute(f"DROP TABLE IF EXISTS {key_table}")
+                cursor.close()
+
+    def _bigquery_target(self):
+        """
+        Returns the BigQuery connection target used in cache keys.
+        """
+        return {"project": self.bigquery_config.get("project")}
+
+    def _snowflake_target(self):
+        """
+        Returns the Snowflake connection target used in cache keys.
+        """
+        return {
+            key: self.snowflake_config.get(key)
+            for key in ("account", "user", "database", "schema")
+        }
+
+    def _bigquery_table_versions(self, table_refs):
+        """
+        Returns the last modification time of each referenced BigQuery table.
+
+        Args:
+            table_refs (list): bigquery.TableReference objects, e.g. from
+                QueryJob.referenced_tables.
+
+        Returns:
+            dict: Mapping of fully-qualified table IDs to ISO modification timestamps.
+        """
+        client = self.get_bigquery_client()
+        versions = {}
+        for table_ref in table_refs or []:
+            table_id = f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}"
+            modified = client.get_table(table_id).modified
+            versions[table_id] = modified.isoformat() if modified else None
+        return versions
+
+    def _bigquery_tables_unchanged(self, metadata):
+        """
+        Checks whether the tables a cached BigQuery result was computed from are unchanged.
+
+        Args:
+            metadata (dict): Cache entry metadata with a "tables" mapping.
+
+        Returns:
+            bool: True if no referenced table was modified since the entry was stored.
+        """
+        tables = metadata.get("tables", {})
+        try:
+            return self._bigquery_table_versions(
+                [bigquery_sdk().TableReference.from_string(table_id) for table_id in tables]
+            ) == tables
+        except Exception as e:
+            logging.warning(
+                f"Could not check BigQuery table versions, invalidating cache entry: {e}"
+            )
+            return False
+
+    def _compact(self, df, source, compact=None):
+        """
+        Converts a query result to compact dtypes if the tool is configured to.
+
+        Args:
+            df (pd.DataFrame): The query result.
+            source (str): The data source ("BigQuery" or "Snowflake").
+            compact (bool or dict): Overrides the tool's `compact` setting (None to use it).
+
+        Returns:
+            pandas.DataFrame: The compacted result, or `df` if compaction is off.
+        """
+        compact = self.compact if compact is None else compact
+        if not compact:
+            return df
+        options = compact if isinstance(compact, dict) else {}
+        with self.metrics.span("compact", source) as span:
+            df = compact_dtypes(df, source, **options)
+            span.set(rows=len(df), bytes=frame_nbytes(df))
+        return df
+
+    def _get_cached(self, source, query, cache_key, validator=None, compact=None):
+        """
+        Looks up a query result in the cache and logs the hit.
+
+        Args:
+            source (str): The data source ("BigQuery" or "Snowflake").
+            query (str): The SQL query.
+            cache_key (str): The cache key of the query.
+            validator (callable): Optional staleness check passed to QueryCache.get.
+            compact (bool or dict): Overrides the tool's `compact` setting (see `_compact`).
+
+        Returns:
+            pandas.DataFrame: The cached result, or None on a miss.
+        """
+        start_time = time.time()
+        with self.metrics.span("fetch", source, cache="lookup") as span:
+            df = self.cache.get(cache_key, validator)
+            span.set(hit=df is not None)
+        if df is None:
+            return None
+        df = self._compact(df, source, compact)
+
+        query_time = time.time() - start_time
+        self._log_import(
+            source, query, len(df), len(df.columns), None, query_time, cache="hit", mode=None
+        )
+        logging.info(
+            f"{source}: served from cache, Rows={len(df)}, Columns={len(df.columns)}, "
+            f"Time={query_time:.2f} seconds."
+        )
+        return df
+
+    def _log_import(self, source, query, row_count, col_count, data_mb, query_time, cache=None,
+                    retries=None, wasted_sec=None, mode="job"):
+        """
+        Records a query entry in the metrics, exposed as `import_logs`.
+
+        Args:
+            source (str): The data source ("BigQuery" or "Snowflake").
+            query (str): The executed SQL query.
+            row_count (int): Number of rows returned.
+            col_count (int): Number of columns returned.
+            data_mb (float): Transmitted or billed data in MB (None if unknown).
+            query_time (float): Duration of the query in seconds.
+            cache (str): "hit" or "miss" if the result cache was consulted, None otherwise.
+            retries (int): Number of retries of the query (None if not retried by the tool).
+            wasted_sec (float): Seconds lost to failed attempts and backoff.
+            mode (str): "job" for query jobs, "direct" for direct table reads (see `read_table`),
+                None for cached results.
+        """
+        self.metrics.record(
+            "import",
+            source=source,
+            query=query,
+            mode=mode,
+            rows=row_count,
+            columns=col_count,
+            data_mb=data_mb,
+            time_sec=query_time,
+            cache=cache,
+            retries=retries,
+            wasted_sec=wasted_sec,
+        )
+
+    def join_results(self, df1, df2, join_columns, output_columns, how="inner",
+                     check_duplicates="hash", memory_budget_mb=None, spill_dir=None, workers=1):
+        """
+        Joins two pandas DataFrames on specified columns, logs statistics, and stores results in a log DataFrame.
+
+        The input DataFrames are not modified. Join keys are encoded into a shared integer key
+        (see `joins.hash_join`) and both inputs are projected to `output_columns` before the merge.
+        If a memory budget is given and the estimated join memory exceeds it, the join is
+        executed out of core (see `iter_join`).
+
+        Args:
+            df1 (pd.DataFrame): The first DataFrame.
+            df2 (pd.DataFrame): The second DataFrame.
+            join_columns (list): List of column names to join on.
+            output_columns (list): List of column names to include in the output.
+            how (str): Join type: "inner", "left", "right" or "outer".
+            check_duplicates (str): How to count duplicated output rows: "hash" (one hash per row),
+                "full" (compare all values), "profile" (profile the result with `profile`, which
+                counts duplicates in the same pass as nulls and cardinality) or None to skip the
+                check.
+            memory_budget_mb (float): Memory budget of the join in MB (None for no limit).
+            spill_dir (str): Parent directory for spill files of an out-of-core join.
+            workers (int): Number of processes joining partitions of an out-of-core join.
+
+        Returns:
+            pandas.DataFrame: The joined DataFrame with selected output columns.
+        """
+        if self._join_out_of_core(df1, df2, memory_budget_mb):
+            chunks = list(self.iter_join(
+                df1, df2, join_columns, output_columns, how=how,
+                check_duplicates="hash" if check_duplicates == "profile" else check_duplicates,
+                memory_budget_mb=memory_budget_mb, spill_dir=spill_dir, workers=workers,
+            ))
+            if not chunks:
+                return pd.DataFrame(columns=output_columns)
+            return pd.concat(chunks, ignore_index=True)
+
+        logging.info("Joining results...")
+
+        # Log initial shapes of DataFrames
+        initial_df1_shape = df1.shape
+        initial_df2_shape = df2.shape
+        logging.info(f"Initial df1 shape: {initial_df1_shape}, df2 shape: {initial_df2_shape}")
+
+        # Check for duplicated columns in both DataFrames
+        duplicated_columns_df1 = df1.columns[df1.columns.duplicated()].tolist()
+        duplicated_columns_df2 = df2.columns[df2.columns.duplicated()].tolist()
+
+        if duplicated_columns_df1:
+            logging.warning(f"Duplicated columns in df1: {duplicated_columns_df1}")
+        if duplicated_columns_df2:
+            logging.warning(f"Duplicated columns in df2: {duplicated_columns_df2}")
+
+        # Perform the join
+        start_time = time.time()
+        with self.metrics.span("join", mode="in_memory") as span:
+            result_df, duplicated_rows_count = hash_join(
+                df1, df2, join_columns, output_columns, how=how,
+                check_duplicates=None if check_duplicates == "profile" else check_duplicates,
+            )
+            span.set(rows=len(result_df))
+        join_time = time.time() - start_time
+
+        if check_duplicates == "profile":
+            duplicated_rows_count = self.profile(result_df, "join").duplicate_rows
+
+        # Check for duplicated rows in the joined DataFrame
+        if duplicated_rows_count:
+            logging.warning(f"Number of duplicated rows in joined DataFrame: {duplicated_rows_count}")
+        elif duplicated_rows_count == 0:
+            logging.info("No duplicated rows found in joined DataFrame.")
+
+        # Determine final shape of the joined DataFrame
+        result_shape = result_df.shape
+        logging.info(
+            f"Shape of final output DataFrame: {result_shape}, Time={join_time:.2f} seconds."
+        )
+
+        # Log statistics into the join log
+        self.metrics.record(
+            "join",
+            df1_shape=initial_df1_shape,
+            df2_shape=initial_df2_shape,
+            join_columns=join_columns,
+            output_columns=output_columns,
+            how=how,
+            mode="in_memory",
+            result_shape=result_shape,
+            duplicate_rows=duplicated_rows_count,
+            time_sec=join_time,
+        )
+
+        return result_df
+
+    def profile(self, df, name=None, key_columns=None, distinct=True, duplicates=True):
+        """
+        Profiles a DataFrame in a single vectorized pass: null counts, cardinality and min/max
+        per column, duplicate rows and duplicate keys (see `profiler.DataProfiler`).
+        The table-level figures are recorded as a "profile" span.
+
+        Args:
+            df (pd.DataFrame): The DataFrame.
+            name (str): Name of the data in the span, e.g. the target table.
+            key_columns (list): Columns whose combination should be unique (None to skip).
+            distinct (bool): Count distinct values per column.
+            duplicates (bool): Count duplicated rows.
+
+        Returns:
+            profiler.ProfileReport: The profile.
+        """
+        with self.metrics.span("profile", name) as span:
+            profiler = DataProfiler(key_columns, distinct, duplicates)
+            profiler.update(df)
+            report = profiler.report()
+            span.set(**report.summary())
+        logging.info(f"Profile of {name or 'DataFrame'}: {report.summary()}")
+        return report
+
+    def _join_out_of_core(self, df1, df2, memory_budget_mb):
+        """
+        Decides whether a join has to spill to disk.
+
+        Args:
+            df1 (pd.DataFrame or iterable): The first join input.
+            df2 (pd.DataFrame or iterable): The second join input.
+            memory_budget_mb (float): Memory budget of the join in MB (None for no limit).
+
+        Returns:
+            bool: True if the join should be executed out of core.
+        """
+        if not isinstance(df1, pd.DataFrame) or not isinstance(df2, pd.DataFrame):
+            return True
+        if memory_budget_mb is None:
+            return False
+        return estimate_join_memory_mb(df1, df2) > memory_budget_mb
+
+    def iter_join(self, df1, df2, join_columns, output_columns, how="inner",
+                  check_duplicates="hash", memory_budget_mb=None, spill_dir=None, workers=1,
+                  num_partitions=None):
+        """
+        Joins two inputs and yields the result in chunks, spilling to disk when needed.
+
+        Inputs may be DataFrames or streams of chunks (e.g. from `iter_bigquery`). If both are
+        DataFrames that fit the memory budget, the join runs in memory and yields one chunk.
+        Otherwise both inputs are hash-partitioned on `join_columns` into spill files and joined
+        partition by partition (see `joins.partitioned_join`), optionally in parallel processes.
+        The join is recorded in `join_logs` once the stream has been fully consumed.
+
+        Args:
+            df1 (pd.DataFrame or iterable): The first join input.
+            df2 (pd.DataFrame or iterable): The second join input.
+            join_columns (list): List of column names to join on.
+            output_columns (list): List of column names to include in the output.
+            how (str): Join type: "inner", "left", "right" or "outer".
+            check_duplicates (str): "hash", "full" or None to skip the duplicate row check.
+            memory_budget_mb (float): Memory budget of the join in MB (None for no limit).
+            spill_dir (str): Parent directory for spill files.
+            workers (int): Number of processes joining partitions.
+            num_partitions (int): Number of hash partitions. Derived from the memory budget
+                for DataFrame inputs, 16 for streamed inputs if not given.
+
+        Yields:
+            pandas.DataFrame: The next chunk of the joined result.
+        """
+        if not self._join_out_of_core(df1, df2, memory_budget_mb):
+            yield self.join_results(
+                df1, df2, join_columns, output_columns, how=how, check_duplicates=check_duplicates
+            )
+            return
+
+        if num_partitions is None:
+            num_partitions = 16
+            if isinstance(df1, pd.DataFrame) and isinstance(df2, pd.DataFrame) and memory_budget_mb:
+                memory_mb = estimate_join_memory_mb(df1, df2)
+                num_partitions = max(2, int(np.ceil(memory_mb / memory_budget_mb)))
+
+        logging.info(
+            f"Joining results out of core in {num_partitions} partitions "
+            f"with {workers} worker(s)..."
+        )
+        start_time = time.time()
+        row_count = 0
+        duplicated_rows_count = 0 if check_duplicates else None
+
+        for chunk, duplicated_rows in partitioned_join(
+            df1, df2, join_columns, output_columns, how=how, num_partitions=num_partitions,
+            spill_dir=spill_dir, workers=workers, check_duplicates=check_duplicates,
+        ):
+            row_count += len(chunk)
+            if duplicated_rows:
+                duplicated_rows_count += duplicated_rows
+            yield chunk
+
+        join_time = time.time() - start_time
+        if duplicated_rows_count:
+            logging.warning(
+                f"Number of duplicated rows in joined DataFrame: {duplicated_rows_count}"
+            )
+        logging.info(
+            f"Out-of-core join completed: Rows={row_count}, Columns={len(output_columns)}, "
+            f"Time={join_time:.2f} seconds."
+        )
+
+        mode = f"out_of_core[{num_partitions}]"
+        self.metrics.record_span("join", join_time, rows=row_count, mode=mode)
+        self.metrics.record(
+            "join",
+            df1_shape=getattr(df1, "shape", None),
+            df2_shape=getattr(df2, "shape", None),
+            join_columns=join_columns,
+            output_columns=output_columns,
+            how=how,
+            mode=mode,
+            result_shape=(row_count, len(output_columns)),
+            duplicate_rows=duplicated_rows_count,
+            time_sec=join_time,
+        )
+
+    def close_connections(self, drain=False):
+        """
+        Releases the Snowflake connection and closes the BigQuery client.
+
+        A pinned Snowflake connection checked out of the pool is returned to it, so other
+        instances can reuse the session; a connection set explicitly is closed.
+
+        Args:
+            drain (bool): Also close the idle connections of the pool, e.g. at process exit.
+        """
+        if self.snowflake_conn:
+            if self._snowflake_conn_pooled:
+                logging.info("Returning Snowflake connection to the pool...")
+                self.snowflake_pool.release(self.snowflake_conn)
+            else:
+                logging.info("Closing Snowflake connection...")
+                self.snowflake_conn.close()
+            self.snowflake_conn = None
+            self._snowflake_conn_pooled = False
+        if drain and self.snowflake_pool is not None:
+            logging.info("Draining the Snowflake connection pool...")
+            self.snowflake_pool.drain()
+        for source, conn in list(self._backend_connections.items()):
+            logging.info(f"Closing {source} connection...")
+            get_backend(source).close(conn)
+        self._backend_connections.clear()
+        self.bigquery_storage_client = None
         if self.bigquery_client:
             logging.info("Closing BigQuery client...")
             self.bigquery_client.close()
\ No newline at end of file
@@ -0,0 +1,223 @@
+import glob
+import json
+import logging
+import os
+import random
+import shutil
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pandas as pd
+
+# Exception class names of the warehouse client libraries that signal a transient failure.
+# Matched by name, so classifying an error does not import google-cloud or snowflake.
+RETRYABLE_ERROR_NAMES = {
+    # google.api_core.exceptions
+    "ServiceUnavailable", "InternalServerError", "BadGateway", "GatewayTimeout", "TooManyRequests",
+    "DeadlineExceeded", "RetryError", "Aborted",
+    # snowflake.connector.errors
+    "OperationalError", "InterfaceError", "RequestTimeoutError", "ServiceUnavailableError",
+    "OtherHTTPRetryableError", "BadGatewayError", "GatewayTimeoutError", "InternalServerError",
+    # requests / urllib3
+    "ChunkedEncodingError", "ReadTimeout", "ConnectTimeout", "ProtocolError", "ReadTimeoutError",
+}
+
+# Error reasons of BigQuery responses that are transient, even on 403 responses
+RETRYABLE_BIGQUERY_REASONS = {"rateLimitExceeded", "backendError", "internalError"}
+
+
+def is_retryable(error):
+    """
+    Classifies an error as transient (worth retrying) or fatal.
+
+    Network errors, timeouts, throttling and server-side errors are transient. Errors in the
+    request itself (invalid SQL, missing tables, permissions, bad arguments) are fatal, as a
+    retry would fail the same way.
+
+    Args:
+        error (BaseException): The error.
+
+    Returns:
+        bool: True if the operation should be retried.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError, FutureTimeoutError)):
+        return True
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & RETRYABLE_ERROR_NAMES:
+        return True
+    entries = getattr(error, "errors", None) or []
+    reasons = {entry.get("reason") for entry in entries if isinstance(entry, dict)}
+    return bool(reasons & RETRYABLE_BIGQUERY_REASONS)
+
+
+class RetryPolicy:
+    """
+    Retries transient failures with exponential backoff and full jitter.
+
+    The delay before retry n (0-based) is drawn uniformly from [0, min(max_delay,
+    base_delay * 2 ** n)], so clients failing together do not retry in lockstep. Fatal
+    errors (see `is_retryable`) and the error of the last attempt are raised.
+
+    Attributes:
+        retries (int): Maximum number of retries after the first attempt.
+        base_delay (float): Upper bound of the first delay in seconds.
+        max_delay (float): Upper bound of any delay in seconds.
+        jitter (bool): Randomize delays; if False, the upper bounds are used.
+        retryable (callable): Function classifying an error as retryable.
+    """
+    def __init__(self, retries=3, base_delay=1.0, max_delay=60.0, jitter=True,
+                 retryable=is_retryable):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retryable = retryable
+
+    def delay(self, attempt):
+        """
+        Returns the delay in seconds before retrying after failed attempt `attempt` (0-based).
+        """
+        bound = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(0, bound) if self.jitter else bound
+
+    def call(self, func, *args, name=None, stats=None, **kwargs):
+        """
+        Calls a function, retrying it on transient errors.
+
+        Args:
+            func (callable): The function.
+            *args: Positional arguments of the function.
+            name (str): Name of the operation in log messages.
+            stats (RetryStats): Optional accumulator of retries and wasted time.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            The result of the function.
+        """
+        name = name or getattr(func, "__name__", "operation")
+        for attempt in range(self.retries + 1):
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                failed_sec = time.perf_counter() - start_time
+                if attempt == self.retries or not self.retryable(e):
+                    if stats is not None:
+                        stats.add(0, failed_sec)
+                    if attempt:
+                        logging.error(f"{name} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = self.delay(attempt)
+                if stats is not None:
+                    stats.add(1, failed_sec + delay)
+                logging.warning(
+                    f"{name} failed (attempt {attempt + 1}/{self.retries + 1}), "
+                    f"retrying in {delay:.1f}s: {e}"
+                )
+                time.sleep(delay)
+
+
+class RetryStats:
+    """
+    Retries made and time lost to failed attempts and backoff, for the import and write logs.
+
+    Attributes:
+        retries (int): Number of retries.
+        wasted_sec (float): Seconds spent in failed attempts and waiting before retries.
+    """
+    def __init__(self):
+        self.retries = 0
+        self.wasted_sec = 0.0
+
+    def add(self, retries, wasted_sec):
+        self.retries += retries
+        self.wasted_sec += wasted_sec
+
+
+class ChunkCheckpoint:
+    """
+    Completed chunks of a large extraction, stored on local disk so a retried or restarted
+    extraction resumes after the last finished chunk instead of downloading everything again.
+
+    Chunks are Parquet files written atomically; a JSON manifest records the chunks, the
+    position the extraction reached (rows or result batches) and source-specific state
+    such as the query job to read from.
+
+    Attributes:
+        directory (str): Directory of this extraction's chunks.
+        state (dict): The manifest: "chunks", "rows", "position", "complete" (and the time it
+            "completed") and source state.
+    """
+    def __init__(self, root, key):
+        """
+        Opens the checkpoint of an extraction, loading its manifest if one exists.
+
+        Args:
+            root (str): Directory holding all checkpoints.
+            key (str): Key of the extraction, e.g. a hash of the source and query.
+        """
+        self.directory = os.path.join(root, key)
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self._manifest_path()) as file:
+                self.state = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.state = {"chunks": 0, "rows": 0, "position": 0, "complete": False}
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def _chunk_path(self, index):
+        return os.path.join(self.directory, f"chunk_{index:06d}.parquet")
+
+    def save_state(self, **state):
+        """
+        Updates and persists the manifest.
+        """
+        self.state.update(state)
+        tmp_path = f"{self._manifest_path()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.state, file, default=str)
+        os.replace(tmp_path, self._manifest_path())
+
+    def add_chunk(self, df, position):
+        """
+        Stores the next chunk and the position the extraction reached with it.
+
+        Args:
+            df (pd.DataFrame): The chunk.
+            position (int): Source position after the chunk (e.g. rows or batches read).
+        """
+        index = self.state["chunks"]
+        tmp_path = f"{self._chunk_path(index)}.{uuid.uuid4().hex}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._chunk_path(index))
+        # The manifest is written last: a chunk it does not list is overwritten on resume
+        self.save_state(chunks=index + 1, rows=self.state["rows"] + len(df), position=position)
+
+    def load(self):
+        """
+        Reads all stored chunks in order.
+
+        Returns:
+            pandas.DataFrame: The concatenated chunks (None if there are none).
+        """
+        frames = [pd.read_parquet(self._chunk_path(index)) for index in range(self.state["chunks"])]
+        if not frames:
+            return None
+        return pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True)
+
+    def reset(self):
+        """
+        Discards all chunks and the manifest, e.g. when the source result is no longer available.
+        """
+        for path in glob.glob(os.path.join(self.directory, "*")):
+            os.remove(path)
+        self.state = {"chunks": 0, "rows": 0, "position": 0, "complete": False}
+
+    def remove(self):
+        """
+        Deletes the checkpoint directory.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+# File extension and default compression of each on-disk format. Uncompressed Arrow IPC
+# files are read zero-copy from a memory map; compressed ones are decompressed on read.
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+DEFAULT_COMPRESSION = {"parquet": "zstd", "arrow": None}
+
+
+class LocalDataset:
+    """
+    A local columnar dataset of Parquet or Arrow IPC files, optionally partitioned by
+    columns into hive-style directories (e.g. order_date=2016-08-01/).
+
+    Writes append new files by default, so a dataset can grow one load at a time. The
+    Arrow schema and the layout are stored next to the data (_schema.arrow, _dataset.json),
+    which keeps the dtypes of every column, including the partition columns, across
+    writes and reads. Reads memory-map the files and prune partitions and columns, so
+    loading one day of a large dataset touches only that day's files.
+
+    Usage:
+        dataset = LocalDataset("data/orders_items_events", partition_by=["order_date"])
+        dataset.write(df)
+        day = dataset.read(
+            filters={"order_date": "2016-08-01"}, columns=["order_id", "item_price"]
+        )
+
+    Attributes:
+        path (str): The dataset directory.
+        format (str): "parquet" or "arrow".
+        partition_by (list): Partition columns.
+        compression (str): Compression codec of the files (None for uncompressed).
+    """
+    def __init__(self, path, format="parquet", partition_by=None, compression="default"):
+        """
+        Opens a dataset. The format, partitioning and compression of an existing dataset
+        are read from its directory and override the arguments.
+
+        Args:
+            path (str): The dataset directory.
+            format (str): "parquet" or "arrow" for new datasets.
+            partition_by (list): Partition columns for new datasets.
+            compression (str): Codec for new datasets, e.g. "zstd", "snappy" or "lz4"
+                ("default" for the format's default, None for uncompressed).
+        """
+        self.path = path
+        try:
+            with open(self._layout_path()) as file:
+                layout = json.load(file)
+        except FileNotFoundError:
+            if format not in FORMATS:
+                raise ValueError(
+                    f"Unsupported dataset format '{format}', expected one of {list(FORMATS)}."
+                )
+            layout = {
+                "format": format,
+                "partition_by": list(partition_by or []),
+                "compression": (
+                    DEFAULT_COMPRESSION[format] if compression == "default" else compression
+                ),
+            }
+        self.format = layout["format"]
+        self.partition_by = layout["partition_by"]
+        self.compression = layout["compression"]
+
+    def _layout_path(self):
+        return os.path.join(self.path, "_dataset.json")
+
+    def _schema_path(self):
+        return os.path.join(self.path, "_schema.arrow")
+
+    @property
+    def schema(self):
+        """
+        pyarrow.Schema: The schema of the dataset (None if nothing was written yet).
+        """
+        import pyarrow as pa
+
+        try:
+            with pa.memory_map(self._schema_path()) as source:
+                return pa.ipc.open_file(source).schema
+        except FileNotFoundError:
+            return None
+
+    def exists(self):
+        """
+        Returns True if data was written to the dataset.
+        """
+        return os.path.exists(self._schema_path())
+
+    def write(self, data, append=True):
+        """
+        Writes a DataFrame, pyarrow Table or stream of chunks to the dataset.
+
+        Args:
+            data: A pandas DataFrame or pyarrow Table, or an iterable of them
+                (e.g. from `DatabaseQueryTool.iter_bigquery`) written without
+                materializing the whole stream.
+            append (bool): Add files next to the existing data; if False, the existing
+                data is deleted first.
+
+        Returns:
+            int: Number of rows written.
+        """
+        import pyarrow.dataset as ds
+
+        if not append and os.path.exists(self.path):
+            shutil.rmtree(self.path)
+
+        single = isinstance(data, pd.DataFrame) or hasattr(data, "schema")
+        chunks = iter([data]) if single else iter(data)
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        first = self._to_table(first)
+        schema = self.schema if self.exists() else self._storage_schema(first.schema)
+        self._check_schema(first.schema, schema)
+        self._save_layout(schema)
+
+        row_count = 0
+
+        def batches():
+            nonlocal row_count
+            for chunk in _prepend(first, chunks):
+                table = self._to_table(chunk).select(schema.names).cast(schema)
+                row_count += table.num_rows
+                yield from table.to_batches()
+
+        file_format = ds.IpcFileFormat() if self.format == "arrow" else ds.ParquetFileFormat()
+        ds.write_dataset(
+            batches(),
+            self.path,
+            schema=schema,
+            format=file_format,
+            file_options=file_format.make_write_options(compression=self.compression),
+            partitioning=self._partitioning(schema),
+            # A unique name per write keeps earlier files, so writes append
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.{FORMATS[self.format]}",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        logging.info(f"Wrote {row_count} rows to {self.format} dataset '{self.path}'.")
+        return row_count
+
+    def read(self, columns=None, filters=None, arrow_dtypes=False, memory_map=True):
+        """
+        Reads the dataset, or the part of it selected by columns and filters.
+
+        Args:
+            columns (list): Columns to read (None for all).
+            filters: Rows to read, pruning partitions and files: a dict of column to value or
+                list of values (e.g. {"order_date": "2016-08-01"}), a list of (column, op, value)
+                tuples as in pandas.read_parquet, or a pyarrow.dataset.Expression.
+            arrow_dtypes (bool): Keep Arrow-backed dtypes (pd.ArrowDtype), avoiding a copy
+                of string and nested columns.
+            memory_map (bool): Memory-map the files instead of reading them into memory.
+
+        Returns:
+            pandas.DataFrame: The selected data.
+        """
+        table = self.to_table(columns, filters, memory_map)
+        types_mapper = pd.ArrowDtype if arrow_dtypes else None
+        return table.to_pandas(types_mapper=types_mapper, split_blocks=True)
+
+    def to_table(self, columns=None, filters=None, memory_map=True):
+        """
+        Reads the dataset as a pyarrow Table (see `read`). Columns of uncompressed Arrow IPC
+        files reference the memory-mapped files without copying.
+
+        Returns:
+            pyarrow.Table: The selected data.
+        """
+        dataset = self.dataset(memory_map)
+        expression = self._filter_expression(filters, dataset.schema)
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def dataset(self, memory_map=True):
+        """
+        Returns the dataset as a pyarrow.dataset.Dataset, e.g. for scanning it in batches.
+
+        Args:
+            memory_map (bool): Memory-map the files.
+
+        Returns:
+            pyarrow.dataset.Dataset: The dataset.
+        """
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        schema = self.schema
+        if schema is None:
+            raise FileNotFoundError(f"No dataset found at '{self.path}'.")
+        return ds.dataset(
+            self.path,
+            schema=schema,
+            format="ipc" if self.format == "arrow" else "parquet",
+            partitioning=self._partitioning(schema),
+            filesystem=fs.LocalFileSystem(use_mmap=memory_map),
+        )
+
+    def partitions(self):
+        """
+        Returns the partition values present in the dataset.
+
+        Returns:
+            pandas.DataFrame: One row per partition, one column per partition column.
+        """
+        if not self.partition_by:
+            return pd.DataFrame()
+        table = self.dataset(memory_map=False).to_table(columns=self.partition_by)
+        partitions = table.to_pandas().drop_duplicates().sort_values(self.partition_by)
+        return partitions.reset_index(drop=True)
+
+    def _to_table(self, chunk):
+        import pyarrow as pa
+
+        if isinstance(chunk, pd.DataFrame):
+            return pa.Table.from_pandas(chunk, preserve_index=False)
+        return chunk if isinstance(chunk, pa.Table) else pa.Table.from_batches([chunk])
+
+    def _storage_schema(self, schema):
+        """
+        Returns the schema a new dataset stores for data of `schema`. Dictionary-encoded
+        partition columns are stored decoded, as their values become directory names.
+        """
+        import pyarrow as pa
+
+        missing_columns = [col for col in self.partition_by if col not in schema.names]
+        if missing_columns:
+            raise KeyError(f"Partition columns missing from the data: {missing_columns}")
+        fields = [
+            pa.field(field.name, field.type.value_type, field.nullable)
+            if field.name in self.partition_by and pa.types.is_dictionary(field.type) else field
+            for field in schema
+        ]
+        return pa.schema(fields)
+
+    def _check_schema(self, schema, expected):
+        if set(schema.names) != set(expected.names):
+            raise ValueError(
+                f"Columns {sorted(schema.names)} do not match the columns of dataset "
+                f"'{self.path}': {sorted(expected.names)}"
+            )
+
+    def _save_layout(self, schema):
+        import pyarrow as pa
+
+        if self.exists():
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with pa.OSFile(self._schema_path(), "wb") as sink:
+            pa.ipc.new_file(sink, schema).close()
+        with open(self._layout_path(), "w") as file:
+            layout = {
+                "format": self.format,
+                "partition_by": self.partition_by,
+                "compression": self.compression,
+            }
+            json.dump(layout, file)
+
+    def _partitioning(self, schema):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if not self.partition_by:
+            return None
+        fields = [schema.field(col) for col in self.partition_by]
+        return ds.partitioning(pa.schema(fields), flavor="hive")
+
+    def _filter_expression(self, filters, schema):
+        """
+        Converts `filters` (see `read`) into a pyarrow.dataset.Expression. Dict values are
+        cast to the column type, so dates and timestamps can be given as strings.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        if filters is None or isinstance(filters, ds.Expression):
+            return filters
+        if not isinstance(filters, dict):
+            return pq.filters_to_expression(filters)
+
+        expression = None
+        for col, value in filters.items():
+            field_type = schema.field(col).type
+            if isinstance(value, (list, tuple, set)):
+                condition = ds.field(col).isin(pa.array(list(value)).cast(field_type))
+            else:
+                condition = ds.field(col) == pa.scalar(value).cast(field_type)
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def __repr__(self):
+        return (
+            f"LocalDataset(path={self.path!r}, format={self.format!r}, "
+            f"partition_by={self.partition_by!r})"
+        )
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
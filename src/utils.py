@@ -3,10 +3,8 @@
 import os
 import pandas as pd
 from datetime import datetime
-import time
-from dotenv import load_dotenv
-from google.cloud import bigquery
-import snowflake.connector
+
+from resilience import RetryPolicy
 
 def load_env_variables(env_file="config/.env"):
     """
@@ -18,6 +16,8 @@ def load_env_variables(env_file="config/.env"):
     Returns:
         bool: True if the environment variables are loaded successfully, False otherwise.
     """
+    from dotenv import load_dotenv
+
     load_dotenv(env_file)
     required_variables = [
         "user", "password", "account", "warehouse", "database", "schema",
@@ -51,20 +51,88 @@ def read_sql_file(file_path):
         print(f"Error reading SQL file '{file_path}': {e}")
         return ""
 
-def log_dataframe_stats(df, source="Unknown"):
+def log_dataframe_stats(df, source="Unknown", previous_memory_mb=None):
     """
     Logs basic statistics for a DataFrame, including shape and memory usage.
     
     Args:
         df (pandas.DataFrame): The DataFrame to log.
         source (str): The source or context of the DataFrame.
+        previous_memory_mb (float): Memory usage before a transformation, reported alongside
+            the current usage if given.
     
     Returns:
-        None
+        float: Memory usage of the DataFrame in MB.
     """
     row_count, col_count = df.shape
     memory_usage = df.memory_usage(deep=True).sum() / (1024 ** 2)  # in MB
-    print(f"{source} - Rows: {row_count}, Columns: {col_count}, Memory Usage: {memory_usage:.2f} MB")
+    message = f"{source} - Rows: {row_count}, Columns: {col_count}, Memory Usage: {memory_usage:.2f} MB"
+    if previous_memory_mb:
+        message += f" (was {previous_memory_mb:.2f} MB, {memory_usage / previous_memory_mb:.0%})"
+    print(message)
+    return memory_usage
+
+def compact_dtypes(df, source="Unknown", category_ratio=0.05, timestamp_columns=None,
+                   downcast_floats=False, report=False, max_categories=10_000):
+    """
+    Converts a DataFrame to memory-efficient dtypes.
+    
+    - String columns with few distinct values (at most `category_ratio` of the rows and
+      `max_categories`) become categoricals, other strings become Arrow-backed strings.
+    - Integers are downcast to the smallest integer type that holds their values, floats
+      to float32 only if `downcast_floats` is set (it loses precision).
+    - Columns of Python datetime objects and the string columns in `timestamp_columns`
+      are parsed to datetime64 once.
+    
+    Categorical and Arrow string keys are joined without converting them to strings
+    (see `joins.shared_codes`). The input DataFrame is not modified.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame to compact.
+        source (str): The source or context of the DataFrame, used in the report.
+        category_ratio (float): Maximum ratio of distinct values to rows for a string column
+            to become a categorical.
+        timestamp_columns (list): String columns to parse as timestamps.
+        downcast_floats (bool): Whether to downcast float64 columns to float32.
+        report (bool): Whether to report memory usage before and after with `log_dataframe_stats`
+            (two deep memory scans, so off on the query path).
+        max_categories (int): Maximum number of distinct values of a categorical column.
+    
+    Returns:
+        pandas.DataFrame: The compacted DataFrame.
+    """
+    before_mb = log_dataframe_stats(df, f"{source} (raw)") if report else None
+    timestamp_columns = set(timestamp_columns or [])
+    columns = {}
+    
+    for col in df.columns:
+        series = df[col]
+        dtype = series.dtype
+        
+        if col in timestamp_columns and not pd.api.types.is_datetime64_any_dtype(dtype):
+            columns[col] = pd.to_datetime(series)
+        elif pd.api.types.is_object_dtype(dtype) or isinstance(dtype, pd.StringDtype):
+            inferred = pd.api.types.infer_dtype(series, skipna=True)
+            if inferred == "datetime":
+                columns[col] = pd.to_datetime(series)
+            elif inferred == "string":
+                max_distinct = min(category_ratio * len(series), max_categories)
+                if len(series) and series.nunique(dropna=True) <= max_distinct:
+                    columns[col] = series.astype("category")
+                else:
+                    columns[col] = series.astype(pd.StringDtype("pyarrow"))
+        elif pd.api.types.is_integer_dtype(dtype) and not isinstance(dtype, pd.ArrowDtype):
+            columns[col] = pd.to_numeric(series, downcast="integer")
+        elif (downcast_floats and pd.api.types.is_float_dtype(dtype)
+              and not isinstance(dtype, pd.ArrowDtype)):
+            columns[col] = pd.to_numeric(series, downcast="float")
+    
+    compacted = df.copy(deep=False)
+    for col, values in columns.items():
+        compacted[col] = values
+    if report:
+        log_dataframe_stats(compacted, f"{source} (compacted)", previous_memory_mb=before_mb)
+    return compacted
 
 def save_dataframe_to_csv(df, file_name, append=False):
     """
@@ -89,52 +157,56 @@ def save_dataframe_to_csv(df, file_name, append=False):
 
 def retry_on_failure(func, retries=3, delay=5, *args, **kwargs):
     """
-    Retries a function upon failure with a specified delay between attempts.
+    Retries a function upon transient failure with exponential backoff and jitter.
+
+    The delay before the first retry is drawn from [0, delay] and doubles its upper bound
+    with every further retry (see `resilience.RetryPolicy`). Errors a retry cannot fix
+    (see `resilience.is_retryable`) are not retried. Failed attempts are logged.
     
     Args:
         func (function): The function to retry.
-        retries (int): The number of retry attempts.
-        delay (int): Delay in seconds between retries.
+        retries (int): The number of attempts.
+        delay (int): Upper bound of the first delay in seconds.
         *args: Arguments to pass to the function.
         **kwargs: Keyword arguments to pass to the function.
     
     Returns:
-        Any: The result of the function, or None if all attempts fail.
-    """
-    attempt = 0
-    while attempt < retries:
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            attempt += 1
-            time.sleep(delay)
-    
-    print(f"All {retries} attempts failed.")
-    return None
+        Any: The result of the function.
+
+    Raises:
+        Exception: The error of the last attempt, or the first error that is not retryable.
+    """
+    return RetryPolicy(retries - 1, base_delay=delay).call(func, *args, **kwargs)
 
-def validate_dataframe_for_snowflake(df, required_columns=None):
+def validate_dataframe_for_snowflake(df, required_columns=None, report=None):
     """
     Validates a DataFrame to ensure it has no missing values and the correct columns.
+
+    Without a report, nulls are counted with a single vectorized `isnull()` pass, which is
+    cheaper than profiling the frame. A report that was already computed (see
+    `profiler.profile_dataframe`) is checked instead, so the frame is not scanned again.
     
     Args:
         df (pandas.DataFrame): The DataFrame to validate.
         required_columns (list): List of required column names. If None, no validation on columns.
+        report (profiler.ProfileReport): Optional profile of `df`.
     
     Returns:
         bool: True if valid, False otherwise.
     """
-    if required_columns:
-        missing_columns = [col for col in required_columns if col not in df.columns]
+    if report is not None:
+        failures = report.check(required_columns=required_columns, not_null=True)
+    else:
+        failures = []
+        missing_columns = [col for col in required_columns or [] if col not in df.columns]
         if missing_columns:
-            print(f"Error: Missing required columns: {', '.join(missing_columns)}")
-            return False
-    
-    if df.isnull().any().any():
-        print("Error: DataFrame contains missing values.")
-        return False
-    
-    return True
+            failures.append(f"Missing required columns: {', '.join(map(str, missing_columns))}")
+        null_columns = df.columns[df.isnull().any().to_numpy()].tolist()
+        if null_columns:
+            failures.append(f"Missing values in columns: {', '.join(map(str, null_columns))}")
+    for failure in failures:
+        print(f"Error: {failure}")
+    return not failures
 
 def format_timestamp(timestamp=None, format="%Y-%m-%d %H:%M:%S"):
     """
@@ -0,0 +1,110 @@
+import datetime
+import json
+import os
+import uuid
+
+import pandas as pd
+
+from cache import FileLock
+
+
+def _encode(value):
+    """
+    Encodes a watermark value as a JSON-serializable {"type", "value"} pair.
+    """
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return {"type": "timestamp", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"type": "date", "value": value.isoformat()}
+    if hasattr(value, "item"):  # NumPy scalars
+        value = value.item()
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f"Unsupported watermark type: {type(value).__name__}")
+    return {"type": type(value).__name__, "value": value}
+
+
+def _decode(entry):
+    """
+    Decodes a watermark value stored by `_encode`.
+    """
+    if entry["type"] == "timestamp":
+        return datetime.datetime.fromisoformat(entry["value"])
+    if entry["type"] == "date":
+        return datetime.date.fromisoformat(entry["value"])
+    return entry["value"]
+
+
+class WatermarkStore:
+    """
+    Persists per-query high-water marks in a small local JSON file.
+
+    Updates are atomic (write to a temporary file, then rename) and serialized with a lock
+    file, so several processes can share one store.
+
+    Attributes:
+        path (str): Path to the JSON file.
+    """
+    def __init__(self, path="state/watermarks.json"):
+        """
+        Initializes the store; the file is created on the first update.
+
+        Args:
+            path (str): Path to the JSON file.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, key):
+        """
+        Returns the watermark stored for a key.
+
+        Args:
+            key (str): The watermark key (one per incremental query).
+
+        Returns:
+            The watermark value (datetime, date, int, float or str), or None if there is none.
+        """
+        entry = self._read().get(key)
+        return _decode(entry) if entry is not None else None
+
+    def set(self, key, value):
+        """
+        Stores the watermark of a key.
+
+        Args:
+            key (str): The watermark key.
+            value: The new watermark (datetime, date, pd.Timestamp, int, float or str).
+        """
+        with FileLock(self.path + ".lock"):
+            state = self._read()
+            state[key] = _encode(value)
+            tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(state, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def delete(self, key):
+        """
+        Removes the watermark of a key, so the next incremental run reads the full history.
+
+        Args:
+            key (str): The watermark key.
+        """
+        with FileLock(self.path + ".lock"):
+            state = self._read()
+            if state.pop(key, None) is not None:
+                tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "w") as file:
+                    json.dump(state, file, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live flat in src/ and the offline fakes in benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
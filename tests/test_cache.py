@@ -0,0 +1,113 @@
+import os
+
+import pandas as pd
+import pytest
+
+import cache
+from cache import QueryCache, normalize_sql
+
+
+def frame(value=0, rows=100):
+    return pd.DataFrame({"id": range(rows), "value": [f"{value}-{i}" for i in range(rows)]})
+
+
+def test_normalize_sql_ignores_formatting_only():
+    query = "SELECT a,  b -- columns\nFROM t /* the table */\nWHERE c = 'x  --  y';"
+    assert normalize_sql(query) == "SELECT a, b FROM t WHERE c = 'x  --  y'"
+    assert normalize_sql('SELECT "a  b" FROM `p.d.t`') == 'SELECT "a  b" FROM `p.d.t`'
+
+
+def test_key_depends_on_source_normalized_query_and_target(tmp_path):
+    query_cache = QueryCache(str(tmp_path))
+    key = query_cache.key("Snowflake", "SELECT 1", {"account": "a"})
+
+    assert query_cache.key("snowflake", "SELECT   1;", {"account": "a"}) == key
+    assert query_cache.key("BigQuery", "SELECT 1", {"account": "a"}) != key
+    assert query_cache.key("Snowflake", "SELECT 2", {"account": "a"}) != key
+    assert query_cache.key("Snowflake", "SELECT 1", {"account": "b"}) != key
+
+
+def test_put_and_get_round_trip(tmp_path):
+    query_cache = QueryCache(str(tmp_path))
+    key = query_cache.key("Snowflake", "SELECT 1")
+
+    assert query_cache.get(key) is None
+    assert query_cache.put(key, frame())
+    pd.testing.assert_frame_equal(query_cache.get(key), frame())
+    assert (query_cache.hits, query_cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    query_cache = QueryCache(str(tmp_path), ttl_sec=60)
+    key = query_cache.key("Snowflake", "SELECT 1")
+    query_cache.put(key, frame())
+
+    now[0] += 59
+    assert query_cache.get(key) is not None
+    now[0] += 2
+    assert query_cache.get(key) is None
+    # Expired entries are removed
+    assert os.listdir(tmp_path) == [".lock"]
+
+
+def test_validator_rejects_stale_entries(tmp_path):
+    query_cache = QueryCache(str(tmp_path))
+    key = query_cache.key("BigQuery", "SELECT 1")
+    query_cache.put(key, frame(), {"tables": {"t": 1}})
+
+    assert query_cache.get(key, lambda metadata: metadata["tables"] == {"t": 1}) is not None
+    assert query_cache.get(key, lambda metadata: metadata["tables"] == {"t": 2}) is None
+    assert query_cache.get(key) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    query_cache = QueryCache(str(tmp_path), max_bytes=None)
+    first, second, third = (query_cache.key("Snowflake", f"SELECT {i}") for i in range(3))
+    query_cache.put(first, frame(1))
+    query_cache.put(second, frame(2))
+    entry_bytes = os.path.getsize(query_cache._data_path(first))
+    for key, mtime in ((first, 100), (second, 200)):
+        os.utime(query_cache._data_path(key), (mtime, mtime))
+
+    # Reading the first entry makes the second one the least recently used
+    assert query_cache.get(first) is not None
+    query_cache.max_bytes = int(entry_bytes * 2.5)
+    query_cache.put(third, frame(3))
+
+    assert query_cache.get(second) is None
+    assert query_cache.get(first) is not None
+    assert query_cache.get(third) is not None
+
+
+def test_put_is_atomic(tmp_path):
+    query_cache = QueryCache(str(tmp_path))
+    key = query_cache.key("Snowflake", "SELECT 1")
+    query_cache.put(key, frame(1))
+
+    # A result that cannot be written leaves the previous entry and no temporary files
+    unwritable = pd.DataFrame({"value": [object()]})
+    assert not query_cache.put(key, unwritable)
+    assert sorted(os.listdir(tmp_path)) == [".lock", f"{key}.json", f"{key}.parquet"]
+    pd.testing.assert_frame_equal(query_cache.get(key), frame(1))
+
+
+def test_entry_without_metadata_is_a_miss(tmp_path):
+    query_cache = QueryCache(str(tmp_path))
+    key = query_cache.key("Snowflake", "SELECT 1")
+    query_cache.put(key, frame())
+    os.remove(query_cache._metadata_path(key))
+
+    assert query_cache.get(key) is None
+
+
+@pytest.mark.parametrize("method", ["invalidate", "clear"])
+def test_invalidate_and_clear_remove_entries(tmp_path, method):
+    query_cache = QueryCache(str(tmp_path))
+    key = query_cache.key("Snowflake", "SELECT 1")
+    query_cache.put(key, frame())
+
+    getattr(query_cache, method)(*([key] if method == "invalidate" else []))
+    assert query_cache.get(key) is None
+    assert os.listdir(tmp_path) == [".lock"]
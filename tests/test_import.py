@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+# Seconds importing query_tool may take in a fresh interpreter
+IMPORT_BUDGET_SEC = 1.0
+# Packages that must only be imported when their backend is used (see src/backends.py)
+LAZY_PACKAGES = ["google", "snowflake", "dotenv"]
+
+
+def import_in_subprocess(module):
+    code = (
+        "import json, sys, time\n"
+        f"sys.path.insert(0, {SRC!r})\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "packages = sorted({name.split('.')[0] for name in sys.modules})\n"
+        "print(json.dumps({'elapsed': elapsed, 'packages': packages}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_query_tool_is_lazy():
+    result = import_in_subprocess("query_tool")
+
+    assert [name for name in LAZY_PACKAGES if name in result["packages"]] == []
+
+
+def test_import_query_tool_within_budget():
+    # The fastest of a few runs, so a busy machine does not fail the test
+    elapsed = min(import_in_subprocess("query_tool")["elapsed"] for _ in range(3))
+
+    assert elapsed < IMPORT_BUDGET_SEC, f"import query_tool took {elapsed:.2f}s"
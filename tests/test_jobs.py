@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import pandas as pd
+import pytest
+
+from jobs import CANCELLED, RUNNING, SUCCEEDED, QueryJob
+from metrics import MetricsRecorder
+
+
+class FakeTool:
+    def __init__(self):
+        self.metrics = MetricsRecorder()
+
+    def _log_import(self, source, query, row_count, col_count, data_mb, query_time, **kwargs):
+        self.metrics.record("import", source=source, query=query, rows=row_count)
+
+
+class FakeJob(QueryJob):
+    """
+    A job that runs until `finish` is set.
+    """
+    def __init__(self):
+        super().__init__(FakeTool(), "Fake", "SELECT 1", "job-1")
+        self.finish = threading.Event()
+        self.server_cancels = 0
+
+    def status(self):
+        if self._cancelled:
+            return CANCELLED
+        return SUCCEEDED if self.finish.is_set() else RUNNING
+
+    def _cancel(self):
+        self.server_cancels += 1
+
+    def _fetch(self):
+        return pd.DataFrame({"a": [1, 2]})
+
+
+def test_result_is_fetched_once_and_logged():
+    job = FakeJob()
+    job.finish.set()
+
+    assert job.result() is job.result()
+    assert len(job.tool.metrics.to_dataframe("import", ["rows"])) == 1
+
+
+def test_result_timeout_cancels():
+    job = FakeJob()
+
+    with pytest.raises(TimeoutError):
+        job.result(timeout=0.2, poll_interval=0.05, cancel_on_timeout=True)
+    assert job.server_cancels == 1
+    assert job.status() == CANCELLED
+
+
+def test_future_resolves():
+    job = FakeJob()
+    future = job.to_future(poll_interval=0.05)
+    job.finish.set()
+
+    assert future.result(timeout=5)["a"].tolist() == [1, 2]
+
+
+def test_future_cancel_cancels_the_query():
+    job = FakeJob()
+    future = job.to_future(poll_interval=0.05)
+    time.sleep(0.2)
+
+    assert future.cancel()
+    assert job.server_cancels == 1
+    assert job.status() == CANCELLED
+
+
+def test_future_timeout():
+    job = FakeJob()
+    future = job.to_future(timeout=0.2, poll_interval=0.05)
+
+    with pytest.raises(TimeoutError):
+        future.result(timeout=5)
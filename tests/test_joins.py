@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import joins
+from joins import hash_join, partitioned_join
+
+
+def frames(rows=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    left = pd.DataFrame({"k": rng.integers(0, 500, rows), "a": rng.random(rows)})
+    right = pd.DataFrame({"k": rng.integers(250, 750, rows // 2), "b": rng.random(rows // 2)})
+    return left, right
+
+
+def sort(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("how", joins.JOIN_TYPES)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_partitioned_join_matches_merge(tmp_path, how, workers):
+    left, right = frames()
+    parts = list(partitioned_join(left, right, ["k"], how=how, num_partitions=4, spill_dir=tmp_path,
+                                  workers=workers, chunk_rows=300))
+    result = pd.concat([part for part, _ in parts], ignore_index=True)
+    expected = left.merge(right, on="k", how=how)
+
+    pd.testing.assert_frame_equal(sort(result), sort(expected), check_dtype=False)
+    assert list(tmp_path.iterdir()) == []  # spill files are removed
+
+
+def test_partitioned_join_bounds_partitions_in_flight(tmp_path, monkeypatch):
+    submitted = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            submitted.append(args[0])
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(joins, "ProcessPoolExecutor", RecordingExecutor)
+    left, right = frames()
+    results = partitioned_join(left, right, ["k"], num_partitions=8, spill_dir=tmp_path, workers=2)
+
+    next(results)
+    assert len(submitted) <= 3
+    results.close()
+    assert len(submitted) < 8
+
+
+@pytest.mark.parametrize("how", joins.JOIN_TYPES)
+def test_hash_join_matches_merge(how):
+    left, right = frames()
+    result, _ = hash_join(left, right, ["k"], how=how)
+    expected = left.merge(right, on="k", how=how)
+
+    pd.testing.assert_frame_equal(sort(result), sort(expected), check_dtype=False)
+
+
+@pytest.mark.parametrize("how", joins.JOIN_TYPES)
+def test_hash_join_multiple_keys_with_nulls(how):
+    left = pd.DataFrame(
+        {"k1": [1, 1, 2, None, 3], "k2": ["a", "b", None, "x", "c"], "a": range(5)}
+    )
+    right = pd.DataFrame(
+        {"k1": [1, 2, None, 4, 1], "k2": ["a", None, "x", "d", "b"], "b": range(5)}
+    )
+    result, _ = hash_join(left, right, ["k1", "k2"], how=how)
+    # Null keys match each other, as in pd.merge
+    expected = left.merge(right, on=["k1", "k2"], how=how)
+
+    pd.testing.assert_frame_equal(sort(result), sort(expected), check_dtype=False)
+
+
+def test_hash_join_does_not_modify_inputs():
+    left = pd.DataFrame({"k": [1, 2], "a": [1.0, 2.0]})
+    right = pd.DataFrame({"k": ["1", "2"], "b": [3, 4]})
+    left_copy, right_copy = left.copy(), right.copy()
+    hash_join(left, right, ["k"])
+
+    pd.testing.assert_frame_equal(left, left_copy)
+    pd.testing.assert_frame_equal(right, right_copy)
+
+
+@pytest.mark.parametrize(
+    "left_keys, right_keys",
+    [
+        ([1, 2, 3], [1.0, 2.0, 5.0]),  # int and float compare numerically
+        ([1, 2, 3], ["1", "2", "5"]),  # int and str compare as strings
+        (["a", "b", "c"], pd.Categorical(["a", "b", "z"])),  # str and categorical
+    ],
+)
+def test_hash_join_mixed_key_dtypes(left_keys, right_keys):
+    left = pd.DataFrame({"k": left_keys, "a": [1, 2, 3]})
+    right = pd.DataFrame({"k": right_keys, "b": [4, 5, 6]})
+    result, _ = hash_join(left, right, ["k"], columns=["a", "b"])
+
+    assert sorted(zip(result["a"], result["b"])) == [(1, 4), (2, 5)]
+
+
+@pytest.mark.parametrize("bool_side", ["left", "right"])
+def test_hash_join_bool_keys_compare_as_strings(bool_side):
+    bools = pd.DataFrame({"k": [True, False], "x": [1, 2]})
+    ints = pd.DataFrame({"k": [1, 0], "y": [3, 4]})
+    left, right = (bools, ints) if bool_side == "left" else (ints, bools)
+    result, _ = hash_join(left, right, ["k"])
+    # Like the string-cast join, True and 1 ("True" and "1") do not match in either direction
+    expected = left.astype({"k": str}).merge(right.astype({"k": str}), on="k")
+
+    assert len(result) == len(expected) == 0
+
+
+def test_hash_join_counts_duplicates():
+    left = pd.DataFrame({"k": [1, 1], "a": [1, 1]})
+    right = pd.DataFrame({"k": [1], "b": [2]})
+
+    assert hash_join(left, right, ["k"], check_duplicates="hash")[1] == 1
+    assert hash_join(left, right, ["k"], check_duplicates="full")[1] == 1
+    assert hash_join(left, right, ["k"], check_duplicates=None)[1] is None
+
+
+def test_hash_join_rejects_unknown_inputs():
+    df = pd.DataFrame({"k": [1]})
+    with pytest.raises(ValueError):
+        hash_join(df, df, ["k"], how="cross")
+    with pytest.raises(KeyError):
+        hash_join(df, df, ["k"], columns=["missing"])
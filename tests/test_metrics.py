@@ -0,0 +1,125 @@
+import json
+import threading
+
+import pytest
+
+from metrics import SPAN_COLUMNS, MetricsRecorder
+
+
+def test_span_records_rows_bytes_labels_and_time():
+    metrics = MetricsRecorder()
+
+    with metrics.span("fetch", "Snowflake", format="arrow") as span:
+        span.set(rows=10, bytes=800, batches=2)
+
+    [record] = metrics.records("span")
+    assert record["span"] == "fetch" and record["source"] == "Snowflake"
+    assert (record["rows"], record["bytes"], record["error"]) == (10, 800, None)
+    assert record["labels"] == {"format": "arrow", "batches": 2}
+    assert record["time_sec"] >= 0
+    assert "timestamp" in record
+
+
+def test_span_records_errors_and_reraises():
+    metrics = MetricsRecorder()
+
+    with pytest.raises(ValueError):
+        with metrics.span("wait", "BigQuery"):
+            raise ValueError("bad query")
+
+    [record] = metrics.records("span")
+    assert record["error"] == "ValueError('bad query')"
+    assert record["rows"] is None
+
+
+def test_to_dataframe_orders_columns_and_fills_missing_fields():
+    metrics = MetricsRecorder()
+    with metrics.span("connect", "BigQuery"):
+        pass
+    metrics.record_span("fetch", 1.5, "BigQuery", rows=3)
+
+    spans = metrics.to_dataframe("span", SPAN_COLUMNS)
+    assert list(spans.columns) == SPAN_COLUMNS
+    assert spans["span"].tolist() == ["connect", "fetch"]
+    assert spans["time_sec"].iloc[1] == 1.5
+
+    assert metrics.to_dataframe("import", ["rows"]).empty
+    metrics.record("import", rows=1)
+    assert list(metrics.to_dataframe("import").columns) == ["rows", "timestamp"]
+
+
+def test_to_jsonl_exports_every_record_with_its_kind(tmp_path):
+    metrics = MetricsRecorder()
+    metrics.record("write", table="orders", rows=5)
+    metrics.record_span("write", 0.5, "orders", rows=5, method="bulk")
+    path = tmp_path / "metrics.jsonl"
+
+    lines = metrics.to_jsonl(str(path))
+
+    records = [json.loads(line) for line in lines.splitlines()]
+    assert [record["kind"] for record in records] == ["write", "span"]
+    assert records[1]["labels"] == {"method": "bulk"}
+    assert path.read_text() == lines
+
+
+def test_to_prometheus_sums_spans_by_name_and_source():
+    metrics = MetricsRecorder()
+    metrics.record_span("fetch", 1.0, "BigQuery", rows=10, bytes=100)
+    metrics.record_span("fetch", 2.0, "BigQuery", rows=5, error="TimeoutError()")
+    metrics.record_span("connect", 0.5)
+
+    text = metrics.to_prometheus(prefix="test")
+
+    assert 'test_span_count_total{span="fetch",source="BigQuery"} 2' in text
+    assert 'test_span_seconds_total{span="fetch",source="BigQuery"} 3.0' in text
+    assert 'test_span_rows_total{span="fetch",source="BigQuery"} 15' in text
+    assert 'test_span_bytes_total{span="fetch",source="BigQuery"} 100' in text
+    assert 'test_span_errors_total{span="fetch",source="BigQuery"} 1' in text
+    assert 'test_span_count_total{span="connect",source=""} 1' in text
+    assert "# TYPE test_span_seconds_total counter" in text
+
+
+def test_process_peak_rss_never_decreases():
+    metrics = MetricsRecorder()
+    for name in ("first", "second"):
+        with metrics.span(name):
+            pass
+
+    peaks = [record["process_peak_rss_mb"] for record in metrics.records("span")]
+    if peaks[0] is None:
+        pytest.skip("Peak RSS is not available on this platform.")
+    assert 0 < peaks[0] <= peaks[1]
+    assert "test_process_peak_rss_megabytes" in metrics.to_prometheus(prefix="test")
+
+
+def test_hooks_see_every_record_and_failing_hooks_are_ignored():
+    metrics = MetricsRecorder()
+    seen = []
+
+    def failing_hook(kind, record):
+        raise RuntimeError("broken hook")
+
+    metrics.add_hook(failing_hook)
+    metrics.add_hook(lambda kind, record: seen.append((kind, record.get("span"))))
+    with metrics.span("join"):
+        pass
+    metrics.remove_hook(failing_hook)
+    metrics.record("plan", placement="local")
+
+    assert seen == [("span", "join"), ("plan", None)]
+
+
+def test_records_are_thread_safe():
+    metrics = MetricsRecorder()
+
+    def record_spans():
+        for _ in range(200):
+            metrics.record_span("fetch", 0.0, rows=1)
+
+    threads = [threading.Thread(target=record_spans) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(metrics.records("span")) == 800
@@ -0,0 +1,98 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from partitions import (
+    HashPartitions, RangePartitions, make_partitions, partition_queries, sql_literal,
+)
+
+
+def test_sql_literals():
+    assert sql_literal(5) == "5"
+    assert sql_literal(2.5) == "2.5"
+    assert sql_literal("O'Brien") == "'O''Brien'"
+    assert sql_literal(datetime.date(2017, 8, 1)) == "DATE '2017-08-01'"
+    assert sql_literal(pd.Timestamp("2017-08-01 12:30")) == "TIMESTAMP '2017-08-01 12:30:00'"
+    with pytest.raises(TypeError):
+        sql_literal(True)
+
+
+def test_int_ranges_cover_every_value_once():
+    partitions = RangePartitions("order_id", [10, 20])
+
+    assert partitions.predicates("snowflake") == [
+        'source."order_id" < 10',
+        'source."order_id" >= 10 AND source."order_id" < 20',
+        'source."order_id" >= 20',
+        'source."order_id" IS NULL',
+    ]
+    assert partitions.predicates("bigquery")[0] == "source.`order_id` < 10"
+
+
+def test_date_ranges_split_into_periods_with_open_ends():
+    partitions = RangePartitions.dates(
+        "order_date", datetime.date(2017, 8, 1), datetime.date(2017, 8, 15), freq="7D"
+    )
+
+    assert partitions.bounds == [
+        datetime.date(2017, 8, 1), datetime.date(2017, 8, 8), datetime.date(2017, 8, 15),
+    ]
+    assert partitions.predicates("bigquery") == [
+        "source.`order_date` < DATE '2017-08-01'",
+        "source.`order_date` >= DATE '2017-08-01' AND source.`order_date` < DATE '2017-08-08'",
+        "source.`order_date` >= DATE '2017-08-08' AND source.`order_date` < DATE '2017-08-15'",
+        "source.`order_date` >= DATE '2017-08-15'",
+        "source.`order_date` IS NULL",
+    ]
+
+
+def test_timestamp_ranges_keep_timestamp_bounds():
+    partitions = RangePartitions.dates("event_timestamp_utc", "2017-08-01", "2017-08-03")
+
+    predicates = partitions.predicates("snowflake")
+    assert len(predicates) == 5
+    assert predicates[1] == (
+        "source.\"event_timestamp_utc\" >= TIMESTAMP '2017-08-01 00:00:00' "
+        "AND source.\"event_timestamp_utc\" < TIMESTAMP '2017-08-02 00:00:00'"
+    )
+
+
+def test_invalid_range_bounds_are_rejected():
+    with pytest.raises(ValueError, match="at least one bound"):
+        RangePartitions("order_id", [])
+    with pytest.raises(ValueError, match="strictly increasing"):
+        RangePartitions("order_id", [10, 10])
+
+
+def test_hash_partitions_are_non_negative_and_exhaustive():
+    predicates = HashPartitions("order_id", 3).predicates("snowflake")
+
+    assert predicates == [
+        f'MOD(MOD(HASH(source."order_id"), 3) + 3, 3) = {index}' for index in range(3)
+    ]
+    assert "FARM_FINGERPRINT" in HashPartitions("order_id", 2).predicates("bigquery")[0]
+    with pytest.raises(ValueError):
+        HashPartitions("order_id", 0)
+
+
+def test_make_partitions_from_specs():
+    assert isinstance(make_partitions({"column": "order_id", "hash": 4}), HashPartitions)
+    assert make_partitions({"column": "order_id", "bounds": [1, 2]}).bounds == [1, 2]
+    dates = make_partitions({"column": "order_date", "start": "2017-08-01", "end": "2017-08-03"})
+    assert len(dates.bounds) == 3
+    partitions = HashPartitions("order_id", 2)
+    assert make_partitions(partitions) is partitions
+    with pytest.raises(ValueError, match="Invalid partition spec"):
+        make_partitions({"column": "order_id"})
+
+
+def test_partition_queries_wrap_the_normalized_query():
+    queries = partition_queries(
+        "SELECT *\n  FROM orders;  -- all", RangePartitions("order_id", [10]), "snowflake"
+    )
+
+    assert queries[0] == (
+        'SELECT *\nFROM (\nSELECT * FROM orders\n) AS source\nWHERE source."order_id" < 10'
+    )
+    assert len(queries) == 3
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+from planner import ESTIMATED_STRING_BYTES, estimate_snowflake, plan_join, snowflake_row_width
+
+
+class EstimateCursor:
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = rows
+        self.statements = []
+
+    def describe(self, query):
+        return self.description
+
+    def execute(self, query):
+        self.statements.append(query)
+
+    def fetchone(self):
+        return (self.rows,)
+
+
+def test_snowflake_row_width_uses_bigquery_units():
+    description = [
+        SimpleNamespace(name="id", type_code=0, internal_size=None),  # NUMBER
+        SimpleNamespace(name="at", type_code=8, internal_size=None),  # TIMESTAMP_NTZ
+        SimpleNamespace(name="flag", type_code=13, internal_size=None),  # BOOLEAN
+        SimpleNamespace(name="code", type_code=2, internal_size=3),  # VARCHAR(3)
+        SimpleNamespace(name="name", type_code=2, internal_size=16_777_216),  # VARCHAR
+    ]
+    assert snowflake_row_width(description) == 8 + 8 + 1 + (2 + 3) + (2 + ESTIMATED_STRING_BYTES)
+
+
+def test_estimate_snowflake_scales_rows_by_width():
+    cursor = EstimateCursor(
+        [SimpleNamespace(name="id", type_code=0, internal_size=None)], rows=1_000
+    )
+
+    assert estimate_snowflake(cursor, "SELECT id FROM t;") == (8_000, 1_000)
+    assert cursor.statements == ["SELECT COUNT(*) FROM (\nSELECT id FROM t\n)"]
+
+
+def test_estimate_snowflake_failure_is_unknown():
+    class FailingCursor(EstimateCursor):
+        def execute(self, query):
+            raise RuntimeError("no warehouse")
+
+    assert estimate_snowflake(FailingCursor([], 0), "SELECT 1") == (None, None)
+
+
+def test_plan_join_ships_the_small_side():
+    plan = plan_join(10_000_000_000, 1_000_000, how="inner")
+    assert plan.placement == "bigquery"
+    assert plan.costs["bigquery"] < plan.costs["client"]
+    assert plan_join(1_000_000, 10_000_000_000).placement == "snowflake"
+
+
+def test_plan_join_requires_savings_and_estimates():
+    assert plan_join(1_000_000, 900_000).placement == "client"
+    assert plan_join(None, 1_000).placement == "client"
+    assert plan_join(10**10, 10**6, max_ship_bytes=10**3).placement == "client"
+    assert plan_join(10**10, 10**6, placements=("client", "snowflake")).placement == "client"
+    with pytest.raises(ValueError):
+        plan_join(1, 1, how="cross")
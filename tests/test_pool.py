@@ -0,0 +1,139 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import pool
+from fakes import FakeSnowflakeConnection
+from pool import SnowflakeConnectionPool
+
+
+class Clock:
+    """
+    A monotonic clock advanced by hand.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pool.time, "monotonic", clock)
+    return clock
+
+
+def make_pool(**options):
+    opened = []
+
+    def connect(config):
+        conn = FakeSnowflakeConnection(pd.DataFrame({"a": [1]}))
+        opened.append(conn)
+        return conn
+
+    return SnowflakeConnectionPool({"user": "u"}, connect=connect, **options), opened
+
+
+def test_checkin_reuses_connection(clock):
+    connections, opened = make_pool()
+    conn = connections.acquire()
+    connections.release(conn)
+
+    assert connections.acquire() is conn
+    assert len(opened) == 1
+    assert connections.stats()["checkouts"] == 2
+
+
+def test_full_pool_times_out(clock):
+    connections, _ = make_pool(max_size=1)
+    connections.acquire()
+
+    with pytest.raises(TimeoutError):
+        connections.acquire(timeout=0)
+
+
+def test_full_pool_waits_for_release():
+    connections, opened = make_pool(max_size=1)
+    conn = connections.acquire()
+    threading.Timer(0.05, connections.release, (conn,)).start()
+
+    assert connections.acquire(timeout=5) is conn
+    assert len(opened) == 1
+
+
+def test_closed_connection_is_replaced(clock):
+    connections, opened = make_pool()
+    conn = connections.acquire()
+    connections.release(conn)
+    conn.close()
+
+    replacement = connections.acquire()
+    assert replacement is not conn
+    assert connections.stats()["failed_checks"] == 1
+    assert connections.stats()["size"] == 1
+
+
+def test_idle_connection_is_probed(clock):
+    connections, _ = make_pool(validate_after_sec=60)
+    conn = connections.acquire()
+    connections.release(conn)
+
+    clock.now += 30
+    assert connections.acquire() is conn
+    assert conn.statements == []
+    connections.release(conn)
+
+    clock.now += 61
+    assert connections.acquire() is conn
+    assert conn.statements == ["SELECT 1"]
+
+
+def test_idle_connections_are_evicted_down_to_min_size(clock):
+    connections, opened = make_pool(min_size=1, idle_timeout_sec=600)
+    first, second = connections.acquire(), connections.acquire()
+    connections.release(first)
+    connections.release(second)
+
+    clock.now += 601
+    conn = connections.acquire()
+    # The oldest connection is closed; min_size keeps the other one
+    assert first.is_closed()
+    assert conn is second
+    assert connections.stats()["size"] == 1
+
+
+def test_drain_closes_idle_and_stale_connections(clock):
+    connections, _ = make_pool()
+    idle, busy = connections.acquire(), connections.acquire()
+    connections.release(idle)
+    connections.drain()
+    assert idle.is_closed()
+
+    connections.release(busy)  # opened before the drain
+    assert busy.is_closed()
+    assert connections.stats()["size"] == 0
+
+
+def test_failed_connect_frees_its_slot(clock):
+    def connect(config):
+        raise ConnectionError("login failed")
+
+    connections = SnowflakeConnectionPool({}, max_size=1, connect=connect)
+    with pytest.raises(ConnectionError):
+        connections.acquire()
+    assert connections.stats()["size"] == 0
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        SnowflakeConnectionPool({}, min_size=2, max_size=1)
+
+
+def test_get_pool_is_shared_per_config():
+    config = {"user": "shared-pool-test"}
+
+    assert pool.get_pool(config) is pool.get_pool(dict(config))
+    assert pool.get_pool(config) is not pool.get_pool({"user": "other-pool-test"})
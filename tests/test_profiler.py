@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from profiler import DataProfiler, profile_dataframe
+from utils import validate_dataframe_for_snowflake
+
+
+def test_counts_match_pandas():
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 2, 3, None],
+            "name": ["a", "b", "b", None, "c"],
+            "price": [1.5, 2.0, 2.0, 2.0, np.nan],
+        }
+    )
+    report = profile_dataframe(df, key_columns=["id"])
+
+    assert report.rows == 5
+    assert report.columns["nulls"].to_dict() == df.isna().sum().to_dict()
+    assert report.columns["distinct"].to_dict() == df.nunique().to_dict()
+    assert report.duplicate_rows == int(df.duplicated().sum())
+    assert report.duplicate_keys == int(df.duplicated(["id"]).sum())
+    assert report.columns.loc["price", "min"] == 1.5
+    assert report.columns.loc["name", "max"] == "c"
+
+
+def test_chunks_match_single_pass():
+    df = pd.DataFrame({"k": [1, 2, 3, 1, 2, 4], "v": ["x", "y", "x", "x", "y", None]})
+    profiler = DataProfiler(key_columns=["k"])
+    profiler.update(df.iloc[:3])
+    profiler.update(df.iloc[3:])
+    chunked = profiler.report()
+    single = profile_dataframe(df, key_columns=["k"])
+
+    assert chunked.summary() == single.summary()
+    pd.testing.assert_frame_equal(chunked.columns, single.columns)
+
+
+def test_empty_frame():
+    report = profile_dataframe(pd.DataFrame({"a": pd.Series([], dtype="int64")}))
+
+    assert report.rows == 0
+    assert report.null_cells == 0
+    assert report.duplicate_rows == 0
+    assert report.columns.loc["a", "null_fraction"] == 0.0
+    assert report.columns.loc["a", "min"] is None
+
+
+def test_all_null_and_mixed_type_columns():
+    df = pd.DataFrame({"empty": [None, None, None], "mixed": [1, "a", 2.5]})
+    report = profile_dataframe(df)
+
+    assert report.columns.loc["empty", "nulls"] == 3
+    assert report.columns.loc["empty", "distinct"] == 0
+    assert report.columns.loc["mixed", "min"] is None  # values are not comparable
+    assert report.columns.loc["mixed", "distinct"] == 3
+
+
+def test_unhashable_values():
+    # BigQuery REPEATED fields arrive as lists or arrays
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "tags": [["a", "b"], ["a", "b"], None, ["c"]],
+            "scores": [np.array([1, 2]), np.array([3]), np.array([1, 2]), np.array([3])],
+        }
+    )
+    report = profile_dataframe(df)
+
+    assert report.columns.loc["tags", "nulls"] == 1
+    assert report.columns.loc["tags", "distinct"] == 2
+    assert report.columns.loc["scores", "distinct"] == 2
+    assert pd.isna(report.columns.loc["tags", "min"])
+    assert report.duplicate_rows == 0
+    assert validate_dataframe_for_snowflake(df.drop(columns="tags"))
+    assert not validate_dataframe_for_snowflake(df)
+
+
+def test_validation_with_and_without_report_agree(capsys):
+    df = pd.DataFrame({"id": [1, 2, 3], "name": ["a", None, "c"], "price": [1.0, 2.0, np.nan]})
+
+    assert not validate_dataframe_for_snowflake(df, required_columns=["id", "qty"])
+    direct = capsys.readouterr().out
+    assert direct == (
+        "Error: Missing required columns: qty\nError: Missing values in columns: name, price\n"
+    )
+
+    report = profile_dataframe(df, distinct=False, duplicates=False)
+    assert not validate_dataframe_for_snowflake(df, ["id", "qty"], report=report)
+    assert capsys.readouterr().out == direct
+
+    assert validate_dataframe_for_snowflake(df[["id"]], required_columns=["id"])
+
+
+def test_check_rules():
+    df = pd.DataFrame({"id": [1, 1, 2], "v": [None, "a", "b"]})
+    report = profile_dataframe(df, key_columns=["id"])
+
+    failures = report.check(
+        required_columns=["id", "missing"], not_null=["v"], unique_columns=["id"],
+        max_duplicate_rows=0, max_null_fraction=0.5,
+    )
+    assert len(failures) == 3
+    assert report.check(max_null_fraction=0.5) == []
+    with pytest.raises(ValueError):
+        report.check(unique_columns=["v"])
+
+
+def test_missing_key_columns():
+    with pytest.raises(KeyError):
+        profile_dataframe(pd.DataFrame({"a": [1]}), key_columns=["b"])
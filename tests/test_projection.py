@@ -0,0 +1,60 @@
+import pytest
+
+from projection import TableRead, parse_projection
+
+
+def test_parse_projection_with_aliases_and_filter():
+    read = parse_projection(
+        "SELECT visitor_id AS user_id, `event action`, order_id\n"
+        "FROM `ecom-442020.ga_sessions.events_unnest`\n"
+        "WHERE event_action = 'Add to Cart' -- carts only\n"
+    )
+
+    assert read.table == "`ecom-442020.ga_sessions.events_unnest`"
+    assert read.table_parts() == ["ecom-442020", "ga_sessions", "events_unnest"]
+    assert read.columns == [("visitor_id", "user_id"), ("`event action`", None), ("order_id", None)]
+    assert read.column_names() == ["visitor_id", "event action", "order_id"]
+    assert read.row_filter == "event_action = 'Add to Cart'"
+    assert read.sql() == (
+        "SELECT visitor_id, `event action`, order_id "
+        "FROM `ecom-442020.ga_sessions.events_unnest` WHERE event_action = 'Add to Cart'"
+    )
+
+
+def test_parse_projection_of_all_columns():
+    read = parse_projection("select * from db.schema.orders;")
+
+    assert read.columns is None and read.row_filter is None
+    assert read.column_names() is None and read.output_names("snowflake") is None
+    assert read.sql() == "SELECT * FROM db.schema.orders"
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT a, COUNT(*) FROM t GROUP BY a",
+        "SELECT UPPER(a) AS b FROM t",
+        "SELECT a FROM t JOIN u ON t.id = u.id",
+        "SELECT a FROM t WHERE b IN (SELECT b FROM u)",
+        "SELECT a FROM t ORDER BY a",
+        "SELECT a FROM t LIMIT 10",
+        "SELECT DISTINCT a FROM t",
+        "SELECT a FROM t1, t2",
+    ],
+)
+def test_parse_projection_rejects_queries_that_do_more(query):
+    assert parse_projection(query) is None
+
+
+def test_output_names_follow_the_dialect():
+    read = TableRead("orders", {"order_id": "id", '"Item Name"': None, "price": None})
+
+    assert read.output_names("bigquery") == ["id", "Item Name", "price"]
+    assert read.output_names("snowflake") == ["ID", "Item Name", "PRICE"]
+
+
+def test_from_spec():
+    read = TableRead.from_spec({"table": "p.d.t", "columns": ["a"], "filter": "a > 1"})
+
+    assert (read.table, read.columns, read.row_filter) == ("p.d.t", [("a", None)], "a > 1")
+    assert TableRead.from_spec(read) is read
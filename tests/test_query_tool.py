@@ -0,0 +1,387 @@
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import query_tool
+import resilience
+from cache import QueryCache
+from fakes import FakeBigQueryClient, FakeSnowflakeConnection, FakeSnowflakeCursor, fake_tool
+from resilience import RetryPolicy
+from storage import LocalDataset
+
+
+def test_extract_and_join_rejects_unknown_join_type():
+    tool = fake_tool(100, 10)
+
+    with pytest.raises(ValueError, match="Unknown join type"):
+        tool.extract_and_join("SELECT 1", "SELECT 1", ["order_id"], ["order_id"], how="cross")
+    # Rejected before any query runs
+    assert tool.bigquery_client.queries == []
+    assert tool.snowflake_conn.statements == []
+
+
+def test_cached_results_follow_the_output_options_of_each_call(tmp_path):
+    tool = fake_tool(2_000, 1_000)
+    tool.cache = QueryCache(str(tmp_path))
+
+    compacted = tool.query_snowflake("SELECT * FROM orders", compact=True)
+    plain = tool.query_snowflake("SELECT * FROM orders", compact=False)
+    assert any(isinstance(dtype, pd.CategoricalDtype) for dtype in compacted.dtypes)
+    assert not any(isinstance(dtype, pd.CategoricalDtype) for dtype in plain.dtypes)
+    assert tool.cache.hits == 1
+
+    arrow = tool.query_snowflake("SELECT * FROM orders", arrow_dtypes=True)
+    default = tool.query_snowflake("SELECT * FROM orders")
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in arrow.dtypes)
+    assert not any(isinstance(dtype, pd.ArrowDtype) for dtype in default.dtypes)
+
+    compacted = tool.query_bigquery("SELECT * FROM events", compact=True)
+    plain = tool.query_bigquery("SELECT * FROM events")
+    assert any(isinstance(dtype, pd.CategoricalDtype) for dtype in compacted.dtypes)
+    assert not any(isinstance(dtype, pd.CategoricalDtype) for dtype in plain.dtypes)
+
+
+def test_kept_checkpoints_expire(tmp_path, monkeypatch):
+    tool = fake_tool(100, 50)
+    now = [time.time()]
+    monkeypatch.setattr(query_tool.time, "time", lambda: now[0])
+
+    def extract():
+        return tool.extract_resumable(
+            "snowflake", "SELECT * FROM orders", checkpoint_dir=str(tmp_path),
+            keep_checkpoint=True, max_age_sec=3600,
+        )
+
+    first = extract()
+    statements = len(tool.snowflake_conn.statements)
+
+    # A kept checkpoint is reused while it is fresh
+    now[0] += 3000
+    pd.testing.assert_frame_equal(extract(), first)
+    assert len(tool.snowflake_conn.statements) == statements
+
+    # and extracted again once it is older than max_age_sec
+    now[0] += 3000
+    pd.testing.assert_frame_equal(extract(), first)
+    assert len(tool.snowflake_conn.statements) > statements
+
+
+class FailingCursor(FakeSnowflakeCursor):
+    """
+    Fails statements starting with `connection.fail_prefix`, `connection.failures` times.
+    """
+    def execute(self, query, params=None):
+        connection = self.connection
+        if connection.failures and query.startswith(connection.fail_prefix):
+            connection.failures -= 1
+            connection.statements.append(query)
+            raise connection.error
+        return super().execute(query, params)
+
+
+class FailingConnection(FakeSnowflakeConnection):
+    def __init__(self, fail_prefix, failures, error):
+        super().__init__(pd.DataFrame({"status": pd.Series([], dtype=object)}))
+        self.fail_prefix = fail_prefix
+        self.failures = failures
+        self.error = error
+
+    def cursor(self):
+        return FailingCursor(self)
+
+
+def write_frame(rows=100):
+    return pd.DataFrame({
+        "Order_ID": range(rows),
+        "Order_Date": pd.date_range("2016-08-01", periods=rows, freq="h"),
+        "Price": [1.5, None] * (rows // 2),
+    })
+
+
+def statement_kinds(connection):
+    return [statement.split()[0] for statement in connection.statements]
+
+
+def test_bulk_write_stages_and_copies_without_mutating_the_frame():
+    tool = fake_tool(10, 10)
+    df = write_frame()
+    original = df.copy()
+
+    written = tool.write_to_snowflake(df, "orders", method="bulk", chunk_rows=40)
+
+    pd.testing.assert_frame_equal(df, original)
+    assert list(written.columns) == ["order_id", "order_date", "price"]
+    assert statement_kinds(tool.snowflake_conn) == ["CREATE", "PUT", "COPY"]
+    create, put, copy = tool.snowflake_conn.statements
+    assert '"order_id" NUMBER(38, 0)' in create and '"order_date" TIMESTAMP_NTZ' in create
+    assert copy.startswith("COPY INTO orders FROM '@%orders/")
+    assert tool.snowflake_conn.bytes_staged > 0
+    assert set(tool.write_logs["phase"]) == {"serialize", "stage", "copy"}
+
+
+def test_insert_write_does_not_mutate_the_frame():
+    tool = fake_tool(10, 10)
+    df = write_frame()
+    original = df.copy()
+
+    written = tool.write_to_snowflake(df, "orders", method="insert")
+
+    pd.testing.assert_frame_equal(df, original)
+    assert written["order_date"].iloc[0] == "2016-08-01 00:00:00"
+    assert statement_kinds(tool.snowflake_conn) == ["CREATE", "INSERT"]
+    assert tool.snowflake_conn.rows_inserted == len(df)
+
+
+def test_auto_write_inserts_small_frames_and_bulk_loads_large_ones():
+    tool = fake_tool(10, 10)
+
+    tool.write_to_snowflake(write_frame(100), "orders", method="auto")
+    assert statement_kinds(tool.snowflake_conn) == ["CREATE", "INSERT"]
+
+    tool.snowflake_conn.statements.clear()
+    tool.write_to_snowflake(write_frame(query_tool.BULK_WRITE_MIN_ROWS), "orders", method="auto")
+    assert statement_kinds(tool.snowflake_conn) == ["CREATE", "PUT", "COPY"]
+
+
+def test_bulk_write_retries_transient_copy_errors(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    tool = fake_tool(10, 10)
+    tool.snowflake_conn = FailingConnection("COPY", 1, ConnectionError("reset"))
+    tool.retry_policy = RetryPolicy(retries=2, base_delay=0)
+
+    tool.write_to_snowflake(write_frame(), "orders", method="bulk", raise_errors=True)
+
+    assert statement_kinds(tool.snowflake_conn) == ["CREATE", "PUT", "COPY", "COPY"]
+    copy_log = tool.write_logs.set_index("phase").loc["copy"]
+    assert copy_log["rows"] == 100
+
+
+def test_bulk_write_removes_staged_files_when_copy_fails():
+    tool = fake_tool(10, 10)
+    tool.snowflake_conn = FailingConnection("COPY", 1, ValueError("invalid file format"))
+
+    with pytest.raises(ValueError, match="invalid file format"):
+        tool.write_to_snowflake(write_frame(), "orders", method="bulk", raise_errors=True)
+
+    statements = tool.snowflake_conn.statements
+    assert statement_kinds(tool.snowflake_conn) == ["CREATE", "PUT", "COPY", "REMOVE"]
+    stage_path = statements[2].split("FROM ")[1].split()[0]
+    assert statements[3] == f"REMOVE {stage_path}"
+
+
+class FailingBigQueryClient(FakeBigQueryClient):
+    """
+    Fails queries ending with `fail_suffix`, `failures` times.
+    """
+    def __init__(self, df, fail_suffix, failures, error):
+        super().__init__(df)
+        self.fail_suffix = fail_suffix
+        self.failures = failures
+        self.error = error
+
+    def query(self, query, job_config=None, **kwargs):
+        if self.failures and query.endswith(self.fail_suffix):
+            self.failures -= 1
+            self.queries.append(query)
+            raise self.error
+        return super().query(query, job_config, **kwargs)
+
+
+def test_failed_partition_is_retried_on_its_own(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    tool = fake_tool(100, 10)
+    events = tool.bigquery_client.table.to_pandas()
+    tool.bigquery_client = FailingBigQueryClient(events, "= 1", 1, ConnectionError("reset"))
+
+    frames = list(tool.iter_partitions(
+        "bigquery", "SELECT * FROM events", {"column": "order_id", "hash": 3}, retries=2,
+    ))
+
+    assert [len(frame) for frame in frames] == [100] * 3
+    queries = tool.bigquery_client.queries
+    assert len(queries) == 4
+    assert sum(query.endswith("= 1") for query in queries) == 2
+    spans = tool.span_logs[tool.span_logs["span"] == "partition"]
+    attempts = spans["labels"].map(lambda labels: (labels["index"], labels["attempt"]))
+    assert sorted(attempts) == [(0, 0), (1, 0), (1, 1), (2, 0)]
+    assert spans["error"].notna().sum() == 1
+
+
+def test_partition_failing_every_attempt_raises(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    tool = fake_tool(100, 10)
+    events = tool.bigquery_client.table.to_pandas()
+    tool.bigquery_client = FailingBigQueryClient(events, "= 1", 3, ConnectionError("reset"))
+
+    with pytest.raises(ConnectionError):
+        list(tool.iter_partitions(
+            "bigquery", "SELECT * FROM events", {"column": "order_id", "hash": 3}, retries=1,
+        ))
+
+
+def test_query_many_returns_results_in_job_order():
+    tool = fake_tool(30, 20)
+    tool.bigquery_client.latency_sec = 0.2
+
+    events, orders = tool.query_many([("bigquery", "SELECT 1"), ("snowflake", "SELECT 2")])
+
+    assert len(events) == 30 and "event_action" in events.columns
+    assert len(orders) == 20 and "item_price" in orders.columns
+
+
+def test_query_many_cancels_pending_jobs_when_one_fails(monkeypatch):
+    tool = fake_tool(30, 20)
+
+    def fail(query, **kwargs):
+        raise ValueError("invalid SQL")
+
+    monkeypatch.setattr(tool, "query_snowflake", fail)
+    jobs = [("snowflake", "SELECT 1"), ("bigquery", "SELECT 2"), ("bigquery", "SELECT 3")]
+
+    with pytest.raises(ValueError, match="invalid SQL"):
+        tool.query_many(jobs, max_workers=1)
+    assert tool.bigquery_client.queries == []
+
+
+def test_query_many_enforces_per_job_timeouts():
+    tool = fake_tool(30, 20)
+    tool.bigquery_client.latency_sec = 2.0
+
+    start_time = time.monotonic()
+    with pytest.raises(query_tool.TimeoutError, match="bigquery job 1"):
+        tool.query_many([("snowflake", "SELECT 1"), ("bigquery", "SELECT 2", 0.2)])
+    assert time.monotonic() - start_time < 1.5
+
+
+def test_query_many_stops_polling_once_timed_jobs_finish(monkeypatch):
+    tool = fake_tool(30, 20)
+    tool.bigquery_client.latency_sec = 0.6
+    timeouts = []
+    wait = query_tool.wait
+
+    def recording_wait(futures, timeout=None, return_when=None):
+        timeouts.append(timeout)
+        return wait(futures, timeout=timeout, return_when=return_when)
+
+    monkeypatch.setattr(query_tool, "wait", recording_wait)
+    tool.query_many([("snowflake", "SELECT 1", 0.2), ("bigquery", "SELECT 2")])
+
+    # After the timed Snowflake job is done, the untimed BigQuery job is awaited without polling
+    assert timeouts[-1] is None
+    assert len(timeouts) <= 3
+
+
+class FakeReadClient:
+    """
+    A BigQuery Storage read client serving `table` from one stream.
+    """
+    def __init__(self, table, bytes_scanned):
+        self.table = table
+        self.bytes_scanned = bytes_scanned
+        self.sessions = []
+
+    def create_read_session(self, parent, read_session, max_stream_count):
+        self.sessions.append(read_session)
+        return SimpleNamespace(
+            streams=[SimpleNamespace(name="stream-0")],
+            estimated_total_bytes_scanned=self.bytes_scanned,
+        )
+
+    def read_rows(self, name):
+        return SimpleNamespace(to_arrow=lambda session: self.table)
+
+
+def test_direct_bigquery_read_logs_the_bytes_scanned():
+    tool = fake_tool(30, 20)
+    table = pa.table({"visitor_id": ["a", "b"], "order_id": ["1", "2"]})
+    tool.bigquery_storage_client = FakeReadClient(table, bytes_scanned=4_000_000)
+
+    df = tool.query_bigquery(
+        "SELECT order_id, visitor_id AS user_id FROM `p.d.events` WHERE order_id IS NOT NULL",
+        direct=True,
+    )
+
+    assert list(df.columns) == ["order_id", "user_id"]
+    assert df["user_id"].tolist() == ["a", "b"]
+    session = tool.bigquery_storage_client.sessions[0]
+    assert list(session.read_options.selected_fields) == ["order_id", "visitor_id"]
+    assert session.read_options.row_restriction == "order_id IS NOT NULL"
+    assert tool.bigquery_client.queries == []
+
+    log = tool.import_logs.iloc[-1]
+    assert log["mode"] == "direct"
+    assert log["data_mb"] == pytest.approx(4.0)
+
+
+def test_federated_join_in_bigquery_requires_a_temp_dataset():
+    tool = fake_tool(30, 20)
+
+    with pytest.raises(ValueError, match="temp_dataset"):
+        tool.federated_join(
+            "SELECT * FROM events", "SELECT * FROM orders", ["order_id"], ["order_id"],
+            placement="bigquery",
+        )
+    assert tool.bigquery_client.queries == []
+
+
+@pytest.mark.parametrize("source", ["bigquery", "snowflake"])
+@pytest.mark.parametrize("arrow", [False, True])
+def test_streams_yield_bounded_chunks_and_log_once_complete(source, arrow):
+    tool = fake_tool(250, 250)
+    tool.bigquery_client.page_rows = 70
+    tool.snowflake_conn.batch_rows = 70
+    stream = getattr(tool, f"iter_{source}")("SELECT * FROM t", chunk_rows=100, arrow=arrow)
+
+    first = next(stream)
+    assert len(first) == 100
+    assert isinstance(first, pa.Table if arrow else pd.DataFrame)
+    # Nothing is logged until the stream is exhausted
+    assert tool.import_logs.empty
+
+    sizes = [len(first)] + [len(chunk) for chunk in stream]
+    assert sizes == [100, 100, 50]
+    log = tool.import_logs.iloc[-1]
+    assert log["rows"] == 250
+    assert log["source"] == ("BigQuery" if source == "bigquery" else "Snowflake")
+
+
+def test_snowflake_stream_falls_back_to_fetchmany():
+    tool = fake_tool(10, 250)
+    tool.snowflake_conn.arrow = False
+
+    sizes = [len(chunk) for chunk in tool.iter_snowflake("SELECT * FROM t", chunk_rows=100)]
+
+    assert sizes == [100, 100, 50]
+    assert tool.import_logs.iloc[-1]["rows"] == 250
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+def test_stream_to_file_sinks(tmp_path, suffix):
+    tool = fake_tool(250, 10)
+    path = str(tmp_path / f"events{suffix}")
+
+    rows = tool.stream_to_sink(tool.iter_bigquery("SELECT * FROM t", chunk_rows=100), path)
+
+    assert rows == 250
+    written = pd.read_parquet(path) if suffix == ".parquet" else pd.read_csv(path)
+    assert len(written) == 250
+    assert list(written.columns) == list(tool.query_bigquery("SELECT * FROM t").columns)
+
+
+def test_stream_to_snowflake_table_and_local_dataset(tmp_path):
+    tool = fake_tool(250, 10)
+
+    rows = tool.stream_to_sink(
+        tool.iter_bigquery("SELECT * FROM t", chunk_rows=100), "events", method="insert"
+    )
+    assert rows == 250
+    assert tool.snowflake_conn.rows_inserted == 250
+    assert statement_kinds(tool.snowflake_conn).count("INSERT") == 3
+
+    dataset = LocalDataset(str(tmp_path / "events"))
+    rows = tool.stream_to_sink(tool.iter_bigquery("SELECT * FROM t", chunk_rows=100), dataset)
+    assert rows == 250
+    assert len(dataset.read()) == 250
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from resilience import ChunkCheckpoint, RetryPolicy, RetryStats, is_retryable
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = ChunkCheckpoint(str(tmp_path), "extract")
+    checkpoint.save_state(query_id="q-1")
+    checkpoint.add_chunk(pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}), position=2)
+    checkpoint.add_chunk(pd.DataFrame({"a": [3], "b": ["z"]}), position=3)
+
+    # A new checkpoint resumes from the manifest on disk
+    resumed = ChunkCheckpoint(str(tmp_path), "extract")
+    assert resumed.state == {
+        "chunks": 2, "rows": 3, "position": 3, "complete": False, "query_id": "q-1",
+    }
+    expected = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+    pd.testing.assert_frame_equal(resumed.load(), expected)
+
+
+def test_checkpoint_ignores_chunks_missing_from_manifest(tmp_path):
+    checkpoint = ChunkCheckpoint(str(tmp_path), "extract")
+    checkpoint.add_chunk(pd.DataFrame({"a": [1]}), position=1)
+    # A crash after writing a chunk file but before the manifest
+    pd.DataFrame({"a": [2]}).to_parquet(checkpoint._chunk_path(1))
+
+    resumed = ChunkCheckpoint(str(tmp_path), "extract")
+    assert resumed.state["position"] == 1
+    assert resumed.load()["a"].tolist() == [1]
+
+
+def test_checkpoint_reset_and_remove(tmp_path):
+    checkpoint = ChunkCheckpoint(str(tmp_path), "extract")
+    assert checkpoint.load() is None
+    checkpoint.add_chunk(pd.DataFrame({"a": [1]}), position=1)
+
+    checkpoint.reset()
+    assert ChunkCheckpoint(str(tmp_path), "extract").state["chunks"] == 0
+    checkpoint.remove()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_retry_policy_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr("resilience.time.sleep", lambda sec: None)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    stats = RetryStats()
+    assert RetryPolicy(retries=3).call(flaky, stats=stats) == "ok"
+    assert stats.retries == 2
+
+
+def test_retry_policy_raises_fatal_and_last_errors(monkeypatch):
+    monkeypatch.setattr("resilience.time.sleep", lambda sec: None)
+    calls = []
+
+    def fatal():
+        calls.append(1)
+        raise ValueError("bad SQL")
+
+    with pytest.raises(ValueError):
+        RetryPolicy(retries=3).call(fatal)
+    assert len(calls) == 1
+
+    def timeout():
+        calls.append(1)
+        raise TimeoutError()
+
+    with pytest.raises(TimeoutError):
+        RetryPolicy(retries=2).call(timeout)
+    assert len(calls) == 4
+
+
+def test_retry_delays_are_bounded():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert 0 <= RetryPolicy(base_delay=1.0).delay(3) <= 8.0
+
+
+def test_error_classification():
+    class ServiceUnavailable(Exception):
+        pass
+
+    class Forbidden(Exception):
+        errors = [{"reason": "rateLimitExceeded"}]
+
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(ServiceUnavailable())
+    assert is_retryable(Forbidden())
+    assert not is_retryable(KeyError("column"))
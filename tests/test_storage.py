@@ -0,0 +1,82 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from storage import LocalDataset
+
+
+def orders(days=3, rows_per_day=4, start=0):
+    dates = [datetime.date(2016, 8, 1) + datetime.timedelta(days=day) for day in range(days)]
+    return pd.DataFrame(
+        {
+            "order_date": [date for date in dates for _ in range(rows_per_day)],
+            "order_id": range(start, start + days * rows_per_day),
+            "item_price": [float(i) for i in range(days * rows_per_day)],
+        }
+    )
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_partition_pruning(tmp_path, format):
+    dataset = LocalDataset(str(tmp_path / "orders"), format=format, partition_by=["order_date"])
+    df = orders()
+    dataset.write(df)
+
+    day = dataset.read(filters={"order_date": "2016-08-02"}, columns=["order_id", "order_date"])
+    assert day["order_id"].tolist() == [4, 5, 6, 7]
+    assert set(day["order_date"]) == {datetime.date(2016, 8, 2)}
+    assert list(day.columns) == ["order_id", "order_date"]
+
+    # Only the matching partition's files are scanned
+    fragments = dataset.dataset().get_fragments(filter=dataset._filter_expression(
+        {"order_date": "2016-08-02"}, dataset.schema
+    ))
+    assert len(list(fragments)) == 1
+
+    days = dataset.read(
+        filters=[("order_date", "in", [datetime.date(2016, 8, 1), datetime.date(2016, 8, 3)])]
+    )
+    assert len(days) == 8
+
+
+def test_append_and_overwrite(tmp_path):
+    dataset = LocalDataset(str(tmp_path / "orders"), partition_by=["order_date"])
+    dataset.write(orders(days=2))
+    dataset.write(orders(days=1, start=100))
+
+    # A reopened dataset keeps its layout and dtypes
+    reopened = LocalDataset(str(tmp_path / "orders"))
+    assert reopened.partition_by == ["order_date"]
+    assert reopened.compression == "zstd"
+    df = reopened.read()
+    assert len(df) == 12
+    assert df["order_id"].dtype == "int64"
+    assert reopened.partitions()["order_date"].tolist() == [
+        datetime.date(2016, 8, 1), datetime.date(2016, 8, 2),
+    ]
+
+    reopened.write(orders(days=1), append=False)
+    assert len(LocalDataset(str(tmp_path / "orders")).read()) == 4
+
+
+def test_stream_of_chunks(tmp_path):
+    df = orders(days=3)
+    dataset = LocalDataset(str(tmp_path / "stream"), format="arrow")
+
+    assert dataset.write(df.iloc[i:i + 5] for i in range(0, len(df), 5)) == len(df)
+    pd.testing.assert_frame_equal(
+        dataset.read().sort_values("order_id").reset_index(drop=True), df, check_dtype=False
+    )
+
+
+def test_mismatched_columns_and_missing_partitions(tmp_path):
+    dataset = LocalDataset(str(tmp_path / "orders"), partition_by=["order_date"])
+    dataset.write(orders())
+
+    with pytest.raises(ValueError):
+        dataset.write(orders().drop(columns="item_price"))
+    with pytest.raises(KeyError):
+        LocalDataset(str(tmp_path / "other"), partition_by=["missing"]).write(orders())
+    with pytest.raises(FileNotFoundError):
+        LocalDataset(str(tmp_path / "empty")).read()
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+import resilience
+from utils import compact_dtypes, retry_on_failure
+
+
+def test_compact_dtypes_categories_only_low_cardinality(capsys):
+    df = pd.DataFrame(
+        {
+            "country": ["CZ", "DE"] * 500,
+            "label": [f"item {i % 200}" for i in range(1000)],  # 20% distinct
+            "count": range(1000),
+        }
+    )
+    compacted = compact_dtypes(df)
+
+    assert isinstance(compacted["country"].dtype, pd.CategoricalDtype)
+    assert compacted["label"].dtype == pd.StringDtype("pyarrow")
+    assert compacted["count"].dtype == "int16"
+    assert df["country"].dtype == object  # the input is not modified
+    assert capsys.readouterr().out == ""  # no report by default
+
+    capped = compact_dtypes(df, max_categories=1)
+    assert capped["country"].dtype == pd.StringDtype("pyarrow")
+
+
+def test_compact_dtypes_report(capsys):
+    compact_dtypes(pd.DataFrame({"a": [1, 2]}), "Test", report=True)
+
+    output = capsys.readouterr().out
+    assert "Test (raw)" in output and "Test (compacted)" in output
+
+
+def test_retry_on_failure_raises_the_last_error(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    calls = []
+
+    def flaky(value):
+        calls.append(value)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return value
+
+    assert retry_on_failure(flaky, 3, 1, "ok") == "ok"
+
+    calls.clear()
+    with pytest.raises(ConnectionError):
+        retry_on_failure(flaky, 2, 1, "ok")
+    assert len(calls) == 2
+
+
+def test_retry_on_failure_raises_fatal_errors_immediately(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    calls = []
+
+    def invalid():
+        calls.append(1)
+        raise ValueError("invalid SQL")
+
+    with pytest.raises(ValueError, match="invalid SQL"):
+        retry_on_failure(invalid, 3, 1)
+    assert len(calls) == 1
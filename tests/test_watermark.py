@@ -0,0 +1,52 @@
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from watermark import WatermarkStore
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (datetime.datetime(2024, 5, 1, 12, 30), datetime.datetime(2024, 5, 1, 12, 30)),
+        (
+            pd.Timestamp("2024-05-01 12:30", tz="UTC"),
+            datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        ),
+        (datetime.date(2024, 5, 1), datetime.date(2024, 5, 1)),
+        (np.int64(42), 42),
+        (1.5, 1.5),
+        ("2024-05-01", "2024-05-01"),
+    ],
+)
+def test_round_trip(tmp_path, value, expected):
+    path = tmp_path / "state" / "watermarks.json"
+    WatermarkStore(str(path)).set("orders", value)
+
+    # A new store reads the value back from disk
+    stored = WatermarkStore(str(path)).get("orders")
+    assert stored == expected
+    assert type(stored) is type(expected)
+
+
+def test_keys_are_independent(tmp_path):
+    store = WatermarkStore(str(tmp_path / "watermarks.json"))
+    store.set("a", 1)
+    store.set("b", 2)
+    store.set("a", 3)
+    store.delete("b")
+
+    assert store.get("a") == 3
+    assert store.get("b") is None
+    assert store.get("missing") is None
+    assert set(json.loads((tmp_path / "watermarks.json").read_text())) == {"a"}
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+
+@pytest.mark.parametrize("value", [True, None, [1, 2]])
+def test_unsupported_values(tmp_path, value):
+    with pytest.raises(TypeError):
+        WatermarkStore(str(tmp_path / "watermarks.json")).set("a", value)